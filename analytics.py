@@ -0,0 +1,91 @@
+# analytics.py
+# Ocupação diária por acomodação em qualquer horizonte (um ano inteiro, por exemplo), com arrays de diferença do NumPy:
+# cada reserva confirmada soma +1 na noite do check-in e -1 na do check-out (ambas recortadas ao horizonte), e a soma
+# acumulada dá as unidades ocupadas em cada noite. O custo é linear no número de reservas, sem expandir as estadias
+# noite a noite. As leituras vão por db.get_report_connection() (a cópia de snapshot.py, quando ativa).
+# O próprio SQLite codifica cada reserva num único inteiro (tipo, check-in e check-out já recortados ao horizonte) e
+# entrega todos numa string só, lida direto para um array: nenhuma tupla Python é criada por reserva.
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import database as db
+
+EPOCH_JULIAN_DAY = 2440587.5  # julianday('1970-01-01')
+# ((tipo * stride) + check-in) * stride + check-out, com stride = dias + 1; tipos que não existem mais viram NULL e ficam fora
+SQL_BOOKING_SPANS = """SELECT group_concat((CASE accommodation_type {type_codes} END * :stride
+                                             + MAX(CAST(julianday(start_date) - :origin AS INTEGER), 0)) * :stride
+                                            + MIN(CAST(julianday(end_date) - :origin AS INTEGER), :days))
+                       FROM bookings WHERE status = 'Confirmada' AND end_date > :start AND start_date < :end"""
+
+def occupancy_counts(type_codes, starts, ends, n_types, days):
+    """Unidades ocupadas por noite, em um array (days, n_types).
+    starts/ends são dias contados a partir do início do horizonte (check-out exclusivo); podem cair fora dele."""
+    starts, ends = np.clip(starts, 0, days), np.clip(ends, 0, days)
+    valid = starts < ends
+    offsets = np.asarray(type_codes, dtype=np.int64)[valid] * (days + 1)
+    size = n_types * (days + 1)
+    deltas = np.bincount(offsets + starts[valid], minlength=size) - np.bincount(offsets + ends[valid], minlength=size)
+    return np.cumsum(deltas.reshape(n_types, days + 1)[:, :days], axis=1).T
+
+def _epoch_day(day):
+    return (day - date(1970, 1, 1)).days
+
+def _booking_spans(conn, types, start, days):
+    """(códigos de tipo, check-ins, check-outs) das reservas confirmadas, em dias desde `start` e recortados a [0, days]."""
+    sql = SQL_BOOKING_SPANS.format(type_codes=" ".join(f"WHEN :type{code} THEN {code}" for code in range(len(types))))
+    params = {"stride": days + 1, "origin": EPOCH_JULIAN_DAY + _epoch_day(start), "days": days,
+              "start": start.isoformat(), "end": (start + timedelta(days=days)).isoformat(),
+              **{f"type{code}": name for code, name in enumerate(types)}}
+    packed = conn.execute(sql, params).fetchone()[0]
+    packed = np.fromstring(packed, dtype=np.int64, sep=',') if packed else np.zeros(0, dtype=np.int64)
+    spans, ends = np.divmod(packed, days + 1)
+    codes, starts = np.divmod(spans, days + 1)
+    return codes, starts, ends
+
+@db.cached_read('bookings', 'accommodations', 'snapshot', maxsize=8)
+def _occupancy(start_date, end_date):
+    start, days = date.fromisoformat(start_date), max((date.fromisoformat(end_date) - date.fromisoformat(start_date)).days, 0)
+    with db.get_report_connection() as conn:
+        capacity = pd.read_sql_query("SELECT type, total_quantity FROM accommodations ORDER BY type", conn).set_index('type')['total_quantity']
+        codes, starts, ends = _booking_spans(conn, list(capacity.index), start, days)
+    counts = occupancy_counts(codes, starts, ends, len(capacity), days)
+    occupied = pd.DataFrame(counts, index=pd.date_range(start, periods=days, freq='D', name='Noite'),
+                            columns=capacity.index.rename('Acomodação'))
+    return occupied, capacity
+
+def daily_occupancy(start_date, end_date):
+    """Unidades ocupadas por noite (linhas) e acomodação (colunas) em [start_date, end_date)."""
+    occupied, _ = _occupancy(start_date, end_date)
+    return occupied.copy()
+
+def daily_occupancy_rates(start_date, end_date):
+    """Percentual de unidades ocupadas por noite e acomodação (capacidade atual de cada tipo)."""
+    occupied, capacity = _occupancy(start_date, end_date)
+    return (occupied / capacity.where(capacity > 0) * 100).round(1)
+
+def occupancy_rates(start_date, end_date):
+    """Ocupação do período por acomodação e no total: noites ocupadas (recortadas ao período) sobre noites disponíveis."""
+    occupied, capacity = _occupancy(start_date, end_date)
+    summary = pd.DataFrame({"Unidades": capacity, "Noites Ocupadas": occupied.sum(), "Noites Disponíveis": capacity * len(occupied)})
+    summary.loc["Total"] = summary.sum()
+    summary["Ocupação (%)"] = (summary["Noites Ocupadas"] / summary["Noites Disponíveis"].where(summary["Noites Disponíveis"] > 0) * 100).round(1)
+    summary.index.name = "Acomodação"
+    return summary.reset_index()
+
+def peak_days(start_date, end_date, top=10):
+    """As `top` noites mais cheias do período (todas as acomodações somadas), com a ocupação de cada tipo."""
+    occupied, capacity = _occupancy(start_date, end_date)
+    if occupied.empty: return pd.DataFrame(columns=["Noite", *capacity.index, "Ocupadas", "Capacidade", "Ocupação (%)"])
+    report = occupied.copy()
+    report["Ocupadas"] = occupied.sum(axis=1)
+    report["Capacidade"] = int(capacity.sum())
+    report["Ocupação (%)"] = (report["Ocupadas"] / max(int(capacity.sum()), 1) * 100).round(1)
+    report = report.reset_index().sort_values(["Ocupadas", "Noite"], ascending=[False, True], kind="stable").head(top)
+    report["Noite"] = report["Noite"].dt.date
+    report.columns.name = None
+    return report.reset_index(drop=True)
+
+def heatmap_data(start_date, end_date):
+    """Formato longo (Noite, Acomodação, Ocupação (%)) para o mapa de calor do dashboard."""
+    rates = daily_occupancy_rates(start_date, end_date)
+    return rates.reset_index().melt(id_vars="Noite", var_name="Acomodação", value_name="Ocupação (%)")
@@ -1,11 +1,161 @@
+# auth.py
+# Hash e verificação de senhas com bcrypt num pool limitado de threads (o bcrypt libera o GIL), custo calibrado
+# para o servidor e guardado em settings ('bcrypt_rounds'), rehash transparente no login e bloqueio temporário
+# por usuário após tentativas erradas, aplicado antes de qualquer trabalho do bcrypt.
+import argparse
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as HashTimeout  # levantado quando o pool não responde em HASH_TIMEOUT
 import bcrypt
+import database as db
 
-def hash_password(password):
-    password_bytes = password.encode('utf-8')
-    hashed_bytes = bcrypt.hashpw(password_bytes, bcrypt.gensalt())
-    return hashed_bytes.decode('utf-8')
+HASH_WORKERS = 4
+HASH_TIMEOUT = 30
+DEFAULT_ROUNDS = 12
+MIN_ROUNDS, MAX_ROUNDS = 10, 16
+TARGET_LATENCY_MS = 250
+
+# Bloqueio por usuário: MAX_FAILURES erros dentro de FAILURE_WINDOW segundos bloqueiam por LOCKOUT_SECONDS
+MAX_FAILURES = 5
+FAILURE_WINDOW = 300
+LOCKOUT_SECONDS = 300
+MAX_TRACKED_USERNAMES = 10_000  # nomes acompanhados ao mesmo tempo: tentativas com nomes aleatórios não crescem a memória
+INVALID_CREDENTIALS = "Usuário ou senha inválidos."
+BUSY = "O servidor está ocupado verificando senhas. Tente novamente em instantes."
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+# Ambos em ordem cronológica (falha mais recente / fim do bloqueio), para a limpeza só olhar o começo
+_failures = OrderedDict()
+_locked_until = OrderedDict()
+_throttle_lock = threading.Lock()
+_dummy_hashes = {}
+
+# --- Custo do bcrypt ---
+def current_rounds():
+    try:
+        return min(MAX_ROUNDS, max(MIN_ROUNDS, int(db.get_all_settings().get('bcrypt_rounds', DEFAULT_ROUNDS))))
+    except (ValueError, sqlite3.Error):
+        # Valor inválido, ou settings ainda não existe (senha do admin criada na primeira migração): rehash no login
+        return DEFAULT_ROUNDS
+
+def hash_rounds(hashed_password):
+    """Custo gravado no próprio hash ($2b$<custo>$...)."""
+    try: return int(hashed_password.split('$')[2])
+    except (IndexError, ValueError): return None
+
+def needs_rehash(hashed_password):
+    return hash_rounds(hashed_password) != current_rounds()
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+def _check(password, hashed_password):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+def hash_password(password, rounds=None):
+    return _executor.submit(_hash, password, rounds or current_rounds()).result(timeout=HASH_TIMEOUT)
 
 def verify_password(plain_password, hashed_password):
-    plain_password_bytes = plain_password.encode('utf-8')
-    hashed_password_bytes = hashed_password.encode('utf-8')
-    return bcrypt.checkpw(plain_password_bytes, hashed_password_bytes)
\ No newline at end of file
+    return _executor.submit(_check, plain_password, hashed_password).result(timeout=HASH_TIMEOUT)
+
+# --- Bloqueio por Usuário ---
+def seconds_locked(username):
+    """Segundos restantes de bloqueio do usuário (0 se pode tentar)."""
+    with _throttle_lock:
+        remaining = _locked_until.get(username, 0) - time.monotonic()
+        if remaining <= 0: _locked_until.pop(username, None)
+        return max(0, int(remaining + 0.999))
+
+def _prune(now):
+    while _failures and next(iter(_failures.values()))[-1] < now - FAILURE_WINDOW: _failures.popitem(last=False)
+    while _locked_until and next(iter(_locked_until.values())) <= now: _locked_until.popitem(last=False)
+    for tracked in (_failures, _locked_until):
+        while len(tracked) > MAX_TRACKED_USERNAMES: tracked.popitem(last=False)
+
+def _register_failure(username):
+    now = time.monotonic()
+    with _throttle_lock:
+        failures = _failures.pop(username, None) or deque()
+        failures.append(now)
+        while failures[0] < now - FAILURE_WINDOW: failures.popleft()
+        if len(failures) >= MAX_FAILURES:
+            _locked_until.pop(username, None)
+            _locked_until[username] = now + LOCKOUT_SECONDS
+        else:
+            _failures[username] = failures  # volta para o fim: é a falha mais recente
+        _prune(now)
+
+def _register_success(username):
+    with _throttle_lock:
+        _failures.pop(username, None)
+        _locked_until.pop(username, None)
+
+# --- Login ---
+def _dummy_hash():
+    # Usuário inexistente também paga uma verificação, para não revelar pelo tempo de resposta quais usuários existem
+    rounds = current_rounds()
+    if rounds not in _dummy_hashes: _dummy_hashes[rounds] = _executor.submit(_hash, "senha-inexistente", rounds).result(timeout=HASH_TIMEOUT)
+    return _dummy_hashes[rounds]
+
+def _rehash(user_id, password):
+    db.update_password(user_id, _hash(password, current_rounds()))
+
+def authenticate(username, password):
+    """Verifica usuário e senha. Retorna (usuário sem o hash, None) ou (None, mensagem de erro)."""
+    locked = seconds_locked(username)
+    if locked: return None, f"Muitas tentativas sem sucesso. Tente novamente em {locked} segundos."
+    user = db.get_user_credentials(username)
+    try:
+        valid = verify_password(password, user['password_hash'] if user else _dummy_hash()) and user is not None
+    except HashTimeout: return None, BUSY  # pool sobrecarregado não é senha errada: não conta para o bloqueio
+    if not valid:
+        _register_failure(username)
+        return None, INVALID_CREDENTIALS
+    _register_success(username)
+    if needs_rehash(user['password_hash']): _executor.submit(_rehash, user['id'], password)
+    return {key: value for key, value in user.items() if key != 'password_hash'}, None
+
+def check_password(username, password):
+    """Confere a senha de um usuário já logado (p.ex. a senha atual na troca de senha), sem mexer no bloqueio por
+    tentativas nem refazer o hash. Retorna (usuário sem o hash, None) ou (None, mensagem de erro)."""
+    user = db.get_user_credentials(username)
+    if not user: return None, INVALID_CREDENTIALS
+    try:
+        if not verify_password(password, user['password_hash']): return None, INVALID_CREDENTIALS
+    except HashTimeout: return None, BUSY
+    return {key: value for key, value in user.items() if key != 'password_hash'}, None
+
+# --- Calibração ---
+def calibrate(target_ms=TARGET_LATENCY_MS, samples=3):
+    """Maior custo cuja verificação fica dentro de target_ms neste servidor. Retorna (custo, {custo: ms})."""
+    timings, chosen = {}, MIN_ROUNDS
+    for rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+        hashed = _hash("calibracao", rounds)
+        started = time.perf_counter()
+        for _ in range(samples): _check("calibracao", hashed)
+        timings[rounds] = (time.perf_counter() - started) * 1000 / samples
+        if timings[rounds] > target_ms: break
+        chosen = rounds
+    return chosen, timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Ferramentas de autenticação do Sócio 40 Graus.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    calibrate_parser = subcommands.add_parser("calibrate", help="Escolhe o custo do bcrypt para a latência alvo e grava em settings")
+    calibrate_parser.add_argument("--target-ms", type=float, default=TARGET_LATENCY_MS)
+    calibrate_parser.add_argument("--dry-run", action="store_true", help="Apenas mostra as medições, sem gravar")
+    calibrate_parser.add_argument("--db", default=db.DB_FILE, help="Arquivo do banco de dados")
+    args = parser.parse_args()
+    db.DB_FILE = args.db
+    db.init_db()
+    rounds, timings = calibrate(args.target_ms)
+    for cost, ms in timings.items(): print(f"custo {cost:>2}: {ms:8.1f} ms")
+    print(f"Custo escolhido para {args.target_ms:.0f} ms: {rounds} (atual: {current_rounds()}).")
+    if not args.dry_run:
+        db.update_setting('bcrypt_rounds', str(rounds))
+        print("Gravado em settings; as senhas são refeitas com o novo custo no próximo login de cada usuário.")
+
+if __name__ == "__main__":
+    main()
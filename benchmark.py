@@ -0,0 +1,276 @@
+# benchmark.py
+# Mede a latência (p50/p95) e o pico de memória das funções públicas de database.py sobre um banco sintético
+# (ver generate_sample_data.py) e compara com uma linha de base salva anteriormente.
+# Tudo roda sobre uma cópia descartável do banco, apagada no fim: o arquivo informado nunca muda (nem pela renovação
+# de cotas). Dentro da cópia, as escritas rodam em pares que desfazem a alteração (add + delete) ou regravam os valores
+# atuais, sobre um sócio e um usuário próprios do benchmark, para as repetições medirem sempre o mesmo banco.
+# Funções sem caso ficam em EXCLUDED, com o motivo; o benchmark avisa se alguma função pública nova não estiver em nenhum dos dois.
+import argparse
+import inspect
+import itertools
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+import numpy as np
+import analytics
+import database as db
+import generate_sample_data
+
+BASELINE_FILE = "benchmark_baseline.json"
+REPEAT = 30
+REGRESSION_TOLERANCE = 1.25  # p50 até 25% acima da linha de base ainda é aceito
+NOISE_FLOOR_MS = 0.05  # diferenças menores que isso são ruído de medição, não regressão
+
+BENCHMARK_CPF, BENCHMARK_USER = "00000000040", "benchmark"
+FAKE_PASSWORD_HASH = "$2b$12$" + "." * 53  # update_password mede a gravação, não o bcrypt (ver auth.py)
+
+_INFRASTRUCTURE = "infraestrutura usada por todos os casos (conexões, fila de escrita, cache, versões)"
+_REBUILD = "reconstrução completa para migrações e reparos, fora do caminho das páginas; medida pelo generate_sample_data"
+EXCLUDED = {
+    **{name: _INFRASTRUCTURE for name in ("get_connection", "get_report_connection", "close_all_connections", "submit_write", "run_write",
+                                          "bump_data_version", "get_data_version", "bump_all_data_versions", "cached_read")},
+    **{name: "migrações de esquema: rodam uma vez por banco" for name in ("init_db", "get_schema_version", "apply_migrations", "populate_initial_data")},
+    **{name: "verificação dos planos de execução (python database.py)" for name in ("explain_query_plan", "find_full_scans")},
+    **{name: _REBUILD for name in ("rebuild_dashboard_summary", "rebuild_ledger", "repair_ledger", "rebuild_occupancy", "rebuild_booking_units")},
+}
+
+def _cases(rng):
+    """Casos de benchmark: nome -> (função sem argumentos, é leitura pesada?).
+    Um caso "a + b" mede as duas funções juntas (a segunda desfaz a primeira)."""
+    today = date.today()
+    n_members = db.get_dashboard_kpis()["total_members"]
+    member = lambda: int(rng.integers(1, n_members + 1))
+    day = lambda: today + timedelta(days=int(rng.integers(-365, 365)))
+    types = db.get_accommodation_types()
+    accommodation = lambda: types[int(rng.integers(0, len(types)))]
+    unique = map(str, itertools.count())
+
+    def lookup(sql, *params):
+        with db.get_connection() as conn:
+            row = conn.execute(sql, params).fetchone()
+        return row[0] if row else None
+
+    # Sócio e usuário do benchmark, criados uma única vez por banco
+    if lookup("SELECT id FROM members WHERE cpf = ?", BENCHMARK_CPF) is None:
+        db.add_member("Sócio Benchmark", BENCHMARK_CPF, "benchmark@exemplo.com.br", "11900000040", "1980-01-01", "Rua Exemplo, 40",
+                      "Simples", "Misto", today.isoformat(), (today + timedelta(days=365)).isoformat(), "Pago")
+    bench_member = lookup("SELECT id FROM members WHERE cpf = ?", BENCHMARK_CPF)
+    bench_member_data = db.get_member_by_id(bench_member)
+    member_fields = [bench_member_data[field] for field in ("full_name", "cpf", "email", "phone", "birth_date", "address", "quota_type", "usage_plan", "payment_status")]
+    if db.get_user_credentials(BENCHMARK_USER) is None:
+        db.add_system_user(BENCHMARK_USER, FAKE_PASSWORD_HASH, "Usuário", "Benchmark", "benchmark@40graus.com", "recepcionista")
+    bench_user = db.get_user_credentials(BENCHMARK_USER)["id"]
+
+    settings = db.get_all_settings()
+    quantities = dict(db.get_all_accommodations().itertuples(index=False))
+    with db.get_connection() as conn:
+        sample_cpfs, sample_emails = zip(*conn.execute("SELECT cpf, email FROM members ORDER BY id LIMIT 100").fetchall())
+    availability = db.get_availability_matrix(today.isoformat(), (today + timedelta(days=30)).isoformat())
+    lockable = lookup("SELECT booking_id FROM booking_units WHERE locked = 0 ORDER BY start_date DESC LIMIT 1")
+
+    def add_and_cancel_booking():
+        start, member_id = day(), member()
+        if db.add_booking(member_id, accommodation(), start.isoformat(), (start + timedelta(days=2)).isoformat()):
+            db.update_booking_status(lookup("SELECT MAX(id) FROM bookings WHERE member_id = ? AND start_date = ?", member_id, start.isoformat()), 'Cancelada')
+
+    def check_availability():
+        start = day()
+        return db.check_availability(accommodation(), start.isoformat(), (start + timedelta(days=3)).isoformat())
+
+    def evaluate_bookings():
+        start = today + timedelta(days=int(rng.integers(1, 300)))
+        return db.evaluate_bookings(bench_member, [(name, start.isoformat(), (start + timedelta(days=2)).isoformat()) for name in types])
+
+    def add_and_delete_member():
+        suffix = next(unique)
+        db.add_member(f"Sócio Temporário {suffix}", f"bench{suffix}", f"temporario{suffix}@exemplo.com.br", "11900000000", "1980-01-01", "Rua Exemplo, 40",
+                      "Simples", "Misto", today.isoformat(), (today + timedelta(days=365)).isoformat(), "Pendente")
+        db.delete_member(lookup("SELECT id FROM members WHERE cpf = ?", f"bench{suffix}"))
+
+    def add_members_bulk():
+        batch = next(unique)
+        db.add_members_bulk([(f"Sócio Lote {batch}-{i}", f"bulk{batch}-{i}", f"lote{batch}-{i}@exemplo.com.br", "11900000000", "1980-01-01",
+                              "Rua Exemplo, 40", "Premium", "Misto Premium", today.isoformat(), (today + timedelta(days=365)).isoformat(), "Pendente")
+                             for i in range(100)])
+        db.run_write(lambda cursor: cursor.execute("DELETE FROM members WHERE cpf LIKE ?", (f"bulk{batch}-%",)), 'members')
+
+    def add_and_delete_dependent():
+        db.add_dependent(bench_member, "Dependente Benchmark")
+        db.delete_dependent(lookup("SELECT MAX(id) FROM dependents WHERE member_id = ?", bench_member))
+
+    def add_and_delete_holiday():
+        name = f"Feriado Benchmark {next(unique)}"
+        db.add_holiday(name, today.isoformat(), (today + timedelta(days=1)).isoformat(), "Comum")
+        db.delete_holiday(lookup("SELECT id FROM holidays WHERE name = ?", name))
+
+    def add_and_delete_system_user():
+        username = f"temporario{next(unique)}"
+        db.add_system_user(username, FAKE_PASSWORD_HASH, "Usuário", "Temporário", f"{username}@40graus.com", "recepcionista")
+        db.delete_system_user(db.get_user_credentials(username)["id"])
+
+    def lock_and_unlock():
+        if lockable is not None:
+            db.lock_booking_unit(lockable, True)
+            db.lock_booking_unit(lockable, False)
+
+    return {
+        "check_availability": (check_availability, False),
+        "get_availability_matrix (30 dias)": (lambda: db.get_availability_matrix(today.isoformat(), (today + timedelta(days=30)).isoformat()), False),
+        "find_free_stretches (30 dias)": (lambda: db.find_free_stretches(availability, 2), False),
+        "get_dashboard_kpis": (db.get_dashboard_kpis, False),
+        "get_members_by_quota_type": (db.get_members_by_quota_type, False),
+        "get_upcoming_checkins": (db.get_upcoming_checkins, False),
+        "get_monthly_revenue": (db.get_monthly_revenue, False),
+        "get_bookings_for_calendar (mês)": (lambda: db.get_bookings_for_calendar((today - timedelta(days=7)).isoformat(), (today + timedelta(days=42)).isoformat()), False),
+        "get_bookings_page": (db.get_bookings_page, False),
+        "get_bookings_page (filtro nome)": (lambda: db.get_bookings_page(name_prefix="Maria"), False),
+        "search_members": (lambda: db.search_members("joao silva"), False),
+        "find_existing_members (100)": (lambda: db.find_existing_members(sample_cpfs, sample_emails), False),
+        "get_member_names": (db.get_member_names, False),
+        "get_member_changes": (lambda: db.get_member_changes(0), False),
+        "get_member_by_id": (lambda: db.get_member_by_id(member()), False),
+        "get_member_allowance": (lambda: db.get_member_allowance(member()), False),
+        "get_member_balance": (lambda: db.get_member_balance(member()), False),
+        "get_dependents": (lambda: db.get_dependents(member()), False),
+        "get_transactions_for_member": (lambda: db.get_transactions_for_member(member()), False),
+        "has_booking_in_bimester": (lambda: db.has_booking_in_bimester(member(), day().isoformat()), False),
+        "get_last_quitinete_checkout_date": (lambda: db.get_last_quitinete_checkout_date(member()), False),
+        "is_booking_in_special_holiday": (lambda: db.is_booking_in_special_holiday(day().isoformat(), (day() + timedelta(days=3)).isoformat()), False),
+        "evaluate_booking": (lambda: db.evaluate_booking(bench_member, accommodation(), (today + timedelta(days=30)).isoformat(), (today + timedelta(days=32)).isoformat()), False),
+        "evaluate_bookings (todas as acomodações)": (evaluate_bookings, False),
+        "get_all_settings": (db.get_all_settings, False),
+        "get_accommodation_types": (db.get_accommodation_types, False),
+        "get_all_accommodations": (db.get_all_accommodations, False),
+        "get_committed_units": (db.get_committed_units, False),
+        "get_all_holidays": (db.get_all_holidays, False),
+        "get_holiday_index": (db.get_holiday_index, False),
+        "get_holidays_for_calendar (mês)": (lambda: db.get_holidays_for_calendar(today.isoformat(), (today + timedelta(days=42)).isoformat()), False),
+        "get_system_users": (db.get_system_users, False),
+        "get_user_credentials": (lambda: db.get_user_credentials(BENCHMARK_USER), False),
+        "get_due_renewals": (db.get_due_renewals, False),
+        # Escritas
+        "add_booking + update_booking_status": (add_and_cancel_booking, False),
+        "add_transaction": (lambda: db.add_transaction(member(), 100.0, "Benchmark", today.isoformat()), False),
+        "add_member + delete_member": (add_and_delete_member, False),
+        "add_members_bulk (100)": (add_members_bulk, False),
+        "update_member": (lambda: db.update_member(bench_member, *member_fields), False),
+        "update_member_payment_status": (lambda: db.update_member_payment_status(bench_member, "Pago"), False),
+        "prune_member_changes": (db.prune_member_changes, False),
+        "add_dependent + delete_dependent": (add_and_delete_dependent, False),
+        "add_holiday + delete_holiday": (add_and_delete_holiday, False),
+        "update_setting": (lambda: db.update_setting('simple_quota_price', settings['simple_quota_price']), False),
+        "update_settings": (lambda: db.update_settings(settings), False),
+        "update_accommodation_quantity": (lambda: db.update_accommodation_quantity(types[0], quantities[types[0]]), False),
+        "update_accommodation_quantities": (lambda: db.update_accommodation_quantities(quantities), False),
+        "lock_booking_unit (fixar + liberar)": (lock_and_unlock, False),
+        "add_system_user + delete_system_user": (add_and_delete_system_user, False),
+        "update_system_user": (lambda: db.update_system_user(bench_user, "Usuário", "Benchmark", "benchmark@40graus.com", "recepcionista"), False),
+        "update_password": (lambda: db.update_password(bench_user, FAKE_PASSWORD_HASH), False),
+        # Leituras e escritas pesadas
+        "get_all_members": (db.get_all_members, True),
+        "get_all_bookings_for_calendar": (db.get_all_bookings_for_calendar, True),
+        "get_all_bookings_with_details": (db.get_all_bookings_with_details, True),
+        "reoptimize_units": (db.reoptimize_units, True),
+        # Rotina noturna (na cópia): depois da primeira repetição não há cotas vencidas, como nas noites seguintes
+        "renew_quotas": (db.renew_quotas, True),
+        # Todo o histórico gerado mais o ano seguinte: cobre todas as reservas do banco
+        "analytics.occupancy_rates (histórico completo)": (lambda: analytics.occupancy_rates(
+            date(today.year - generate_sample_data.YEARS_OF_HISTORY, 1, 1).isoformat(), (today + timedelta(days=730)).isoformat()), True),
+    }
+
+def _uncovered(cases):
+    """Funções públicas de database.py sem caso de benchmark e fora de EXCLUDED."""
+    covered = {part.split()[0] for name in cases for part in name.split(" + ")}
+    public = {name for name, value in vars(db).items()
+              if inspect.isfunction(value) and value.__module__ == db.__name__ and not name.startswith("_")}
+    return sorted(public - covered - set(EXCLUDED))
+
+def _clear_read_caches():
+    # Mede o custo real no banco, não o acerto de cache
+    for value in [*vars(db).values(), *vars(analytics).values()]:
+        if callable(getattr(value, "cache_clear", None)): value.cache_clear()
+
+def _throwaway_copy(db_file, directory):
+    """Cópia consistente do banco (inclusive o que ainda está no WAL) para o benchmark escrever à vontade."""
+    copy = os.path.join(directory, os.path.basename(db_file))
+    source, target = sqlite3.connect(db_file), sqlite3.connect(copy)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    return copy
+
+def run(repeat=REPEAT, seed=40):
+    rng = np.random.default_rng(seed)
+    results = {}
+    cases = _cases(rng)
+    for name in _uncovered(cases): print(f"Aviso: {name} não tem caso de benchmark nem está em EXCLUDED.")
+    for name, (func, heavy) in cases.items():
+        runs = max(3, repeat // 10) if heavy else repeat
+        timings = []
+        for _ in range(runs):
+            _clear_read_caches()
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        _clear_read_caches()
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = {"p50_ms": float(np.percentile(timings, 50)), "p95_ms": float(np.percentile(timings, 95)),
+                         "peak_kb": peak / 1024, "runs": runs}
+    return results
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Imprime a tabela de resultados e retorna os casos cujo p50 piorou além da tolerância."""
+    regressions = []
+    print(f"{'função':<40} {'p50 ms':>9} {'p95 ms':>9} {'pico KB':>10} {'base p50':>9} {'variação':>9}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        ratio = result["p50_ms"] / base["p50_ms"] if base and base["p50_ms"] > 0 else None
+        flag = ""
+        if ratio is not None and ratio > tolerance and result["p50_ms"] - base["p50_ms"] > NOISE_FLOOR_MS:
+            regressions.append(name); flag = "  <- REGRESSÃO"
+        print(f"{name:<40} {result['p50_ms']:>9.3f} {result['p95_ms']:>9.3f} {result['peak_kb']:>10.1f} "
+              f"{(base or {}).get('p50_ms', float('nan')):>9.3f} {f'{ratio:.2f}x' if ratio else '-':>9}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das funções de database.py.")
+    parser.add_argument("--scale", choices=generate_sample_data.SCALES.keys(), default="1k")
+    parser.add_argument("--db", help="Banco a usar (padrão: bench_<escala>.db, gerado se não existir)")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="Grava os resultados como nova linha de base")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+
+    db_file = args.db or f"bench_{args.scale}.db"
+    if not os.path.exists(db_file):
+        print(f"Gerando {db_file} (escala {args.scale})...")
+        generate_sample_data.generate(db_file, args.scale)
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(db_file))) as scratch:
+        db.DB_FILE = _throwaway_copy(db_file, scratch)
+        try:
+            db.init_db()
+            results = run(args.repeat)
+        finally:
+            db.close_all_connections()
+    baselines = json.load(open(args.baseline)) if os.path.exists(args.baseline) else {}
+    regressions = compare(results, baselines.get(args.scale, {}), args.tolerance)
+    if args.save_baseline:
+        baselines[args.scale] = results
+        with open(args.baseline, "w") as f: json.dump(baselines, f, indent=2, ensure_ascii=False)
+        print(f"Linha de base da escala {args.scale} salva em {args.baseline}.")
+    elif regressions:
+        print(f"{len(regressions)} regressão(ões) acima de {args.tolerance:.2f}x.")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
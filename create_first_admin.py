@@ -11,7 +11,7 @@ def setup_initial_user():
     print("Banco de dados pronto.")
 
     try:
-        with sqlite3.connect(database.DB_FILE) as conn:
+        with database.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT COUNT(*) FROM users")
             user_count = cursor.fetchone()[0]
@@ -0,0 +1,113 @@
+# data_export.py
+# Exportação completa de sócios, reservas e transações em CSV, Parquet ou Arrow IPC.
+# As linhas são lidas do cursor em lotes de tamanho fixo e gravadas à medida que chegam,
+# então o uso de memória não depende do tamanho da tabela. A leitura usa db.get_report_connection(), servida pela
+# cópia de snapshot.py quando ela está ativa (no aplicativo, ou com --snapshot na linha de comando).
+import argparse
+import csv
+import io
+import database as db
+import snapshot
+
+BATCH_SIZE = 10000
+FORMATS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+
+# Tipo de exportação -> (consulta, coluna usada no filtro de datas, [(coluna, tipo)])
+EXPORTS = {
+    "members": ("""SELECT id, full_name, cpf, email, phone, birth_date, address, quota_type, usage_plan, allowance_days, used_days,
+                          start_date, end_date, payment_status, created_at
+                   FROM members""", "start_date",
+                [("id", "int"), ("full_name", "str"), ("cpf", "str"), ("email", "str"), ("phone", "str"), ("birth_date", "str"),
+                 ("address", "str"), ("quota_type", "str"), ("usage_plan", "str"), ("allowance_days", "int"), ("used_days", "int"),
+                 ("start_date", "str"), ("end_date", "str"), ("payment_status", "str"), ("created_at", "str")]),
+    "bookings": ("""SELECT b.id, b.member_id, m.full_name, m.cpf, b.accommodation_type, b.start_date, b.end_date, b.status, b.booking_date
+                    FROM bookings b LEFT JOIN members m ON b.member_id = m.id""", "b.start_date",
+                 [("id", "int"), ("member_id", "int"), ("member_name", "str"), ("member_cpf", "str"), ("accommodation_type", "str"),
+                  ("start_date", "str"), ("end_date", "str"), ("status", "str"), ("booking_date", "str")]),
+    "transactions": ("""SELECT t.id, t.member_id, m.full_name, m.cpf, t.amount, t.description, t.transaction_date
+                        FROM transactions t LEFT JOIN members m ON t.member_id = m.id""", "t.transaction_date",
+                     [("id", "int"), ("member_id", "int"), ("member_name", "str"), ("member_cpf", "str"), ("amount", "float"),
+                      ("description", "str"), ("transaction_date", "str")]),
+}
+EXPORT_LABELS = {"members": "Sócios", "bookings": "Reservas", "transactions": "Transações"}
+
+def iter_batches(kind, start_date=None, end_date=None, batch_size=BATCH_SIZE):
+    """Gera lotes (listas de tuplas) da exportação, com filtro opcional de datas (inclusivo)."""
+    query, date_column, _ = EXPORTS[kind]
+    conditions, params = [], []
+    if start_date:
+        conditions.append(f"{date_column} >= ?"); params.append(str(start_date))
+    if end_date:
+        conditions.append(f"{date_column} <= ?"); params.append(str(end_date))
+    if conditions: query += " WHERE " + " AND ".join(conditions)
+    with db.get_report_connection() as conn:
+        cursor = conn.execute(query + " ORDER BY 1", params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows: break
+            yield rows
+
+def _arrow_schema(kind):
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError("Exportação em Parquet/Arrow requer o pacote 'pyarrow'.") from e
+    types = {"int": pa.int64(), "float": pa.float64(), "str": pa.string()}
+    return pa, pa.schema([(name, types[column_type]) for name, column_type in EXPORTS[kind][2]])
+
+def export(kind, output, fmt="csv", start_date=None, end_date=None, batch_size=BATCH_SIZE):
+    """Grava a exportação em `output` (caminho ou arquivo binário aberto). Retorna o número de linhas exportadas."""
+    columns = [name for name, _ in EXPORTS[kind][2]]
+    total = 0
+    if fmt == "csv":
+        opened = open(output, "wb") if isinstance(output, str) else None
+        binary = opened or output
+        text = io.TextIOWrapper(binary, encoding="utf-8-sig", newline="", write_through=True)
+        try:
+            writer = csv.writer(text)
+            writer.writerow(columns)
+            for rows in iter_batches(kind, start_date, end_date, batch_size):
+                writer.writerows(rows)
+                total += len(rows)
+            text.flush()
+        finally:
+            text.detach()
+            if opened: opened.close()
+        return total
+
+    pa, schema = _arrow_schema(kind)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(output, schema)
+    elif fmt == "arrow":
+        writer = pa.ipc.new_file(output, schema)
+    else:
+        raise ValueError(f"Formato de exportação desconhecido: {fmt}")
+    try:
+        for rows in iter_batches(kind, start_date, end_date, batch_size):
+            arrays = [pa.array(list(values), type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            total += len(rows)
+    finally:
+        writer.close()
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta sócios, reservas ou transações do Sócio 40 Graus.")
+    parser.add_argument("kind", choices=EXPORTS.keys())
+    parser.add_argument("--format", dest="fmt", choices=FORMATS.keys(), default="csv")
+    parser.add_argument("--output", help="Arquivo de saída (padrão: <tipo>.<formato>)")
+    parser.add_argument("--start", help="Data inicial (AAAA-MM-DD), inclusive")
+    parser.add_argument("--end", help="Data final (AAAA-MM-DD), inclusive")
+    parser.add_argument("--db", default=db.DB_FILE, help="Arquivo do banco de dados")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--snapshot", action="store_true", help="Lê de uma cópia do banco, sem competir com o aplicativo em uso")
+    args = parser.parse_args()
+    db.DB_FILE = args.db
+    if args.snapshot: snapshot.enable()
+    output = args.output or f"{args.kind}{FORMATS[args.fmt]}"
+    total = export(args.kind, output, args.fmt, args.start, args.end, args.batch_size)
+    print(f"{total} linha(s) exportada(s) para {output}.")
+
+if __name__ == "__main__":
+    main()
@@ -1,74 +1,386 @@
 # database.py
 import sqlite3
+import json
+import threading
+import functools
+from collections import OrderedDict, namedtuple
+import re
+import bisect
+import queue
+import time
+import random
+from concurrent.futures import Future
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 from datetime import date, timedelta
 
 DB_FILE = "socio40graus.db"
 
+# --- Camada de Conexões ---
+# Conexões reaproveitadas entre reruns do Streamlit, configuradas uma única vez ao abrir.
+POOL_SIZE = 8
+POOL_TIMEOUT = 30
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",     # ~16 MB de cache de páginas por conexão
+    "PRAGMA mmap_size = 134217728",   # 128 MB mapeados em memória
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+)
+# Pontos de extensão usados pela instrumentação opcional (instrumentation.py)
+CONNECTION_FACTORY = sqlite3.Connection
+connection_wait_hook = None  # recebe o tempo de espera por uma conexão do pool, em segundos
+# Ponto de extensão da cópia de leitura (snapshot.py): context manager que empresta uma conexão para relatórios
+report_connection_provider = None
+
+def _open_connection(db_file):
+    conn = sqlite3.connect(db_file, timeout=5, check_same_thread=False, factory=CONNECTION_FACTORY)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+class ConnectionPool:
+    """Pool de conexões SQLite compartilhado entre as sessões do Streamlit."""
+    def __init__(self, db_file, size=POOL_SIZE):
+        self.db_file = db_file
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=POOL_TIMEOUT):
+            raise sqlite3.OperationalError("Tempo esgotado aguardando uma conexão livre do pool.")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            try: return _open_connection(self.db_file)
+            except BaseException:
+                self._slots.release()
+                raise
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction: conn.rollback()
+            conn.row_factory = None
+            self._idle.put(conn)
+        except sqlite3.Error:
+            conn.close()
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try: self._idle.get_nowait().close()
+            except queue.Empty: break
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _get_pool():
+    pool = _pools.get(DB_FILE)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(DB_FILE, ConnectionPool(DB_FILE))
+    return pool
+
+@contextmanager
+def get_connection():
+    """Empresta uma conexão do pool; faz commit ao sair do bloco ou rollback em caso de erro."""
+    pool = _get_pool()
+    hook = connection_wait_hook
+    if hook is None:
+        conn = pool.acquire()
+    else:
+        started = time.perf_counter()
+        conn = pool.acquire()
+        hook(time.perf_counter() - started)
+    try:
+        yield conn
+        if conn.in_transaction: conn.commit()
+    except BaseException:
+        if conn.in_transaction: conn.rollback()
+        raise
+    finally:
+        pool.release(conn)
+
+@contextmanager
+def get_report_connection():
+    """Conexão para relatórios e análises: a cópia periódica de snapshot.py, se ativa, ou o próprio banco."""
+    provider = report_connection_provider
+    with (provider() if provider is not None else get_connection()) as conn:
+        yield conn
+
+def close_all_connections():
+    with _pools_lock:
+        for pool in _pools.values(): pool.close()
+        _pools.clear()
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers: writer.stop()  # termina os comandos já enfileirados antes de fechar
+
+# --- Fila de Escrita ---
+# Todas as escritas passam por uma única thread com conexão própria. Os comandos que chegam dentro de
+# GROUP_COMMIT_WINDOW viram uma só transação, com um savepoint por comando (a falha de um não desfaz os outros),
+# e o lote é repetido com espera crescente se outro processo estiver segurando o lock do arquivo.
+GROUP_COMMIT_WINDOW = 0.003  # segundos
+GROUP_COMMIT_MAX = 64
+WRITE_BUSY_TIMEOUT_MS = 1000  # espera do SQLite em cada tentativa; com as novas tentativas, bem abaixo de WRITE_TIMEOUT
+WRITE_RETRIES = 6
+WRITE_BACKOFF = 0.01  # segundos; dobra a cada nova tentativa
+WRITE_TIMEOUT = 30
+
+def _is_busy(error):
+    return isinstance(error, sqlite3.OperationalError) and any(word in str(error).lower() for word in ("locked", "busy"))
+
+class WriteQueue:
+    """Fila de escrita de um arquivo de banco, atendida por uma única thread."""
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._commands = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._last_batch_size = 0
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, function, tables):
+        """Enfileira function(cursor). Retorna um Future, ou None se a fila já foi encerrada."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("Comandos da fila de escrita não podem enfileirar outras escritas.")
+        future = Future()
+        with self._lock:
+            if self._closed: return None
+            self._commands.put((function, tables, future, time.perf_counter()))
+        return future
+
+    def stop(self):
+        with self._lock:
+            if self._closed: return
+            self._closed = True
+            self._commands.put(None)
+        self._thread.join(timeout=WRITE_TIMEOUT)
+
+    def _next_batch(self):
+        first = self._commands.get()
+        if first is None: return None
+        # Só espera por mais comandos se o lote anterior mostrou escritas concorrentes; uma escrita isolada não paga a janela
+        window = GROUP_COMMIT_WINDOW if self._last_batch_size > 1 or not self._commands.empty() else 0.0
+        batch, deadline = [first], time.perf_counter() + window
+        while len(batch) < GROUP_COMMIT_MAX:
+            try: command = self._commands.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty: break
+            if command is None:
+                self._commands.put(None)  # encerra depois deste lote
+                break
+            batch.append(command)
+        self._last_batch_size = len(batch)
+        return batch
+
+    def _run(self):
+        conn = _open_connection(self.db_file)
+        conn.isolation_level = None  # BEGIN, savepoints e COMMIT explícitos
+        conn.execute(f"PRAGMA busy_timeout = {WRITE_BUSY_TIMEOUT_MS}")
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None: break
+                self._execute(conn, batch)
+        finally:
+            conn.close()
+
+    def _execute(self, conn, batch):
+        started = time.perf_counter()
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                outcomes = self._apply(conn, batch)
+                break
+            except Exception as e:
+                if conn.in_transaction: conn.execute("ROLLBACK")
+                if not _is_busy(e) or attempt == WRITE_RETRIES:
+                    for _, _, future, _ in batch: future.set_exception(e)
+                    return
+                time.sleep(WRITE_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+        bump_data_version(*{table for (_, tables, _, _), (ok, _) in zip(batch, outcomes) if ok for table in tables})
+        for (_, _, future, submitted), (ok, value) in zip(batch, outcomes):
+            future.queue_wait = started - submitted
+            future.set_result(value) if ok else future.set_exception(value)
+
+    def _apply(self, conn, batch):
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        outcomes = []
+        for function, _, _, _ in batch:
+            cursor.execute("SAVEPOINT command")
+            try:
+                outcomes.append((True, function(cursor)))
+            except Exception as e:
+                if _is_busy(e): raise  # o lote inteiro é repetido
+                cursor.execute("ROLLBACK TO command")
+                outcomes.append((False, e))
+            cursor.execute("RELEASE command")
+        cursor.execute("COMMIT")
+        return outcomes
+
+_writers = {}
+
+def submit_write(function, *tables):
+    """Enfileira function(cursor) para a thread de escrita; as versões de `tables` sobem após o commit.
+    Retorna um Future com o valor devolvido por function (ou a exceção que ela levantou)."""
+    while True:
+        writer = _writers.get(DB_FILE)
+        if writer is None:
+            with _pools_lock:
+                writer = _writers.get(DB_FILE) or _writers.setdefault(DB_FILE, WriteQueue(DB_FILE))
+        future = writer.submit(function, tables)
+        if future is not None: return future
+
+def run_write(function, *tables, timeout=WRITE_TIMEOUT):
+    """Como submit_write, mas aguarda o commit e devolve o resultado."""
+    future = submit_write(function, *tables)
+    try:
+        result = future.result(timeout=timeout)
+    except TimeoutError:
+        raise sqlite3.OperationalError("Tempo esgotado aguardando a fila de escrita.") from None
+    hook = connection_wait_hook
+    if hook is not None: hook(future.queue_wait)
+    return result
+
 PLAN_ALLOWANCE_DAYS = {
     "Finais de Semana": 8, "Misto": 8, "Feriado Regular": 8,
     "Finais de Semana Premium": 8, "Misto Premium": 8, "Feriado Premium": 7
 }
+QUOTA_PLANS = {
+    "Simples": ["Finais de Semana", "Misto", "Feriado Regular"],
+    "Premium": ["Finais de Semana Premium", "Misto Premium", "Feriado Premium"]
+}
+
+# --- Versões de Dados ---
+# Contador por tabela incrementado pelas funções de escrita; leituras em cache usam a versão como parte da chave.
+_data_versions = {}
+_data_versions_lock = threading.Lock()
+
+def bump_data_version(*tables):
+    with _data_versions_lock:
+        for table in tables: _data_versions[table] = _data_versions.get(table, 0) + 1
+
+def get_data_version(*tables):
+    return tuple(_data_versions.get(table, 0) for table in tables)
 
+def bump_all_data_versions():
+    bump_data_version(*ALL_TABLES)
+
+ALL_TABLES = ('users', 'members', 'dependents', 'accommodations', 'bookings', 'holidays', 'transactions', 'settings', 'quota_renewals')
+READ_CACHE_SIZE = 128
+
+def _copy_result(result):
+    if isinstance(result, pd.DataFrame): return result.copy()
+    if isinstance(result, (dict, list)): return type(result)(result)
+    return result
+
+def cached_read(*tables, maxsize=READ_CACHE_SIZE):
+    """Cache LRU para leituras; a chave inclui a versão das tabelas lidas, então qualquer escrita nelas invalida na hora."""
+    def decorator(func):
+        entries = OrderedDict()
+        lock = threading.Lock()
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (DB_FILE, get_data_version(*tables), args, tuple(sorted(kwargs.items())))
+            with lock:
+                if key in entries:
+                    entries.move_to_end(key)
+                    return _copy_result(entries[key])
+            result = func(*args, **kwargs)
+            with lock:
+                entries[key] = result
+                while len(entries) > maxsize: entries.popitem(last=False)
+            return _copy_result(result)
+        wrapper.cache_clear = lambda: entries.clear()
+        return wrapper
+    return decorator
+
+# --- Migrações de Esquema ---
+# Cada migração roda uma única vez, em ordem, e registra sua versão em PRAGMA user_version.
+# Para alterar o esquema, acrescente uma nova função ao final de MIGRATIONS (nunca edite as já publicadas).
 def init_db():
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        # Tabela de usuários do sistema
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL,
-                first_name TEXT, last_name TEXT, email TEXT UNIQUE,
-                role TEXT NOT NULL DEFAULT 'recepcionista' CHECK(role IN ('admin', 'recepcionista'))
-            )""")
-        # Tabela de membros
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS members (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, full_name TEXT NOT NULL, cpf TEXT UNIQUE NOT NULL, email TEXT UNIQUE NOT NULL,
-                phone TEXT, birth_date DATE, address TEXT, quota_type TEXT NOT NULL CHECK(quota_type IN ('Simples', 'Premium')),
-                usage_plan TEXT NOT NULL, 
-                allowance_days INTEGER NOT NULL DEFAULT 0,
-                used_days INTEGER NOT NULL DEFAULT 0,
-                start_date DATE NOT NULL, end_date DATE NOT NULL,
-                payment_status TEXT DEFAULT 'Pendente' CHECK(payment_status IN ('Pago', 'Pendente', 'Atrasado')),
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )""")
-        # Tabela de dependentes
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS dependents (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, member_id INTEGER NOT NULL, full_name TEXT NOT NULL,
-                FOREIGN KEY (member_id) REFERENCES members (id) ON DELETE CASCADE
-            )""")
-        # Tabela de acomodações
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS accommodations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, type TEXT UNIQUE NOT NULL, total_quantity INTEGER NOT NULL
-            )""")
-        # Tabela de reservas
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS bookings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, member_id INTEGER NOT NULL, accommodation_type TEXT NOT NULL,
-                start_date DATE NOT NULL, end_date DATE NOT NULL,
-                status TEXT DEFAULT 'Pendente' CHECK(status IN ('Confirmada', 'Pendente', 'Cancelada')),
-                booking_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (member_id) REFERENCES members (id), FOREIGN KEY (accommodation_type) REFERENCES accommodations (type)
-            )""")
-        # Tabela de feriados
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS holidays (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL, start_date DATE NOT NULL, end_date DATE NOT NULL,
-                type TEXT DEFAULT 'Comum' CHECK(type IN ('Especial', 'Comum'))
-            )""")
-        # Tabela de transações
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, member_id INTEGER, amount REAL NOT NULL, description TEXT, transaction_date DATE NOT NULL,
-                FOREIGN KEY (member_id) REFERENCES members (id)
-            )""")
-        # Tabela de configurações
-        cursor.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
-        conn.commit()
-        populate_initial_data(cursor)
-        conn.commit()
+    """Aplica as migrações pendentes; com o banco em dia custa apenas a leitura do user_version."""
+    with get_connection() as conn:
+        if get_schema_version(conn) >= SCHEMA_VERSION: return
+        apply_migrations(conn)
+    bump_all_data_versions()
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def apply_migrations(conn):
+    for version, migration in MIGRATIONS:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Relido sob o lock de escrita: outro processo pode ter migrado enquanto esperávamos
+            if get_schema_version(conn) < version:
+                cursor = conn.cursor()
+                migration(cursor)
+                cursor.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+def _migration_1_initial_schema(cursor):
+    # Tabela de usuários do sistema
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL,
+            first_name TEXT, last_name TEXT, email TEXT UNIQUE,
+            role TEXT NOT NULL DEFAULT 'recepcionista' CHECK(role IN ('admin', 'recepcionista'))
+        )""")
+    # Tabela de membros
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS members (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, full_name TEXT NOT NULL, cpf TEXT UNIQUE NOT NULL, email TEXT UNIQUE NOT NULL,
+            phone TEXT, birth_date DATE, address TEXT, quota_type TEXT NOT NULL CHECK(quota_type IN ('Simples', 'Premium')),
+            usage_plan TEXT NOT NULL, 
+            allowance_days INTEGER NOT NULL DEFAULT 0,
+            used_days INTEGER NOT NULL DEFAULT 0,
+            start_date DATE NOT NULL, end_date DATE NOT NULL,
+            payment_status TEXT DEFAULT 'Pendente' CHECK(payment_status IN ('Pago', 'Pendente', 'Atrasado')),
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )""")
+    # Tabela de dependentes
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dependents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, member_id INTEGER NOT NULL, full_name TEXT NOT NULL,
+            FOREIGN KEY (member_id) REFERENCES members (id) ON DELETE CASCADE
+        )""")
+    # Tabela de acomodações
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS accommodations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, type TEXT UNIQUE NOT NULL, total_quantity INTEGER NOT NULL
+        )""")
+    # Tabela de reservas
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, member_id INTEGER NOT NULL, accommodation_type TEXT NOT NULL,
+            start_date DATE NOT NULL, end_date DATE NOT NULL,
+            status TEXT DEFAULT 'Pendente' CHECK(status IN ('Confirmada', 'Pendente', 'Cancelada')),
+            booking_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (member_id) REFERENCES members (id), FOREIGN KEY (accommodation_type) REFERENCES accommodations (type)
+        )""")
+    # Tabela de feriados
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS holidays (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL, start_date DATE NOT NULL, end_date DATE NOT NULL,
+            type TEXT DEFAULT 'Comum' CHECK(type IN ('Especial', 'Comum'))
+        )""")
+    # Tabela de transações
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, member_id INTEGER, amount REAL NOT NULL, description TEXT, transaction_date DATE NOT NULL,
+            FOREIGN KEY (member_id) REFERENCES members (id)
+        )""")
+    # Tabela de configurações
+    cursor.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    populate_initial_data(cursor)
 
 def populate_initial_data(cursor):
     settings_to_add = [('simple_quota_price', '1400.00'), ('premium_quota_price', '2000.00'),
@@ -89,86 +401,428 @@ def populate_initial_data(cursor):
         cursor.execute("INSERT INTO users (username, password_hash, first_name, last_name, email, role) VALUES (?, ?, ?, ?, ?, ?)",
                        (username, hashed_password, 'Admin', 'User', 'admin@40graus.com', 'admin'))
 
+def _migration_2_hot_query_indexes(cursor):
+    # Índices desenhados para as consultas de HOT_QUERIES (ver find_full_scans)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_availability ON bookings (accommodation_type, status, start_date, end_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_member ON bookings (member_id, status, start_date, end_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_status_start ON bookings (status, start_date, end_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_member_date ON transactions (member_id, transaction_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_dependents_member ON dependents (member_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_members_quota_payment ON members (quota_type, payment_status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_holidays_type_start ON holidays (type, start_date, end_date)")
+    cursor.execute("ANALYZE")
+
+def _migration_3_occupancy_ledger(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS occupancy (
+            accommodation_type TEXT NOT NULL, night DATE NOT NULL, booked INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (accommodation_type, night)
+        ) WITHOUT ROWID""")
+    rebuild_occupancy(cursor)
+
+def _migration_4_bookings_end_date_index(cursor):
+    # Janelas do calendário filtram por end_date > início: o histórico antigo fica fora do intervalo lido
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_status_end ON bookings (status, end_date, start_date)")
+
+def _migration_5_bookings_pagination_indexes(cursor):
+    # Paginação por (start_date, id) e filtro por prefixo de nome (LIKE é case-insensitive, daí o NOCASE)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_start ON bookings (start_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_members_name_nocase ON members (full_name COLLATE NOCASE)")
+
+def _migration_6_member_search_index(cursor):
+    # Índices de busca sobre members (conteúdo externo, sincronizados por triggers):
+    # members_fts para nome/email por palavra, sem acentos; members_trigram para trechos de CPF/telefone
+    cursor.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS members_fts USING fts5(
+                          full_name, email, content='members', content_rowid='id',
+                          tokenize='unicode61 remove_diacritics 2', prefix='2 3')""")
+    cursor.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS members_trigram USING fts5(
+                          cpf, phone, content='members', content_rowid='id', tokenize='trigram')""")
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS members_search_ai AFTER INSERT ON members BEGIN
+                          INSERT INTO members_fts (rowid, full_name, email) VALUES (new.id, new.full_name, new.email);
+                          INSERT INTO members_trigram (rowid, cpf, phone) VALUES (new.id, new.cpf, new.phone);
+                      END""")
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS members_search_ad AFTER DELETE ON members BEGIN
+                          INSERT INTO members_fts (members_fts, rowid, full_name, email) VALUES ('delete', old.id, old.full_name, old.email);
+                          INSERT INTO members_trigram (members_trigram, rowid, cpf, phone) VALUES ('delete', old.id, old.cpf, old.phone);
+                      END""")
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS members_search_au AFTER UPDATE OF full_name, email, cpf, phone ON members BEGIN
+                          INSERT INTO members_fts (members_fts, rowid, full_name, email) VALUES ('delete', old.id, old.full_name, old.email);
+                          INSERT INTO members_trigram (members_trigram, rowid, cpf, phone) VALUES ('delete', old.id, old.cpf, old.phone);
+                          INSERT INTO members_fts (rowid, full_name, email) VALUES (new.id, new.full_name, new.email);
+                          INSERT INTO members_trigram (rowid, cpf, phone) VALUES (new.id, new.cpf, new.phone);
+                      END""")
+    cursor.execute("INSERT INTO members_fts (members_fts) VALUES ('rebuild')")
+    cursor.execute("INSERT INTO members_trigram (members_trigram) VALUES ('rebuild')")
+
+def _migration_7_dashboard_summary(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dashboard_summary (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_members INTEGER NOT NULL DEFAULT 0, simple_members INTEGER NOT NULL DEFAULT 0, premium_members INTEGER NOT NULL DEFAULT 0,
+            paid_simple_members INTEGER NOT NULL DEFAULT 0, paid_premium_members INTEGER NOT NULL DEFAULT 0,
+            simple_quota_price REAL NOT NULL DEFAULT 0, premium_quota_price REAL NOT NULL DEFAULT 0,
+            total_units INTEGER NOT NULL DEFAULT 0
+        )""")
+    # Cada trigger aplica apenas a diferença causada pela linha alterada
+    member_delta = """
+            total_members = total_members + {sign},
+            simple_members = simple_members + {sign} * ({row}.quota_type = 'Simples'),
+            premium_members = premium_members + {sign} * ({row}.quota_type = 'Premium'),
+            paid_simple_members = paid_simple_members + {sign} * ({row}.quota_type = 'Simples' AND {row}.payment_status = 'Pago'),
+            paid_premium_members = paid_premium_members + {sign} * ({row}.quota_type = 'Premium' AND {row}.payment_status = 'Pago')"""
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS summary_members_ai AFTER INSERT ON members BEGIN
+                           UPDATE dashboard_summary SET {member_delta.format(sign='1', row='new')} WHERE id = 1;
+                       END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS summary_members_ad AFTER DELETE ON members BEGIN
+                           UPDATE dashboard_summary SET {member_delta.format(sign='-1', row='old')} WHERE id = 1;
+                       END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS summary_members_au AFTER UPDATE OF quota_type, payment_status ON members BEGIN
+                           UPDATE dashboard_summary SET {member_delta.format(sign='-1', row='old')} WHERE id = 1;
+                           UPDATE dashboard_summary SET {member_delta.format(sign='1', row='new')} WHERE id = 1;
+                       END""")
+    for event in ("INSERT", "UPDATE"):
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS summary_settings_{event.lower()} AFTER {event} ON settings
+                           WHEN new.key IN ('simple_quota_price', 'premium_quota_price') BEGIN
+                               UPDATE dashboard_summary SET
+                                   simple_quota_price = CASE WHEN new.key = 'simple_quota_price' THEN CAST(new.value AS REAL) ELSE simple_quota_price END,
+                                   premium_quota_price = CASE WHEN new.key = 'premium_quota_price' THEN CAST(new.value AS REAL) ELSE premium_quota_price END
+                               WHERE id = 1;
+                           END""")
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS summary_accommodations_ai AFTER INSERT ON accommodations BEGIN
+                          UPDATE dashboard_summary SET total_units = total_units + new.total_quantity WHERE id = 1;
+                      END""")
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS summary_accommodations_ad AFTER DELETE ON accommodations BEGIN
+                          UPDATE dashboard_summary SET total_units = total_units - old.total_quantity WHERE id = 1;
+                      END""")
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS summary_accommodations_au AFTER UPDATE OF total_quantity ON accommodations BEGIN
+                          UPDATE dashboard_summary SET total_units = total_units - old.total_quantity + new.total_quantity WHERE id = 1;
+                      END""")
+    # Soma das noites ocupadas de todas as acomodações em uma janela de datas
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_occupancy_night ON occupancy (night, booked)")
+    rebuild_dashboard_summary(cursor)
+
+def _migration_8_bcrypt_rounds_setting(cursor):
+    # Custo do bcrypt calibrado para o servidor (python auth.py calibrate); 12 é o padrão do bcrypt.gensalt()
+    cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('bcrypt_rounds', '12')")
+
+def _migration_9_member_changes_log(cursor):
+    # Registro de alterações de sócios, lido por member_index.py para atualizar o índice dos seletores sem reler a tabela
+    cursor.execute("CREATE TABLE IF NOT EXISTS member_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, member_id INTEGER NOT NULL)")
+    for name, event, row in (("ai", "INSERT", "new"), ("au", "UPDATE OF full_name", "new"), ("ad", "DELETE", "old")):
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS member_changes_{name} AFTER {event} ON members BEGIN
+                               INSERT INTO member_changes (member_id) VALUES ({row}.id);
+                           END""")
+
+def _migration_10_quitinete_cooldown_setting(cursor):
+    # Intervalo mínimo, em dias, entre duas estadias do mesmo sócio na Quitinete (ver evaluate_booking)
+    cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('quitinete_cooldown_days', '30')")
+
+def _migration_11_financial_ledger(cursor):
+    # Tipo de cota do sócio no momento do lançamento, para a receita mensal não mudar se o sócio trocar de cota depois
+    cursor.execute("ALTER TABLE transactions ADD COLUMN quota_type TEXT")
+    cursor.execute("UPDATE transactions SET quota_type = (SELECT quota_type FROM members m WHERE m.id = transactions.member_id)")
+    cursor.execute("""CREATE TABLE IF NOT EXISTS member_balances (
+                          member_id INTEGER PRIMARY KEY, balance REAL NOT NULL DEFAULT 0,
+                          transactions INTEGER NOT NULL DEFAULT 0, last_transaction_date TEXT)""")
+    cursor.execute("""CREATE TABLE IF NOT EXISTS monthly_revenue (
+                          month TEXT NOT NULL, quota_type TEXT NOT NULL, amount REAL NOT NULL DEFAULT 0, transactions INTEGER NOT NULL DEFAULT 0,
+                          PRIMARY KEY (month, quota_type)) WITHOUT ROWID""")
+    # Cada trigger aplica apenas a diferença do lançamento alterado
+    apply_delta = """
+            INSERT INTO member_balances (member_id, balance, transactions, last_transaction_date) VALUES ({row}.member_id, {sign} * {row}.amount, {sign}, {row}.transaction_date)
+                ON CONFLICT (member_id) DO UPDATE SET balance = balance + excluded.balance, transactions = transactions + excluded.transactions,
+                    last_transaction_date = (SELECT MAX(transaction_date) FROM transactions WHERE member_id = excluded.member_id);
+            INSERT INTO monthly_revenue (month, quota_type, amount, transactions)
+                VALUES (substr({row}.transaction_date, 1, 7), COALESCE({quota}, 'Outros'), {sign} * {row}.amount, {sign})
+                ON CONFLICT (month, quota_type) DO UPDATE SET amount = amount + excluded.amount, transactions = transactions + excluded.transactions;"""
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS ledger_transactions_ai AFTER INSERT ON transactions BEGIN
+                           UPDATE transactions SET quota_type = (SELECT quota_type FROM members WHERE id = new.member_id) WHERE id = new.id AND new.quota_type IS NULL;
+                           {apply_delta.format(row='new', sign='1', quota='(SELECT quota_type FROM transactions WHERE id = new.id)')}
+                       END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS ledger_transactions_ad AFTER DELETE ON transactions BEGIN
+                           {apply_delta.format(row='old', sign='-1', quota='old.quota_type')}
+                       END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS ledger_transactions_au AFTER UPDATE OF member_id, amount, transaction_date ON transactions BEGIN
+                           {apply_delta.format(row='old', sign='-1', quota='old.quota_type')}
+                           {apply_delta.format(row='new', sign='1', quota='new.quota_type')}
+                       END""")
+    rebuild_ledger(cursor)
+
+def _migration_12_booking_units(cursor):
+    # Unidade concreta (1..total_quantity) de cada reserva confirmada; as datas são copiadas da reserva para as buscas por unidade
+    cursor.execute("""CREATE TABLE IF NOT EXISTS booking_units (
+                          booking_id INTEGER PRIMARY KEY REFERENCES bookings (id), accommodation_type TEXT NOT NULL, unit INTEGER NOT NULL,
+                          start_date DATE NOT NULL, end_date DATE NOT NULL, locked INTEGER NOT NULL DEFAULT 0)""")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_booking_units_unit ON booking_units (accommodation_type, unit, start_date)")
+    rebuild_booking_units(cursor)
+
+def _migration_13_quota_renewals(cursor):
+    # Um registro por período renovado, com o valor cobrado; o UNIQUE impede renovar o mesmo período duas vezes
+    cursor.execute("""CREATE TABLE IF NOT EXISTS quota_renewals (
+                          id INTEGER PRIMARY KEY AUTOINCREMENT, member_id INTEGER NOT NULL REFERENCES members (id) ON DELETE CASCADE,
+                          period_start DATE NOT NULL, period_end DATE NOT NULL, quota_type TEXT NOT NULL, usage_plan TEXT NOT NULL,
+                          allowance_days INTEGER NOT NULL, unused_days INTEGER NOT NULL DEFAULT 0, price REAL NOT NULL,
+                          renewed_at DATETIME DEFAULT CURRENT_TIMESTAMP, UNIQUE (member_id, period_start))""")
+    # Cotas que vencem em um intervalo de datas (renew_quotas)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_members_end_date ON members (end_date)")
+
+def _migration_14_ledger_without_member(cursor):
+    # Lançamentos sem sócio (member_id NULL) entram só na receita mensal, como 'Outros'. Nos triggers da migração 11,
+    # o upsert em member_balances com member_id NULL ganhava um rowid novo e creditava o valor a outro sócio.
+    apply_delta = """
+            INSERT INTO member_balances (member_id, balance, transactions, last_transaction_date)
+                SELECT {row}.member_id, {sign} * {row}.amount, {sign}, {row}.transaction_date WHERE {row}.member_id IS NOT NULL
+                ON CONFLICT (member_id) DO UPDATE SET balance = balance + excluded.balance, transactions = transactions + excluded.transactions,
+                    last_transaction_date = (SELECT MAX(transaction_date) FROM transactions WHERE member_id = excluded.member_id);
+            INSERT INTO monthly_revenue (month, quota_type, amount, transactions)
+                VALUES (substr({row}.transaction_date, 1, 7), COALESCE({quota}, 'Outros'), {sign} * {row}.amount, {sign})
+                ON CONFLICT (month, quota_type) DO UPDATE SET amount = amount + excluded.amount, transactions = transactions + excluded.transactions;"""
+    for name in ("ai", "ad", "au"): cursor.execute(f"DROP TRIGGER IF EXISTS ledger_transactions_{name}")
+    cursor.execute(f"""CREATE TRIGGER ledger_transactions_ai AFTER INSERT ON transactions BEGIN
+                           UPDATE transactions SET quota_type = (SELECT quota_type FROM members WHERE id = new.member_id) WHERE id = new.id AND new.quota_type IS NULL;
+                           {apply_delta.format(row='new', sign='1', quota='(SELECT quota_type FROM transactions WHERE id = new.id)')}
+                       END""")
+    cursor.execute(f"""CREATE TRIGGER ledger_transactions_ad AFTER DELETE ON transactions BEGIN
+                           {apply_delta.format(row='old', sign='-1', quota='old.quota_type')}
+                       END""")
+    cursor.execute(f"""CREATE TRIGGER ledger_transactions_au AFTER UPDATE OF member_id, amount, transaction_date ON transactions BEGIN
+                           {apply_delta.format(row='old', sign='-1', quota='old.quota_type')}
+                           {apply_delta.format(row='new', sign='1', quota='new.quota_type')}
+                       END""")
+    rebuild_ledger(cursor)  # descarta os saldos creditados por engano
+
+MIGRATIONS = [
+    (1, _migration_1_initial_schema),
+    (2, _migration_2_hot_query_indexes),
+    (3, _migration_3_occupancy_ledger),
+    (4, _migration_4_bookings_end_date_index),
+    (5, _migration_5_bookings_pagination_indexes),
+    (6, _migration_6_member_search_index),
+    (7, _migration_7_dashboard_summary),
+    (8, _migration_8_bcrypt_rounds_setting),
+    (9, _migration_9_member_changes_log),
+    (10, _migration_10_quitinete_cooldown_setting),
+    (11, _migration_11_financial_ledger),
+    (12, _migration_12_booking_units),
+    (13, _migration_13_quota_renewals),
+    (14, _migration_14_ledger_without_member),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# --- Consultas de Uso Frequente ---
+# Executadas a cada rerun; todas precisam resolver por índice (nunca SCAN na tabela inteira).
+SQL_PEAK_OCCUPANCY = "SELECT COALESCE(MAX(booked), 0) FROM occupancy WHERE accommodation_type = ? AND night >= ? AND night < ?"
+SQL_UPSERT_OCCUPANCY = """INSERT INTO occupancy (accommodation_type, night, booked) VALUES (?, ?, ?)
+                          ON CONFLICT (accommodation_type, night) DO UPDATE SET booked = booked + excluded.booked"""
+SQL_DASHBOARD_KPIS = """SELECT s.total_members, s.paid_simple_members * s.simple_quota_price + s.paid_premium_members * s.premium_quota_price,
+                               s.total_units, (SELECT COALESCE(SUM(booked), 0) FROM occupancy WHERE night >= ? AND night < ?)
+                        FROM dashboard_summary s WHERE s.id = 1"""
+SQL_UPCOMING_CHECKINS = """SELECT b.start_date as 'Check-in', m.full_name as 'Sócio', b.accommodation_type as 'Acomodação', u.unit as 'Unidade'
+                   FROM bookings b JOIN members m ON b.member_id = m.id LEFT JOIN booking_units u ON u.booking_id = b.id
+                   WHERE b.status = 'Confirmada' AND b.start_date BETWEEN ? AND ? ORDER BY b.start_date ASC"""
+SQL_COUNT_MEMBER_BOOKINGS_IN_PERIOD = "SELECT COUNT(*) FROM bookings WHERE member_id = ? AND status = 'Confirmada' AND start_date <= ? AND end_date >= ?"
+SQL_LAST_QUITINETE_CHECKOUT = "SELECT MAX(end_date) FROM bookings WHERE member_id = ? AND accommodation_type = 'Quitinete Premium' AND status = 'Confirmada'"
+SQL_MEMBER_TRANSACTIONS = """SELECT transaction_date as Data, description as Descrição, amount as Valor,
+                                  SUM(amount) OVER (ORDER BY transaction_date, id ROWS UNBOUNDED PRECEDING) as Saldo
+                           FROM transactions WHERE member_id = ? ORDER BY transaction_date DESC, id DESC"""
+SQL_MEMBER_BALANCE = "SELECT balance, transactions, last_transaction_date FROM member_balances WHERE member_id = ?"
+SQL_MONTHLY_REVENUE = "SELECT month, quota_type, amount FROM monthly_revenue WHERE month >= ? AND month <= ?"
+# CROSS JOIN fixa bookings como laço externo: com estatísticas do ANALYZE o planejador preferia varrer members inteira
+SQL_CALENDAR_EVENTS = """SELECT b.id, m.full_name || ' (' || b.accommodation_type || COALESCE(' #' || u.unit, '') || ')', b.start_date, b.end_date
+                         FROM bookings b CROSS JOIN members m ON b.member_id = m.id LEFT JOIN booking_units u ON u.booking_id = b.id
+                         WHERE b.status = 'Confirmada' AND b.end_date > ? AND b.start_date < ?"""
+SQL_UNIT_PREVIOUS_STAY = "SELECT end_date FROM booking_units WHERE accommodation_type = ? AND unit = ? AND start_date < ? ORDER BY start_date DESC LIMIT 1"
+SQL_UNIT_NEXT_STAY = "SELECT start_date FROM booking_units WHERE accommodation_type = ? AND unit = ? AND start_date >= ? ORDER BY start_date LIMIT 1"
+SQL_DUE_RENEWALS = "SELECT id, end_date FROM members WHERE end_date >= ? AND end_date <= ? ORDER BY end_date, id"
+SQL_MEMBER_DEPENDENTS = "SELECT id, full_name as 'Nome Completo' FROM dependents WHERE member_id = ?"
+BOOKING_RULE_SETTINGS = ('special_holiday_fee_simple', 'special_holiday_fee_premium', 'quitinete_cooldown_days')
+SQL_SPECIAL_HOLIDAYS_IN_PERIOD = "SELECT name FROM holidays WHERE type = 'Especial' AND start_date < ? AND end_date > ? ORDER BY start_date"
+SQL_BOOKING_MEMBER = """SELECT quota_type, allowance_days, used_days, (SELECT COUNT(*) FROM dependents d WHERE d.member_id = m.id)
+                        FROM members m WHERE m.id = ?"""
+SQL_QUITINETE_COOLDOWN_CONFLICT = """SELECT start_date, end_date FROM bookings
+                                     WHERE member_id = ? AND status = 'Confirmada' AND accommodation_type = 'Quitinete Premium'
+                                       AND start_date < ? AND end_date > ? ORDER BY end_date DESC LIMIT 1"""
+
+# Nome -> (SQL, parâmetros de exemplo) usados na verificação dos planos de execução
+HOT_QUERIES = {
+    "check_availability": (SQL_PEAK_OCCUPANCY, ('Suíte Média', '2026-02-13', '2026-02-20')),
+    "get_dashboard_kpis": (SQL_DASHBOARD_KPIS, ('2026-02-01', '2026-03-03')),
+    "get_upcoming_checkins": (SQL_UPCOMING_CHECKINS, ('2026-02-01', '2026-02-08')),
+    "has_booking_in_bimester": (SQL_COUNT_MEMBER_BOOKINGS_IN_PERIOD, (1, '2026-02-28', '2026-01-01')),
+    "get_last_quitinete_checkout_date": (SQL_LAST_QUITINETE_CHECKOUT, (1,)),
+    "get_transactions_for_member": (SQL_MEMBER_TRANSACTIONS, (1,)),
+    "get_member_balance": (SQL_MEMBER_BALANCE, (1,)),
+    "get_monthly_revenue": (SQL_MONTHLY_REVENUE, ('2025-03', '2026-02')),
+    "get_dependents": (SQL_MEMBER_DEPENDENTS, (1,)),
+    "renew_quotas": (SQL_DUE_RENEWALS, ('0001-01-01', '2026-02-01')),
+    "get_bookings_for_calendar": (SQL_CALENDAR_EVENTS, ('2026-02-01', '2026-03-15')),
+    "add_booking (unidade anterior)": (SQL_UNIT_PREVIOUS_STAY, ('Suíte Média', 1, '2026-02-20')),
+    "add_booking (unidade seguinte)": (SQL_UNIT_NEXT_STAY, ('Suíte Média', 1, '2026-02-20')),
+    "evaluate_booking (sócio)": (SQL_BOOKING_MEMBER, (1,)),
+    "evaluate_booking (feriados)": (SQL_SPECIAL_HOLIDAYS_IN_PERIOD, ('2026-02-20', '2026-02-13')),
+    "evaluate_booking (Quitinete)": (SQL_QUITINETE_COOLDOWN_CONFLICT, (1, '2026-03-20', '2026-01-14')),
+}
+
+def explain_query_plan(sql, params=()):
+    with get_connection() as conn:
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+def find_full_scans():
+    """Retorna {consulta: plano} para cada consulta de HOT_QUERIES que caiu em SCAN de tabela."""
+    regressions = {}
+    for name, (sql, params) in HOT_QUERIES.items():
+        plan = explain_query_plan(sql, params)
+        # SCAN (subquery-N) percorre o resultado já filtrado de uma subconsulta (p.ex. funções de janela), não uma tabela
+        if any(step.startswith("SCAN") and not step.startswith("SCAN (subquery") for step in plan):
+            regressions[name] = plan
+    return regressions
+
 # --- Funções de CRUD para Usuários do Sistema ---
 def add_system_user(username, password_hash, first_name, last_name, email, role):
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO users (username, password_hash, first_name, last_name, email, role) VALUES (?, ?, ?, ?, ?, ?)", (username, password_hash, first_name, last_name, email, role))
-            conn.commit()
+        run_write(lambda cursor: cursor.execute("INSERT INTO users (username, password_hash, first_name, last_name, email, role) VALUES (?, ?, ?, ?, ?, ?)",
+                                                (username, password_hash, first_name, last_name, email, role)), 'users')
         return True
     except sqlite3.IntegrityError: return False
+@cached_read('users')
 def get_system_users():
-    with sqlite3.connect(DB_FILE) as conn: return pd.read_sql_query("SELECT id, username, first_name, last_name, email, role FROM users", conn)
+    with get_connection() as conn: return pd.read_sql_query("SELECT id, username, first_name, last_name, email, role FROM users", conn)
 def update_system_user(user_id, first_name, last_name, email, role):
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("UPDATE users SET first_name = ?, last_name = ?, email = ?, role = ? WHERE id = ?", (first_name, last_name, email, role, user_id))
-            conn.commit()
-        return cursor.rowcount > 0
+        return run_write(lambda cursor: cursor.execute("UPDATE users SET first_name = ?, last_name = ?, email = ?, role = ? WHERE id = ?",
+                                                       (first_name, last_name, email, role, user_id)).rowcount > 0, 'users')
     except sqlite3.Error: return False
 def delete_system_user(user_id):
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
-            conn.commit()
-        return cursor.rowcount > 0
+        return run_write(lambda cursor: cursor.execute("DELETE FROM users WHERE id = ?", (user_id,)).rowcount > 0, 'users')
     except sqlite3.Error: return False
 def update_password(user_id, new_password_hash):
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_password_hash, user_id))
-            conn.commit()
-        return cursor.rowcount > 0
+        return run_write(lambda cursor: cursor.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_password_hash, user_id)).rowcount > 0, 'users')
     except sqlite3.Error: return False
 
+def get_user_credentials(username):
+    """Dados de login do usuário, incluindo o hash da senha. Nunca passa por cache."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute("SELECT id, username, role, password_hash FROM users WHERE username = ?", (username,))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
 # --- Funções de CRUD para Membros (Sócios) ---
+SQL_INSERT_MEMBER = """INSERT INTO members (full_name, cpf, email, phone, birth_date, address, quota_type, usage_plan,
+                                            allowance_days, used_days, start_date, end_date, payment_status)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
 def add_member(full_name, cpf, email, phone, birth_date, address, quota_type, usage_plan, start_date, end_date, payment_status):
     try:
         allowance_days = PLAN_ALLOWANCE_DAYS.get(usage_plan, 0)
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""INSERT INTO members (full_name, cpf, email, phone, birth_date, address, quota_type, usage_plan, 
-                                    allowance_days, used_days, start_date, end_date, payment_status)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (full_name, cpf, email, phone, birth_date, address, quota_type, usage_plan, 
-                 allowance_days, 0, start_date, end_date, payment_status))
-            conn.commit()
+        run_write(lambda cursor: cursor.execute(SQL_INSERT_MEMBER,
+            (full_name, cpf, email, phone, birth_date, address, quota_type, usage_plan,
+             allowance_days, 0, start_date, end_date, payment_status)), 'members')
         return True
     except sqlite3.IntegrityError: return False
+def find_existing_members(cpfs, emails):
+    """CPFs e emails (dentre os informados) que já pertencem a algum sócio."""
+    with get_connection() as conn:
+        existing_cpfs, existing_emails = set(), set()
+        for start in range(0, max(len(cpfs), len(emails)), 500):
+            cpf_batch, email_batch = list(cpfs[start:start + 500]), list(emails[start:start + 500])
+            if cpf_batch:
+                existing_cpfs.update(row[0] for row in conn.execute(f"SELECT cpf FROM members WHERE cpf IN ({','.join('?' * len(cpf_batch))})", cpf_batch))
+            if email_batch:
+                existing_emails.update(row[0] for row in conn.execute(f"SELECT email FROM members WHERE email IN ({','.join('?' * len(email_batch))})", email_batch))
+    return existing_cpfs, existing_emails
+def add_members_bulk(members):
+    """Insere vários sócios em uma transação. `members` é uma lista de tuplas na ordem de add_member.
+    Retorna os índices das linhas recusadas pelo banco (CPF/email duplicado)."""
+    rows = [(full_name, cpf, email, phone, birth_date, address, quota_type, usage_plan,
+             PLAN_ALLOWANCE_DAYS.get(usage_plan, 0), 0, start_date, end_date, payment_status)
+            for full_name, cpf, email, phone, birth_date, address, quota_type, usage_plan, start_date, end_date, payment_status in members]
+    def insert(cursor):
+        cursor.execute("SAVEPOINT bulk")
+        try:
+            cursor.executemany(SQL_INSERT_MEMBER, rows)
+            cursor.execute("RELEASE bulk")
+            return []
+        except sqlite3.IntegrityError:
+            # Algum conflito surgiu depois da validação: refaz linha a linha para isolar as recusadas
+            cursor.execute("ROLLBACK TO bulk")
+            cursor.execute("RELEASE bulk")
+        failed = []
+        for index, row in enumerate(rows):
+            try: cursor.execute(SQL_INSERT_MEMBER, row)
+            except sqlite3.IntegrityError: failed.append(index)
+        return failed
+    return run_write(insert, 'members')
+@cached_read('members')
 def get_all_members():
-    with sqlite3.connect(DB_FILE) as conn: return pd.read_sql_query("SELECT id as ID, full_name as 'Nome Completo', cpf as CPF, email as Email, phone as Telefone, quota_type as Cota FROM members ORDER BY full_name", conn)
+    with get_connection() as conn: return pd.read_sql_query("SELECT id as ID, full_name as 'Nome Completo', cpf as CPF, email as Email, phone as Telefone, quota_type as Cota FROM members ORDER BY full_name", conn)
+MEMBER_SEARCH_COLUMNS = "m.id as ID, m.full_name as 'Nome Completo', m.cpf as CPF, m.email as Email, m.phone as Telefone, m.quota_type as Cota"
+def search_members(term, limit=50):
+    """Busca ranqueada de sócios por nome, email (palavras, sem acentos) ou trecho de CPF/telefone."""
+    words = re.findall(r'\w+', term or '')
+    if not words: return pd.DataFrame(columns=['ID', 'Nome Completo', 'CPF', 'Email', 'Telefone', 'Cota'])
+    digits = ''.join(re.findall(r'\d', term))
+    if digits and len(digits) >= 3 and not re.search(r'[^\W\d_]', term):
+        # Só números: busca de substring no índice trigram (CPF e telefone são armazenados sem máscara)
+        query = f"""SELECT {MEMBER_SEARCH_COLUMNS} FROM members_trigram t JOIN members m ON m.id = t.rowid
+                    WHERE members_trigram MATCH ? ORDER BY t.rank LIMIT ?"""
+        match = '"' + digits + '"'
+    else:
+        query = f"""SELECT {MEMBER_SEARCH_COLUMNS} FROM members_fts f JOIN members m ON m.id = f.rowid
+                    WHERE members_fts MATCH ? ORDER BY f.rank LIMIT ?"""
+        match = ' '.join(f'"{word}"*' for word in words)
+    with get_connection() as conn:
+        return pd.read_sql_query(query, conn, params=(match, limit))
+MEMBER_CHANGES_KEPT = 10000
+def get_member_names():
+    """Todos os (id, nome) e a última posição de member_changes, lidos na mesma transação."""
+    with get_connection() as conn:
+        conn.execute("BEGIN")
+        rows = conn.execute("SELECT id, full_name FROM members").fetchall()
+        last_change = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM member_changes").fetchone()[0]
+        return rows, last_change
+def get_member_changes(after_change):
+    """Sócios alterados depois da posição after_change: ([(id, nome ou None se removido)], última posição).
+    Retorna None se o registro já foi podado além dessa posição (é preciso reler tudo)."""
+    with get_connection() as conn:
+        conn.execute("BEGIN")
+        first = conn.execute("SELECT MIN(seq) FROM member_changes").fetchone()[0]
+        if first is not None and first > after_change + 1: return None
+        rows = conn.execute("""SELECT c.seq, c.member_id, m.full_name FROM member_changes c LEFT JOIN members m ON m.id = c.member_id
+                               WHERE c.seq > ? ORDER BY c.seq""", (after_change,)).fetchall()
+    latest = {member_id: name for _, member_id, name in rows}
+    return list(latest.items()), (rows[-1][0] if rows else after_change)
+def prune_member_changes(keep=MEMBER_CHANGES_KEPT, through=None):
+    """Apaga o registro de alterações, mantendo as `keep` mais recentes (para índices de outros processos ainda
+    atrasados) e, com `through`, nada depois dessa posição (a última já aplicada pelo índice que está podando)."""
+    if through is None:
+        run_write(lambda cursor: cursor.execute("DELETE FROM member_changes WHERE seq <= (SELECT MAX(seq) FROM member_changes) - ?", (keep,)))
+    else:
+        run_write(lambda cursor: cursor.execute("DELETE FROM member_changes WHERE seq <= MIN(?, (SELECT MAX(seq) FROM member_changes) - ?)", (through, keep)))
+@cached_read('members')
 def get_member_by_id(member_id):
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.row_factory = sqlite3.Row
+    with get_connection() as conn:
         cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
         cursor.execute("SELECT * FROM members WHERE id = ?", (member_id,))
         data = cursor.fetchone()
         return dict(data) if data else None
 def update_member(member_id, full_name, cpf, email, phone, birth_date, address, quota_type, usage_plan, payment_status):
     try:
         allowance_days = PLAN_ALLOWANCE_DAYS.get(usage_plan, 0)
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""UPDATE members SET full_name=?, cpf=?, email=?, phone=?, birth_date=?, address=?,
-                   quota_type=?, usage_plan=?, payment_status=?, allowance_days=? WHERE id=?""", 
-                   (full_name, cpf, email, phone, birth_date, address, quota_type, usage_plan, payment_status, allowance_days, member_id))
-            conn.commit()
-        return cursor.rowcount > 0
+        return run_write(lambda cursor: cursor.execute("""UPDATE members SET full_name=?, cpf=?, email=?, phone=?, birth_date=?, address=?,
+               quota_type=?, usage_plan=?, payment_status=?, allowance_days=? WHERE id=?""",
+               (full_name, cpf, email, phone, birth_date, address, quota_type, usage_plan, payment_status, allowance_days, member_id)).rowcount > 0, 'members')
     except sqlite3.IntegrityError: return False
 def delete_member(member_id):
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM members WHERE id = ?", (member_id,))
-            conn.commit()
-        return cursor.rowcount > 0
+        return run_write(lambda cursor: cursor.execute("DELETE FROM members WHERE id = ?", (member_id,)).rowcount > 0, 'members')
     except sqlite3.Error: return False
+@cached_read('members')
 def get_member_allowance(member_id):
-    with sqlite3.connect(DB_FILE) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT allowance_days, used_days FROM members WHERE id = ?", (member_id,))
         result = cursor.fetchone()
@@ -177,99 +831,201 @@ def get_member_allowance(member_id):
         return None
 
 # --- Funções de CRUD para Dependentes ---
+@cached_read('dependents')
 def get_dependents(member_id):
-    with sqlite3.connect(DB_FILE) as conn: return pd.read_sql_query("SELECT id, full_name as 'Nome Completo' FROM dependents WHERE member_id = ?", conn, params=(member_id,))
+    with get_connection() as conn: return pd.read_sql_query(SQL_MEMBER_DEPENDENTS, conn, params=(member_id,))
 def add_dependent(member_id, full_name):
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO dependents (member_id, full_name) VALUES (?, ?)", (member_id, full_name))
-            conn.commit()
+        run_write(lambda cursor: cursor.execute("INSERT INTO dependents (member_id, full_name) VALUES (?, ?)", (member_id, full_name)), 'dependents')
         return True
     except sqlite3.Error: return False
 def delete_dependent(dependent_id):
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM dependents WHERE id = ?", (dependent_id,))
-            conn.commit()
-        return cursor.rowcount > 0
+        return run_write(lambda cursor: cursor.execute("DELETE FROM dependents WHERE id = ?", (dependent_id,)).rowcount > 0, 'dependents')
     except sqlite3.Error: return False
 
 # --- Funções para o Dashboard ---
-def get_dashboard_kpis():
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM members")
-        total_members = cursor.fetchone()[0]
-        cursor.execute("SELECT value FROM settings WHERE key = 'simple_quota_price'")
-        simple_price = float(cursor.fetchone()[0])
-        cursor.execute("SELECT value FROM settings WHERE key = 'premium_quota_price'")
-        premium_price = float(cursor.fetchone()[0])
-        cursor.execute("SELECT COUNT(*) FROM members WHERE quota_type = 'Simples' AND payment_status = 'Pago'")
-        paid_simple_members = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM members WHERE quota_type = 'Premium' AND payment_status = 'Pago'")
-        paid_premium_members = cursor.fetchone()[0]
-        total_revenue = (paid_simple_members * simple_price) + (paid_premium_members * premium_price)
-        cursor.execute("SELECT SUM(total_quantity) FROM accommodations")
-        total_units = cursor.fetchone()[0] or 0
-        total_available_room_nights = total_units * 30
-        start_period = date.today()
-        end_period = start_period + timedelta(days=30)
-        cursor.execute("SELECT SUM(julianday(end_date) - julianday(start_date)) FROM bookings WHERE status = 'Confirmada' AND start_date < ? AND end_date > ?", (end_period.isoformat(), start_period.isoformat()))
-        booked_nights = cursor.fetchone()[0] or 0
-        occupancy_rate = (booked_nights / total_available_room_nights) * 100 if total_available_room_nights > 0 else 0
-        return {"total_members": total_members, "total_revenue": total_revenue, "occupancy_rate": occupancy_rate}
+# Os contadores vêm de dashboard_summary, mantida por triggers em members, settings e accommodations;
+# a ocupação vem do ledger (noites dentro da janela). Tudo em uma única consulta indexada.
+def rebuild_dashboard_summary(cursor):
+    """Recalcula dashboard_summary do zero com um único agregado (usado na migração e para reparos)."""
+    cursor.execute("""
+        INSERT OR REPLACE INTO dashboard_summary (id, total_members, simple_members, premium_members, paid_simple_members,
+                                                  paid_premium_members, simple_quota_price, premium_quota_price, total_units)
+        SELECT 1, COUNT(*),
+               COALESCE(SUM(quota_type = 'Simples'), 0), COALESCE(SUM(quota_type = 'Premium'), 0),
+               COALESCE(SUM(quota_type = 'Simples' AND payment_status = 'Pago'), 0),
+               COALESCE(SUM(quota_type = 'Premium' AND payment_status = 'Pago'), 0),
+               COALESCE((SELECT CAST(value AS REAL) FROM settings WHERE key = 'simple_quota_price'), 0),
+               COALESCE((SELECT CAST(value AS REAL) FROM settings WHERE key = 'premium_quota_price'), 0),
+               (SELECT COALESCE(SUM(total_quantity), 0) FROM accommodations)
+        FROM members""")
+def get_dashboard_kpis(days=30):
+    start_period = date.today()
+    end_period = start_period + timedelta(days=days)
+    params = (start_period.isoformat(), end_period.isoformat())
+    with get_connection() as conn:
+        row = conn.execute(SQL_DASHBOARD_KPIS, params).fetchone()
+    if row is None:
+        # Linha do resumo ausente: recalculada pela fila de escrita, nunca por uma conexão de leitura do pool
+        run_write(rebuild_dashboard_summary, 'members')
+        with get_connection() as conn:
+            row = conn.execute(SQL_DASHBOARD_KPIS, params).fetchone()
+    total_members, total_revenue, total_units, booked_nights = row
+    total_available_room_nights = total_units * days
+    occupancy_rate = (booked_nights / total_available_room_nights) * 100 if total_available_room_nights > 0 else 0
+    return {"total_members": total_members, "total_revenue": total_revenue, "occupancy_rate": occupancy_rate}
+@cached_read('members')
 def get_members_by_quota_type():
-    with sqlite3.connect(DB_FILE) as conn: return pd.read_sql_query("SELECT quota_type, COUNT(*) as count FROM members GROUP BY quota_type", conn)
+    with get_connection() as conn:
+        return pd.read_sql_query("""SELECT 'Premium' as quota_type, premium_members as count FROM dashboard_summary WHERE id = 1 AND premium_members > 0
+                                    UNION ALL
+                                    SELECT 'Simples', simple_members FROM dashboard_summary WHERE id = 1 AND simple_members > 0""", conn)
 def get_upcoming_checkins(days=7):
-    with sqlite3.connect(DB_FILE) as conn:
+    with get_connection() as conn:
         start_period = date.today()
         end_period = start_period + timedelta(days=days)
-        query = """SELECT b.start_date as 'Check-in', m.full_name as 'Sócio', b.accommodation_type as 'Acomodação' FROM bookings b
-                   JOIN members m ON b.member_id = m.id WHERE b.status = 'Confirmada' AND b.start_date BETWEEN ? AND ? ORDER BY b.start_date ASC"""
-        return pd.read_sql_query(query, conn, params=(start_period.isoformat(), end_period.isoformat()))
+        return pd.read_sql_query(SQL_UPCOMING_CHECKINS, conn, params=(start_period.isoformat(), end_period.isoformat()))
+
+# --- Ledger Financeiro ---
+# Saldo por sócio (member_balances) e receita por mês e tipo de cota (monthly_revenue), mantidos por triggers
+# em transactions na mesma transação do lançamento; as leituras são uma busca por chave.
+def rebuild_ledger(cursor):
+    """Recalcula saldos e receita mensal a partir de transactions (usado na migração e para reparos)."""
+    cursor.execute("DELETE FROM member_balances")
+    cursor.execute("""
+        INSERT INTO member_balances (member_id, balance, transactions, last_transaction_date)
+        SELECT member_id, running_balance, running_count, transaction_date FROM (
+            SELECT member_id, transaction_date,
+                   SUM(amount) OVER history AS running_balance, COUNT(*) OVER history AS running_count,
+                   ROW_NUMBER() OVER (PARTITION BY member_id ORDER BY transaction_date DESC, id DESC) AS newest
+            FROM transactions WHERE member_id IS NOT NULL
+            WINDOW history AS (PARTITION BY member_id ORDER BY transaction_date, id ROWS UNBOUNDED PRECEDING))
+        WHERE newest = 1""")
+    cursor.execute("DELETE FROM monthly_revenue")
+    cursor.execute("""
+        INSERT INTO monthly_revenue (month, quota_type, amount, transactions)
+        SELECT substr(transaction_date, 1, 7), COALESCE(quota_type, 'Outros'), SUM(amount), COUNT(*)
+        FROM transactions GROUP BY 1, 2""")
+def repair_ledger():
+    """Reconstrói o ledger numa única transação; use após importações que não passaram pelos triggers."""
+    run_write(rebuild_ledger, 'transactions')
+@cached_read('transactions')
+def get_member_balance(member_id):
+    with get_connection() as conn:
+        row = conn.execute(SQL_MEMBER_BALANCE, (member_id,)).fetchone()
+    balance, transactions, last_transaction_date = row or (0.0, 0, None)
+    return {"balance": balance, "transactions": transactions, "last_transaction_date": last_transaction_date}
+@cached_read('transactions')
+def get_monthly_revenue(months=12):
+    """Receita dos últimos `months` meses (incluindo o atual) por tipo de cota, com a variação sobre o mês anterior."""
+    current = pd.Period(date.today(), freq='M')
+    periods = pd.period_range(current - months, current, freq='M')  # um mês a mais, só para a variação do primeiro
+    with get_connection() as conn:
+        revenue = pd.read_sql_query(SQL_MONTHLY_REVENUE, conn, params=(str(periods[0]), str(periods[-1])))
+    # 'Outros': lançamentos sem sócio, que também entram no Total
+    table = (revenue.pivot_table(index='month', columns='quota_type', values='amount', aggfunc='sum')
+                    .reindex(index=[str(period) for period in periods], columns=[*QUOTA_PLANS, 'Outros'], fill_value=0).fillna(0))
+    table['Total'] = revenue.groupby('month')['amount'].sum().reindex(table.index, fill_value=0)
+    table['Variação (%)'] = (table['Total'].pct_change() * 100).replace([np.inf, -np.inf], np.nan).round(1)
+    table.index.name, table.columns.name = 'Mês', None
+    return table.iloc[1:]
 
 # --- Funções de CRUD para Reservas (Bookings) ---
+# Ledger de ocupação: uma linha por (acomodação, noite) com o número de unidades confirmadas.
+# Mantido por add_booking/update_booking_status na mesma transação que altera a reserva.
+def _booking_nights(start_date, end_date):
+    start = date.fromisoformat(start_date)
+    return [(start + timedelta(days=i)).isoformat() for i in range((date.fromisoformat(end_date) - start).days)]
+def _apply_occupancy(cursor, accommodation_type, start_date, end_date, delta):
+    cursor.executemany(SQL_UPSERT_OCCUPANCY, [(accommodation_type, night, delta) for night in _booking_nights(start_date, end_date)])
+    if delta < 0:
+        cursor.execute("DELETE FROM occupancy WHERE accommodation_type = ? AND night >= ? AND night < ? AND booked <= 0", (accommodation_type, start_date, end_date))
+def _available_units(cursor, accommodation_type, start_date, end_date):
+    cursor.execute("SELECT total_quantity FROM accommodations WHERE type = ?", (accommodation_type,))
+    result = cursor.fetchone()
+    if not result: return 0
+    cursor.execute(SQL_PEAK_OCCUPANCY, (accommodation_type, start_date, end_date))
+    return result[0] - cursor.fetchone()[0]
+def rebuild_occupancy(cursor):
+    """Recalcula o ledger inteiro a partir das reservas confirmadas."""
+    cursor.execute("DELETE FROM occupancy")
+    cursor.execute("""
+        INSERT INTO occupancy (accommodation_type, night, booked)
+        WITH RECURSIVE nights (accommodation_type, night, end_date) AS (
+            SELECT accommodation_type, start_date, end_date FROM bookings WHERE status = 'Confirmada' AND start_date < end_date
+            UNION ALL
+            SELECT accommodation_type, date(night, '+1 day'), end_date FROM nights WHERE date(night, '+1 day') < end_date
+        )
+        SELECT accommodation_type, night, COUNT(*) FROM nights GROUP BY accommodation_type, night""")
+
 def check_availability(accommodation_type, start_date, end_date):
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT total_quantity FROM accommodations WHERE type = ?", (accommodation_type,))
-        result = cursor.fetchone()
-        if not result: return 0
-        total_quantity = result[0]
-        cursor.execute("SELECT COUNT(*) FROM bookings WHERE accommodation_type = ? AND status = 'Confirmada' AND start_date < ? AND end_date > ?", (accommodation_type, end_date, start_date))
-        booked_quantity = cursor.fetchone()[0]
-        return total_quantity - booked_quantity
+    """Unidades livres em todas as noites do período (capacidade menos o pico de ocupação)."""
+    with get_connection() as conn:
+        return _available_units(conn.cursor(), accommodation_type, start_date, end_date)
+def get_availability_matrix(start_date, end_date):
+    """Unidades livres por noite (linhas) e tipo de acomodação (colunas) no período [start_date, end_date)."""
+    with get_connection() as conn:
+        totals = pd.read_sql_query("SELECT type, total_quantity FROM accommodations ORDER BY type", conn).set_index('type')['total_quantity']
+        booked = pd.read_sql_query("SELECT accommodation_type, night, booked FROM occupancy WHERE night >= ? AND night < ?", conn, params=(start_date, end_date))
+    nights = [date.fromisoformat(night) for night in _booking_nights(start_date, end_date)]
+    occupied = (booked.assign(night=pd.to_datetime(booked['night']).dt.date)
+                      .pivot_table(index='night', columns='accommodation_type', values='booked', aggfunc='sum')
+                      .reindex(index=nights, columns=totals.index, fill_value=0).fillna(0))
+    free = (totals - occupied).clip(lower=0).astype(int)
+    free.index.name, free.columns.name = 'Noite', 'Acomodação'
+    return free
+def find_free_stretches(availability_matrix, min_nights=1):
+    """Trechos contíguos de noites com ao menos uma unidade livre, por acomodação, com no mínimo min_nights noites."""
+    nights = np.asarray(availability_matrix.index)
+    stretches = []
+    for accommodation_type in availability_matrix.columns:
+        free = np.concatenate(([0], (availability_matrix[accommodation_type].to_numpy() > 0).astype(np.int8), [0]))
+        edges = np.diff(free)
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        for first, last in zip(starts, ends):
+            if last - first >= min_nights:
+                stretches.append({"Acomodação": accommodation_type, "Check-in": nights[first],
+                                  "Check-out": nights[last - 1] + timedelta(days=1), "Noites": int(last - first)})
+    return pd.DataFrame(stretches, columns=["Acomodação", "Check-in", "Check-out", "Noites"])
 def add_booking(member_id, accommodation_type, start_date, end_date):
     try:
         start = date.fromisoformat(start_date)
         end = date.fromisoformat(end_date)
         duration = (end - start).days
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("BEGIN TRANSACTION")
+        if duration <= 0: return False
+        def book(cursor):
+            # Verificação e inserção no mesmo comando da fila de escrita: duas recepções não vendem a última unidade
+            if _available_units(cursor, accommodation_type, start_date, end_date) <= 0: return False
             cursor.execute("INSERT INTO bookings (member_id, accommodation_type, start_date, end_date, status) VALUES (?, ?, ?, ?, ?)", (member_id, accommodation_type, start_date, end_date, 'Confirmada'))
+            _apply_occupancy(cursor, accommodation_type, start_date, end_date, 1)
+            _require_unit(cursor, cursor.lastrowid, accommodation_type, start_date, end_date)
             cursor.execute("UPDATE members SET used_days = used_days + ? WHERE id = ?", (duration, member_id))
-            conn.commit()
-        return True
+            return True
+        return run_write(book, 'bookings', 'members')
+    except _NoVacancy: return False
     except sqlite3.Error as e:
         print(f"Erro no banco de dados ao adicionar reserva: {e}")
-        conn.rollback()
         return False
 def get_all_bookings_for_calendar():
-    with sqlite3.connect(DB_FILE) as conn:
+    with get_report_connection() as conn:
         query = """SELECT b.id, b.start_date as start, b.end_date as end, m.full_name as member_name, b.accommodation_type as accommodation
                    FROM bookings b JOIN members m ON b.member_id = m.id WHERE b.status = 'Confirmada'"""
         df = pd.read_sql_query(query, conn)
     df['title'] = df['member_name'] + " (" + df['accommodation'] + ")"
     return df.to_dict('records')
+def get_bookings_for_calendar(range_start, range_end):
+    """Eventos compactos das reservas confirmadas que aparecem no intervalo [range_start, range_end)."""
+    with get_connection() as conn:
+        rows = conn.execute(SQL_CALENDAR_EVENTS, (range_start, range_end)).fetchall()
+    return [{"id": booking_id, "title": title, "start": start, "end": end} for booking_id, title, start, end in rows]
+@cached_read('accommodations')
 def get_accommodation_types():
-    with sqlite3.connect(DB_FILE) as conn:
+    with get_connection() as conn:
         df = pd.read_sql_query("SELECT type FROM accommodations ORDER BY type", conn)
     return df['type'].tolist()
 def get_all_bookings_with_details():
-    with sqlite3.connect(DB_FILE) as conn:
+    with get_report_connection() as conn:
         query = """
             SELECT
                 b.id as 'ID Reserva', m.full_name as 'Sócio', b.accommodation_type as 'Acomodação',
@@ -277,122 +1033,463 @@ def get_all_bookings_with_details():
             FROM bookings b JOIN members m ON b.member_id = m.id ORDER BY b.start_date DESC
         """
         return pd.read_sql_query(query, conn)
+BOOKINGS_PAGE_SIZE = 50
+def get_bookings_page(status=None, name_prefix=None, start_from=None, start_to=None, accommodation_type=None, after=None, page_size=BOOKINGS_PAGE_SIZE):
+    """Uma página de reservas (check-in mais recente primeiro) com os filtros aplicados no SQL.
+    `after` é o cursor (check-in, id) da última linha da página anterior. Retorna (DataFrame, próximo cursor ou None)."""
+    conditions, params = [], []
+    if status:
+        conditions.append("b.status = ?"); params.append(status)
+    if name_prefix:
+        escaped = name_prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions.append("m.full_name LIKE ? ESCAPE '\\'"); params.append(escaped + '%')
+    if start_from:
+        conditions.append("b.start_date >= ?"); params.append(start_from)
+    if start_to:
+        conditions.append("b.start_date <= ?"); params.append(start_to)
+    if accommodation_type:
+        conditions.append("b.accommodation_type = ?"); params.append(accommodation_type)
+    if after:
+        conditions.append("(b.start_date, b.id) < (?, ?)"); params.extend(after)
+    query = f"""
+        SELECT
+            b.id as 'ID Reserva', m.full_name as 'Sócio', b.accommodation_type as 'Acomodação',
+            b.start_date as 'Check-in', b.end_date as 'Check-out', b.status as 'Status', u.unit as 'Unidade', u.locked as 'Fixada'
+        FROM bookings b JOIN members m ON b.member_id = m.id LEFT JOIN booking_units u ON u.booking_id = b.id
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        ORDER BY b.start_date DESC, b.id DESC LIMIT ?"""
+    with get_connection() as conn:
+        df = pd.read_sql_query(query, conn, params=(*params, page_size + 1))
+    if len(df) <= page_size: return df, None
+    df = df.iloc[:page_size]
+    last = df.iloc[-1]
+    return df, (last['Check-in'], int(last['ID Reserva']))
 def update_booking_status(booking_id, new_status):
-    try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT member_id, start_date, end_date, status FROM bookings WHERE id = ?", (booking_id,))
-            booking_data = cursor.fetchone()
-            if not booking_data: return False
-            member_id, start_str, end_str, old_status = booking_data
-            if old_status == new_status: return True
-            cursor.execute("BEGIN TRANSACTION")
-            cursor.execute("UPDATE bookings SET status = ? WHERE id = ?", (new_status, booking_id))
-            if old_status == 'Confirmada' and new_status == 'Cancelada':
-                duration = (date.fromisoformat(end_str) - date.fromisoformat(start_str)).days
-                cursor.execute("UPDATE members SET used_days = used_days - ? WHERE id = ?", (duration, member_id))
-            conn.commit()
+    def change(cursor):
+        cursor.execute("SELECT member_id, accommodation_type, start_date, end_date, status FROM bookings WHERE id = ?", (booking_id,))
+        booking_data = cursor.fetchone()
+        if not booking_data: return False
+        member_id, accommodation_type, start_str, end_str, old_status = booking_data
+        if old_status == new_status: return True
+        duration = (date.fromisoformat(end_str) - date.fromisoformat(start_str)).days
+        cursor.execute("UPDATE bookings SET status = ? WHERE id = ?", (new_status, booking_id))
+        # Só reservas confirmadas ocupam unidades e gastam diárias (como na renovação): entrar em 'Confirmada'
+        # sempre soma, sair sempre devolve, qualquer que seja o outro status
+        if new_status == 'Confirmada':
+            # Reconfirmar volta a ocupar unidades: só se ainda houver vaga em todas as noites
+            if _available_units(cursor, accommodation_type, start_str, end_str) <= 0: raise _NoVacancy()
+            _apply_occupancy(cursor, accommodation_type, start_str, end_str, 1)
+            _require_unit(cursor, booking_id, accommodation_type, start_str, end_str)
+            cursor.execute("UPDATE members SET used_days = used_days + ? WHERE id = ?", (duration, member_id))
+        elif old_status == 'Confirmada':
+            _apply_occupancy(cursor, accommodation_type, start_str, end_str, -1)
+            cursor.execute("DELETE FROM booking_units WHERE booking_id = ?", (booking_id,))
+            cursor.execute("UPDATE members SET used_days = used_days - ? WHERE id = ?", (duration, member_id))
         return True
+    try:
+        return run_write(change, 'bookings', 'members')
+    except _NoVacancy: return False
     except sqlite3.Error as e:
         print(f"Erro ao atualizar status da reserva: {e}")
-        conn.rollback()
         return False
 
+# --- Alocação de Unidades ---
+# Cada reserva confirmada ocupa uma unidade concreta do seu tipo (booking_units). A escolha é best-fit: a unidade cujo
+# intervalo livre que contém a estadia é o menor, para que os intervalos longos continuem inteiros. Reservas futuras
+# não fixadas podem ser redistribuídas (reoptimize_units); as em andamento e as fixadas (locked) não mudam de unidade.
+UNBOUNDED_GAP = 10 ** 6  # dias; lado do intervalo sem nenhuma estadia antes/depois
+
+class _NoVacancy(Exception):
+    """Levantada dentro de um comando de escrita para desfazê-lo quando não há unidade para todas as reservas."""
+
+def _fit_score(start, end, previous_end, next_start):
+    """Menor é melhor: tamanho do intervalo livre ocupado pela estadia e, no empate, a folga antes dela (datas em ordinais)."""
+    before = start - previous_end if previous_end is not None else UNBOUNDED_GAP
+    after = next_start - end if next_start is not None else UNBOUNDED_GAP
+    return before + after, before
+
+class _UnitCalendar:
+    """Estadias de cada unidade de um tipo, ordenadas pelo check-in (datas em ordinais)."""
+    def __init__(self, quantity):
+        self.starts = {unit: [] for unit in range(1, quantity + 1)}
+        self.ends = {unit: [] for unit in range(1, quantity + 1)}
+
+    def place(self, unit, start, end):
+        at = bisect.bisect_left(self.starts[unit], start)
+        self.starts[unit].insert(at, start)
+        self.ends[unit].insert(at, end)
+
+    def best_unit(self, start, end):
+        best = None
+        for unit, starts in self.starts.items():
+            at = bisect.bisect_left(starts, end)  # só a última estadia que começa antes do check-out pode sobrepor
+            previous_end = self.ends[unit][at - 1] if at else None
+            if previous_end is not None and previous_end > start: continue
+            score = _fit_score(start, end, previous_end, starts[at] if at < len(starts) else None)
+            if best is None or score < best[0]: best = (score, unit)
+        return best[1] if best else None
+
+def _accommodation_quantity(cursor, accommodation_type):
+    row = cursor.execute("SELECT total_quantity FROM accommodations WHERE type = ?", (accommodation_type,)).fetchone()
+    return row[0] if row else 0
+
+def _best_unit(cursor, accommodation_type, start_date, end_date):
+    """Unidade best-fit para [start_date, end_date), lendo só as estadias vizinhas de cada unidade; None se nenhuma está livre."""
+    start, end = date.fromisoformat(start_date).toordinal(), date.fromisoformat(end_date).toordinal()
+    best = None
+    for unit in range(1, _accommodation_quantity(cursor, accommodation_type) + 1):
+        previous = cursor.execute(SQL_UNIT_PREVIOUS_STAY, (accommodation_type, unit, end_date)).fetchone()
+        previous_end = date.fromisoformat(previous[0]).toordinal() if previous else None
+        if previous_end is not None and previous_end > start: continue
+        following = cursor.execute(SQL_UNIT_NEXT_STAY, (accommodation_type, unit, end_date)).fetchone()
+        score = _fit_score(start, end, previous_end, date.fromisoformat(following[0]).toordinal() if following else None)
+        if best is None or score < best[0]: best = (score, unit)
+    return best[1] if best else None
+
+def _require_unit(cursor, booking_id, accommodation_type, start_date, end_date):
+    """Atribui uma unidade à reserva (já confirmada); se as vagas estão fragmentadas entre unidades, redistribui as
+    reservas futuras do tipo antes de desistir."""
+    unit = _best_unit(cursor, accommodation_type, start_date, end_date)
+    if unit is not None:
+        cursor.execute("INSERT OR REPLACE INTO booking_units (booking_id, accommodation_type, unit, start_date, end_date) VALUES (?, ?, ?, ?, ?)",
+                       (booking_id, accommodation_type, unit, start_date, end_date))
+        return unit
+    if _reoptimize_type(cursor, accommodation_type)[1]: raise _NoVacancy()  # a própria reserva entra na redistribuição
+    return cursor.execute("SELECT unit FROM booking_units WHERE booking_id = ?", (booking_id,)).fetchone()[0]
+
+def _reoptimize_type(cursor, accommodation_type, since=None, best_effort=False):
+    """Redistribui em best-fit, por ordem de check-in, as reservas confirmadas do tipo que terminam depois de `since`
+    (hoje, por padrão), exceto as já iniciadas e as fixadas. Retorna (reservas que mudaram de unidade, ids sem unidade).
+    Se alguma reserva ficar sem unidade, nada é gravado e as atribuições atuais continuam valendo; com `best_effort`
+    (reconstrução, sem atribuições anteriores) grava as que couberam."""
+    since = since or date.today().isoformat()
+    quantity = _accommodation_quantity(cursor, accommodation_type)
+    # Estadias já encerradas que cruzam as em andamento também ocupam suas unidades
+    earliest = cursor.execute("SELECT MIN(start_date) FROM bookings WHERE status = 'Confirmada' AND end_date > ? AND accommodation_type = ?",
+                              (since, accommodation_type)).fetchone()[0] or since
+    rows = cursor.execute("""SELECT b.id, b.start_date, b.end_date, u.unit, u.locked FROM bookings b LEFT JOIN booking_units u ON u.booking_id = b.id
+                             WHERE b.status = 'Confirmada' AND b.end_date > ? AND b.accommodation_type = ?""", (min(earliest, since), accommodation_type)).fetchall()
+    calendar, movable = _UnitCalendar(quantity), []
+    for booking_id, start_date, end_date, unit, locked in rows:
+        span = (date.fromisoformat(start_date).toordinal(), date.fromisoformat(end_date).toordinal())
+        if end_date <= since:
+            if unit is not None and unit <= quantity: calendar.place(unit, *span)
+        elif unit is not None and unit <= quantity and (locked or start_date <= since): calendar.place(unit, *span)
+        else: movable.append((span, booking_id, start_date, end_date, unit))
+    movable.sort(key=lambda item: (item[0][0], -item[0][1]))
+    moved, unplaced = [], []
+    for span, booking_id, start_date, end_date, unit in movable:
+        new_unit = calendar.best_unit(*span)
+        if new_unit is None:
+            unplaced.append(booking_id)
+            continue
+        calendar.place(new_unit, *span)
+        if new_unit != unit: moved.append((booking_id, accommodation_type, new_unit, start_date, end_date))
+    if unplaced and not best_effort: return 0, unplaced
+    cursor.executemany("INSERT OR REPLACE INTO booking_units (booking_id, accommodation_type, unit, start_date, end_date) VALUES (?, ?, ?, ?, ?)", moved)
+    return len(moved), unplaced
+
+def rebuild_booking_units(cursor):
+    """Refaz todas as atribuições em best-fit, desde a primeira reserva (usado na migração e para reparos)."""
+    cursor.execute("DELETE FROM booking_units")
+    for (accommodation_type,) in cursor.execute("SELECT type FROM accommodations").fetchall():
+        _reoptimize_type(cursor, accommodation_type, since=date.min.isoformat(), best_effort=True)
+
+def reoptimize_units(accommodation_type=None):
+    """Redistribui as reservas futuras não fixadas para abrir intervalos livres mais longos.
+    Retorna {tipo: {"moved": reservas que mudaram de unidade, "unplaced": reservas que não couberam na nova distribuição}};
+    um tipo com reservas que não couberam mantém as unidades atuais."""
+    def reoptimize(cursor):
+        types = [accommodation_type] if accommodation_type else [row[0] for row in cursor.execute("SELECT type FROM accommodations ORDER BY type")]
+        results = {}
+        for name in types:
+            moved, unplaced = _reoptimize_type(cursor, name)
+            results[name] = {"moved": moved, "unplaced": len(unplaced)}
+        return results
+    return run_write(reoptimize, 'bookings')
+def lock_booking_unit(booking_id, locked=True):
+    """Fixa (ou libera) a unidade da reserva, que deixa de ser movida pela redistribuição."""
+    try:
+        return run_write(lambda cursor: cursor.execute("UPDATE booking_units SET locked = ? WHERE booking_id = ?", (int(locked), booking_id)).rowcount > 0, 'bookings')
+    except sqlite3.Error: return False
+def get_committed_units():
+    """Maior número de unidades ocupadas ao mesmo tempo, de hoje em diante, por tipo de acomodação."""
+    with get_connection() as conn:
+        rows = conn.execute("SELECT accommodation_type, MAX(booked) FROM occupancy WHERE night >= ? GROUP BY accommodation_type",
+                            (date.today().isoformat(),)).fetchall()
+    return dict(rows)
+def _set_accommodation_quantity(cursor, accommodation_type, quantity):
+    committed = cursor.execute(SQL_PEAK_OCCUPANCY, (accommodation_type, date.today().isoformat(), date.max.isoformat())).fetchone()[0]
+    if quantity < committed: raise _NoVacancy()
+    previous = _accommodation_quantity(cursor, accommodation_type)
+    updated = cursor.execute("UPDATE accommodations SET total_quantity = ? WHERE type = ?", (quantity, accommodation_type)).rowcount
+    # Unidades removidas: as reservas delas (mesmo fixadas) são redistribuídas entre as que ficaram
+    if quantity < previous and _reoptimize_type(cursor, accommodation_type)[1]: raise _NoVacancy()
+    return updated > 0
+
 # --- Funções para a Página de Configurações ---
+@cached_read('settings')
 def get_all_settings():
-    with sqlite3.connect(DB_FILE) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT key, value FROM settings")
         settings = {row[0]: row[1] for row in cursor.fetchall()}
         return settings
 def update_setting(key, value):
+    return update_settings({key: value})
+def update_settings(settings):
+    """Grava várias configurações {chave: valor} num único comando."""
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("UPDATE settings SET value = ? WHERE key = ?", (value, key))
-            conn.commit()
+        run_write(lambda cursor: cursor.executemany("UPDATE settings SET value = ? WHERE key = ?", [(value, key) for key, value in settings.items()]), 'settings')
         return True
     except sqlite3.Error: return False
 
+@cached_read('accommodations')
 def get_all_accommodations():
     # --- LINHA CORRIGIDA ---
     # Retorna os nomes de coluna originais do banco de dados ('type', 'total_quantity')
-    with sqlite3.connect(DB_FILE) as conn: 
+    with get_connection() as conn: 
         return pd.read_sql_query("SELECT type, total_quantity FROM accommodations", conn)
 
 def update_accommodation_quantity(accommodation_type, quantity):
+    """Altera a quantidade de unidades; recusa (False) quantidades abaixo das reservas futuras já confirmadas."""
+    return update_accommodation_quantities({accommodation_type: quantity})
+def update_accommodation_quantities(quantities):
+    """Grava as quantidades {tipo: quantidade} num único comando; nada é gravado se alguma ficar abaixo das reservas futuras."""
+    def update(cursor):
+        return all([_set_accommodation_quantity(cursor, accommodation_type, int(quantity)) for accommodation_type, quantity in quantities.items()])
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("UPDATE accommodations SET total_quantity = ? WHERE type = ?", (quantity, accommodation_type))
-            conn.commit()
-        return cursor.rowcount > 0
-    except sqlite3.Error: return False
+        return run_write(update, 'accommodations', 'bookings')
+    except (_NoVacancy, sqlite3.Error): return False
+@cached_read('holidays')
 def get_all_holidays():
-    with sqlite3.connect(DB_FILE) as conn: return pd.read_sql_query("SELECT id, name as Nome, start_date as Início, end_date as Fim, type as Tipo FROM holidays ORDER BY start_date", conn)
+    with get_connection() as conn: return pd.read_sql_query("SELECT id, name as Nome, start_date as Início, end_date as Fim, type as Tipo FROM holidays ORDER BY start_date", conn)
 def add_holiday(name, start_date, end_date, holiday_type):
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO holidays (name, start_date, end_date, type) VALUES (?, ?, ?, ?)", (name, start_date, end_date, holiday_type))
-            conn.commit()
+        run_write(lambda cursor: cursor.execute("INSERT INTO holidays (name, start_date, end_date, type) VALUES (?, ?, ?, ?)", (name, start_date, end_date, holiday_type)), 'holidays')
         return True
     except sqlite3.Error: return False
 def delete_holiday(holiday_id):
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM holidays WHERE id = ?", (holiday_id,))
-            conn.commit()
-        return cursor.rowcount > 0
+        return run_write(lambda cursor: cursor.execute("DELETE FROM holidays WHERE id = ?", (holiday_id,)).rowcount > 0, 'holidays')
     except sqlite3.Error: return False
+def _bimester_bounds(target_date):
+    bimester_start_month = (target_date.month - 1) // 2 * 2 + 1
+    bimester_start_date = date(target_date.year, bimester_start_month, 1)
+    if bimester_start_month == 11: bimester_end_date = date(target_date.year, 12, 31)
+    else: bimester_end_date = date(target_date.year, bimester_start_month + 2, 1) - timedelta(days=1)
+    return bimester_start_date, bimester_end_date
+# --- Índice de Feriados ---
+# Feriados ordenados por início em arrays NumPy, consultados por busca binária em vez de SQL.
+# Cada feriado ocupa as noites [início, fim), a mesma convenção das reservas.
+class HolidayIndex:
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: (row.start, row.end))
+        self.holidays = rows
+        self.starts = np.array([row.start for row in rows], dtype='datetime64[D]')
+        self.ends = np.array([row.end for row in rows], dtype='datetime64[D]')
+        self.ids = np.array([row.id for row in rows], dtype=np.int64)
+        self.types = np.array([row.type for row in rows], dtype=object)
+        # Maior fim entre os feriados que começam até cada posição: limita a busca de feriados longos que ainda cobrem a data
+        self.max_ends = np.maximum.accumulate(self.ends) if rows else self.ends
+
+    def overlapping(self, start_date, end_date, holiday_type=None):
+        """Feriados que se sobrepõem às noites [start_date, end_date), em ordem de início."""
+        start, end = np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D')
+        first = int(np.searchsorted(self.max_ends, start, side='right'))
+        last = int(np.searchsorted(self.starts, end, side='left'))
+        return [holiday for holiday, holiday_end in zip(self.holidays[first:last], self.ends[first:last])
+                if holiday_end > start and (holiday_type is None or holiday.type == holiday_type)]
+
+    def tag_dates(self, dates):
+        """Para cada data, o id e o tipo do feriado que cobre aquela noite (-1 e None quando não há)."""
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        ids, types = np.full(dates.shape, -1, dtype=np.int64), np.full(dates.shape, None, dtype=object)
+        if not len(self.holidays): return ids, types
+        position = np.searchsorted(self.starts, dates, side='right') - 1
+        pending = position >= 0
+        while pending.any():
+            candidates = np.where(pending, position, 0)
+            covered = pending & (dates < self.ends[candidates])
+            ids[covered], types[covered] = self.ids[candidates[covered]], self.types[candidates[covered]]
+            # Não coberta pelo feriado mais recente: tenta o anterior enquanto algum feriado anterior ainda alcança a data
+            position = position - 1
+            pending = pending & ~covered & (position >= 0)
+            pending[pending] = dates[pending] < self.max_ends[position[pending]]
+        return ids, types
+
+HolidayRow = namedtuple('HolidayRow', 'id name start end type')
+
+@cached_read('holidays', maxsize=4)
+def get_holiday_index():
+    with get_connection() as conn:
+        rows = conn.execute("SELECT id, name, start_date, end_date, type FROM holidays").fetchall()
+    return HolidayIndex([HolidayRow(row[0], row[1], row[2], row[3], row[4]) for row in rows])
+
+def get_holidays_for_calendar(range_start, range_end):
+    """Feriados do intervalo como eventos de fundo do calendário."""
+    return [{"title": holiday.name, "start": holiday.start, "end": holiday.end, "display": "background",
+             "color": "#f4a261" if holiday.type == 'Especial' else "#a8dadc"}
+            for holiday in get_holiday_index().overlapping(range_start, range_end)]
+
 def has_booking_in_bimester(member_id, target_date_str):
-    target_date = date.fromisoformat(target_date_str)
-    bimester = (target_date.month - 1) // 2
-    year = target_date.year
-    bimester_start_month = bimester * 2 + 1
-    bimester_end_month = bimester_start_month + 1
-    bimester_start_date = date(year, bimester_start_month, 1)
-    if bimester_end_month == 12: bimester_end_date = date(year, 12, 31)
-    else: bimester_end_date = date(year, bimester_end_month + 1, 1) - timedelta(days=1)
-    with sqlite3.connect(DB_FILE) as conn:
+    bimester_start_date, bimester_end_date = _bimester_bounds(date.fromisoformat(target_date_str))
+    with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("""SELECT COUNT(*) FROM bookings WHERE member_id = ? AND status = 'Confirmada' AND start_date <= ? AND end_date >= ?""",
+        cursor.execute(SQL_COUNT_MEMBER_BOOKINGS_IN_PERIOD,
                        (member_id, bimester_end_date.isoformat(), bimester_start_date.isoformat()))
         count = cursor.fetchone()[0]
     return count > 0
 def get_last_quitinete_checkout_date(member_id):
-    with sqlite3.connect(DB_FILE) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT MAX(end_date) FROM bookings WHERE member_id = ? AND accommodation_type = 'Quitinete Premium' AND status = 'Confirmada'", (member_id,))
+        cursor.execute(SQL_LAST_QUITINETE_CHECKOUT, (member_id,))
         result = cursor.fetchone()[0]
     return date.fromisoformat(result) if result else None
 def is_booking_in_special_holiday(start_date_str, end_date_str):
-    with sqlite3.connect(DB_FILE) as conn:
+    return bool(get_holiday_index().overlapping(start_date_str, end_date_str, 'Especial'))
+
+# --- Regras de Reserva ---
+# Todas as regras de uma reserva avaliadas numa única conexão e num único snapshot de leitura.
+def _evaluate_candidate(cursor, member_id, member, settings, accommodation_type, start_date, end_date):
+    verdict = {"ok": False, "reasons": [], "fees": {}, "total_fee": 0.0, "nights": 0, "available_units": 0,
+               "accommodation_type": accommodation_type, "start_date": start_date, "end_date": end_date}
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    nights = verdict["nights"] = (end - start).days
+    if nights <= 0:
+        verdict["reasons"].append("A data de Check-out deve ser posterior à de Check-in.")
+        return verdict
+    quota_type, allowance_days, used_days, dependents = member
+    if allowance_days - used_days < nights:
+        verdict["reasons"].append(f"Saldo insuficiente! O sócio tem {allowance_days - used_days} diárias, mas a reserva requer {nights}.")
+    verdict["available_units"] = _available_units(cursor, accommodation_type, start_date, end_date)
+    if verdict["available_units"] <= 0:
+        verdict["reasons"].append(f"Indisponível! Todas as unidades de {accommodation_type} já estão reservadas neste período.")
+    bimester_start, bimester_end = _bimester_bounds(start)
+    cursor.execute(SQL_COUNT_MEMBER_BOOKINGS_IN_PERIOD, (member_id, bimester_end.isoformat(), bimester_start.isoformat()))
+    if cursor.fetchone()[0] > 0:
+        verdict["reasons"].append(f"O sócio já tem uma reserva no bimestre de {bimester_start.strftime('%m/%Y')} a {bimester_end.strftime('%m/%Y')}.")
+    if accommodation_type == 'Quitinete Premium':
+        cooldown = timedelta(days=int(float(settings.get('quitinete_cooldown_days', 0))))
+        cursor.execute(SQL_QUITINETE_COOLDOWN_CONFLICT, (member_id, (end + cooldown).isoformat(), (start - cooldown).isoformat()))
+        conflict = cursor.fetchone()
+        if conflict:
+            verdict["reasons"].append(f"A Quitinete exige {cooldown.days} dias de intervalo entre estadias do mesmo sócio "
+                                      f"(estadia de {conflict[0]} a {conflict[1]}).")
+    # Pelo cursor da avaliação, não por get_holiday_index(): uma segunda conexão do pool aqui pode esgotá-lo
+    # (cada avaliação já segura uma) e a leitura sairia do snapshot das demais regras
+    cursor.execute(SQL_SPECIAL_HOLIDAYS_IN_PERIOD, (end_date, start_date))
+    special_holidays = [row[0] for row in cursor.fetchall()]
+    if special_holidays:
+        fee_key = 'special_holiday_fee_premium' if quota_type == 'Premium' else 'special_holiday_fee_simple'
+        people = 1 + dependents
+        per_person = float(settings.get(fee_key, 0))
+        fee = per_person * people
+        verdict["fees"]["special_holiday"] = {"holidays": special_holidays, "people": people, "per_person": per_person, "amount": fee}
+        verdict["total_fee"] = fee
+    verdict["ok"] = not verdict["reasons"]
+    return verdict
+
+def evaluate_bookings(member_id, candidates):
+    """Avalia várias reservas candidatas [(acomodação, check-in, check-out)] do mesmo sócio num único snapshot.
+    Cada veredito traz ok, reasons (motivos de recusa), fees/total_fee (taxas de feriado especial), nights e available_units."""
+    with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM holidays WHERE type = 'Especial' AND start_date < ? AND end_date > ?", (end_date_str, start_date_str))
-        count = cursor.fetchone()[0]
-    return count > 0
+        cursor.execute("BEGIN")
+        cursor.execute(SQL_BOOKING_MEMBER, (member_id,))
+        member = cursor.fetchone()
+        if member is None:
+            return [{"ok": False, "reasons": ["Sócio não encontrado."], "fees": {}, "total_fee": 0.0, "nights": 0, "available_units": 0,
+                     "accommodation_type": t, "start_date": s, "end_date": e} for t, s, e in candidates]
+        cursor.execute(f"SELECT key, value FROM settings WHERE key IN ({', '.join('?' * len(BOOKING_RULE_SETTINGS))})", BOOKING_RULE_SETTINGS)
+        settings = dict(cursor.fetchall())
+        return [_evaluate_candidate(cursor, member_id, member, settings, accommodation_type, str(start_date), str(end_date))
+                for accommodation_type, start_date, end_date in candidates]
+
+def evaluate_booking(member_id, accommodation_type, start_date, end_date):
+    return evaluate_bookings(member_id, [(accommodation_type, start_date, end_date)])[0]
 
 # --- Funções para Transações Financeiras ---
 def add_transaction(member_id, amount, description, transaction_date):
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO transactions (member_id, amount, description, transaction_date) VALUES (?, ?, ?, ?)", (member_id, amount, description, transaction_date))
-            conn.commit()
+        run_write(lambda cursor: cursor.execute("INSERT INTO transactions (member_id, amount, description, transaction_date) VALUES (?, ?, ?, ?)",
+                                                (member_id, amount, description, transaction_date)), 'transactions')
         return True
     except sqlite3.Error: return False
+@cached_read('transactions')
 def get_transactions_for_member(member_id):
-    with sqlite3.connect(DB_FILE) as conn:
-        query = "SELECT transaction_date as Data, description as Descrição, amount as Valor FROM transactions WHERE member_id = ? ORDER BY transaction_date DESC"
-        df = pd.read_sql_query(query, conn, params=(member_id,))
+    with get_connection() as conn:
+        df = pd.read_sql_query(SQL_MEMBER_TRANSACTIONS, conn, params=(member_id,))
     return df
 def update_member_payment_status(member_id, new_status):
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("UPDATE members SET payment_status = ? WHERE id = ?", (new_status, member_id))
-            conn.commit()
-        return cursor.rowcount > 0
-    except sqlite3.Error: return False
\ No newline at end of file
+        return run_write(lambda cursor: cursor.execute("UPDATE members SET payment_status = ? WHERE id = ?", (new_status, member_id)).rowcount > 0, 'members')
+    except sqlite3.Error: return False
+
+# --- Renovação de Cotas ---
+# Cotas vencidas ganham mais um período (365 dias, como no cadastro) a partir do fim da validade anterior.
+# Cada lote é um único comando da fila de escrita com instruções set-based: registra o período e a cobrança em
+# quota_renewals e só então atualiza os sócios cujo registro acabou de entrar. Como o UNIQUE (member_id, period_start)
+# descarta períodos já renovados, rodar de novo (ou em dois processos ao mesmo tempo) não renova ninguém duas vezes.
+QUOTA_TERM = '+365 days'
+RENEWAL_CHUNK = 500
+_ALLOWANCE_BY_PLAN = "CASE m.usage_plan " + " ".join("WHEN ? THEN ?" for _ in PLAN_ALLOWANCE_DAYS) + " ELSE 0 END"
+SQL_INSERT_RENEWALS = f"""
+    INSERT OR IGNORE INTO quota_renewals (member_id, period_start, period_end, quota_type, usage_plan, allowance_days, unused_days, price)
+    SELECT m.id, m.end_date, date(m.end_date, '{QUOTA_TERM}'), m.quota_type, m.usage_plan, {_ALLOWANCE_BY_PLAN},
+           MAX(m.allowance_days - m.used_days, 0),
+           COALESCE((SELECT CAST(value AS REAL) FROM settings
+                     WHERE key = CASE m.quota_type WHEN 'Premium' THEN 'premium_quota_price' ELSE 'simple_quota_price' END), 0)
+    FROM json_each(?) due JOIN members m ON m.id = json_extract(due.value, '$[0]') AND m.end_date = json_extract(due.value, '$[1]')"""
+# O uso do novo período já conta as reservas confirmadas que começam nele (feitas antes da renovação), e só elas:
+# as de períodos seguintes, já agendadas, ficam para as próximas renovações
+SQL_APPLY_RENEWALS = """
+    UPDATE members SET start_date = r.period_start, end_date = r.period_end, allowance_days = r.allowance_days, payment_status = 'Pendente',
+           used_days = (SELECT CAST(COALESCE(SUM(julianday(b.end_date) - julianday(b.start_date)), 0) AS INTEGER) FROM bookings b
+                        WHERE b.member_id = members.id AND b.status = 'Confirmada'
+                          AND b.start_date >= r.period_start AND b.start_date < r.period_end)
+    FROM quota_renewals r WHERE r.member_id = members.id AND r.id > ?"""
+
+def _renew_chunk(cursor, due):
+    last_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM quota_renewals").fetchone()[0]
+    cursor.execute(SQL_INSERT_RENEWALS, (*[value for plan in PLAN_ALLOWANCE_DAYS.items() for value in plan], json.dumps(due)))
+    cursor.execute(SQL_APPLY_RENEWALS, (last_id,))
+    return cursor.execute("SELECT member_id, price FROM quota_renewals WHERE id > ?", (last_id,)).fetchall()
+def get_due_renewals(until=None, since=None):
+    """(id, fim da validade) das cotas que vencem entre since e until (padrão: todas as vencidas até hoje)."""
+    with get_connection() as conn:
+        return conn.execute(SQL_DUE_RENEWALS, (since or date.min.isoformat(), until or date.today().isoformat())).fetchall()
+def renew_quotas(until=None, since=None, chunk_size=RENEWAL_CHUNK):
+    """Renova as cotas que vencem entre since e until, em lotes de chunk_size sócios, até nenhuma ficar vencida
+    (uma cota parada há mais de um período recebe um registro por período). Restaura as diárias do plano
+    (PLAN_ALLOWANCE_DAYS), volta o pagamento para 'Pendente' e registra a cobrança pelo preço atual da cota.
+    Retorna {"renewed": períodos renovados, "members": sócios renovados, "charged": total cobrado}."""
+    renewals = []
+    while True:
+        due, renewed_in_pass = get_due_renewals(until, since), 0
+        for first in range(0, len(due), chunk_size):
+            chunk = due[first:first + chunk_size]
+            renewed = run_write(lambda cursor: _renew_chunk(cursor, chunk), 'members', 'quota_renewals')
+            renewals.extend(renewed)
+            renewed_in_pass += len(renewed)
+        if renewed_in_pass == 0: break  # nada vencido (ou só períodos que outro processo já renovou)
+    return {"renewed": len(renewals), "members": len({member_id for member_id, _ in renewals}),
+            "charged": sum(price for _, price in renewals)}
+
+if __name__ == "__main__":
+    # Verificação dos planos de execução: python database.py (sai com código 1 se houver SCAN)
+    # python database.py --rebuild-ledger também recalcula saldos e receita mensal antes da verificação
+    # python database.py --renew-quotas renova as cotas vencidas até hoje (rotina noturna; pode rodar mais de uma vez)
+    import sys
+    init_db()
+    if "--rebuild-ledger" in sys.argv:
+        repair_ledger()
+        print("Ledger financeiro reconstruído.")
+    if "--renew-quotas" in sys.argv:
+        renewal = renew_quotas()
+        print(f"{renewal['members']} sócio(s), {renewal['renewed']} período(s) renovado(s); R$ {renewal['charged']:.2f} em cobranças.")
+    full_scans = find_full_scans()
+    for name, plan in full_scans.items():
+        print(f"SCAN detectado em {name}: {' | '.join(plan)}")
+    print("Planos de execução OK." if not full_scans else f"{len(full_scans)} consulta(s) com SCAN.")
+    sys.exit(1 if full_scans else 0)
@@ -0,0 +1,129 @@
+# generate_sample_data.py
+# Gera um banco socio40graus.db sintético e reprodutível (mesma semente -> mesmos dados) para testes de carga e benchmarks.
+import argparse
+import os
+from datetime import date, timedelta
+import numpy as np
+import database as db
+
+# Escala -> (reservas, sócios)
+SCALES = {"1k": (1_000, 200), "100k": (100_000, 10_000), "1m": (1_000_000, 50_000)}
+YEARS_OF_HISTORY = 5
+BATCH_SIZE = 50_000
+
+FIRST_NAMES = ["Ana", "João", "Maria", "José", "Francisca", "Antônio", "Luíza", "Carlos", "Paula", "Pedro", "Juliana", "Lucas",
+               "Fernanda", "Marcos", "Patrícia", "Rafael", "Aline", "Bruno", "Camila", "Diego", "Letícia", "Gabriel", "Beatriz", "Thiago"]
+LAST_NAMES = ["Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes", "Costa",
+              "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Fernandes", "Vieira", "Barbosa", "Araújo", "Melo"]
+HOLIDAYS = [("Ano Novo", "12-30", "01-02", "Especial"), ("Carnaval", "02-13", "02-18", "Especial"), ("Semana Santa", "04-02", "04-06", "Comum"),
+            ("Corpus Christi", "06-04", "06-08", "Comum"), ("7 de Setembro", "09-04", "09-07", "Especial"), ("Natal", "12-23", "12-27", "Especial")]
+
+def _cpfs(numbers):
+    """CPFs válidos (com dígitos verificadores) a partir de números de 9 dígitos."""
+    digits = (numbers[:, None] // 10 ** np.arange(8, -1, -1)) % 10
+    first = (digits @ np.arange(10, 1, -1)) * 10 % 11 % 10
+    digits = np.column_stack([digits, first])
+    second = (digits @ np.arange(11, 1, -1)) * 10 % 11 % 10
+    digits = np.column_stack([digits, second])
+    return ["".join(map(str, row)) for row in digits]
+
+def _insert(conn, sql, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        conn.executemany(sql, rows[start:start + BATCH_SIZE])
+
+def generate(db_file, scale="1k", seed=40):
+    n_bookings, n_members = SCALES[scale]
+    rng = np.random.default_rng(seed)
+    if os.path.exists(db_file): raise FileExistsError(f"{db_file} já existe; escolha outro arquivo.")
+    db.DB_FILE = db_file
+    db.init_db()
+    today = date.today()
+    history_start = today.replace(month=1, day=1) - timedelta(days=365 * (YEARS_OF_HISTORY - 1))
+    horizon = (today + timedelta(days=365) - history_start).days
+    accommodation_types = db.get_accommodation_types()
+
+    # Quantidade de unidades por tipo para comportar o volume de reservas com a ocupação alvo
+    avg_cycle = 4 + 3.5  # média de intervalo entre estadias + duração média
+    units_per_type = max(2, int(np.ceil(1.25 * n_bookings * avg_cycle / horizon / len(accommodation_types))))
+    bookings_per_unit = int(np.ceil(n_bookings / (units_per_type * len(accommodation_types))))
+
+    with db.get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("UPDATE accommodations SET total_quantity = ? WHERE type = ?", [(units_per_type, t) for t in accommodation_types])
+
+        # Sócios
+        names = [f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]} {i}" for i in range(n_members)]
+        cpfs = _cpfs(rng.choice(999_999_999, size=n_members, replace=False) + 1)
+        quota = rng.choice(["Simples", "Premium"], size=n_members, p=[0.7, 0.3])
+        plan_index = rng.integers(0, 3, size=n_members)
+        starts = [history_start + timedelta(days=int(d)) for d in rng.integers(0, horizon - 365, size=n_members)]
+        members = []
+        for i in range(n_members):
+            plan = db.QUOTA_PLANS[quota[i]][plan_index[i]]
+            members.append((names[i], cpfs[i], f"socio{i}@exemplo.com.br", f"119{rng.integers(10_000_000, 99_999_999)}",
+                            (date(1950, 1, 1) + timedelta(days=int(rng.integers(0, 20000)))).isoformat(), "Rua Exemplo, 40",
+                            str(quota[i]), plan, db.PLAN_ALLOWANCE_DAYS[plan], 0, starts[i].isoformat(),
+                            (starts[i] + timedelta(days=365)).isoformat(), str(rng.choice(["Pago", "Pendente", "Atrasado"], p=[0.75, 0.2, 0.05]))))
+        _insert(conn, db.SQL_INSERT_MEMBER, members)
+
+        # Dependentes (0 a 3 por sócio)
+        dependents = [(member_id, f"Dependente {j + 1} do Sócio {member_id}")
+                      for member_id, count in enumerate(rng.integers(0, 4, size=n_members), start=1) for j in range(count)]
+        _insert(conn, "INSERT INTO dependents (member_id, full_name) VALUES (?, ?)", dependents)
+
+        # Reservas: cada unidade recebe uma sequência de estadias sem sobreposição
+        origin = np.datetime64(history_start.isoformat())
+        types, starts_offset, stays = [], [], []
+        for accommodation_type in accommodation_types:
+            unit_stays = rng.integers(1, 7, size=(units_per_type, bookings_per_unit))
+            unit_ends = np.cumsum(rng.integers(0, 9, size=(units_per_type, bookings_per_unit)) + unit_stays, axis=1)
+            inside = unit_ends <= horizon  # descarta estadias que passariam do horizonte
+            starts_offset.append((unit_ends - unit_stays)[inside]); stays.append(unit_stays[inside])
+            types.append(np.full(inside.sum(), accommodation_type, dtype=object))
+        order = rng.permutation(sum(len(t) for t in types))[:n_bookings]
+        types, starts_offset, stays = np.concatenate(types)[order], np.concatenate(starts_offset)[order], np.concatenate(stays)[order]
+        check_ins = (origin + starts_offset).astype(str)
+        check_outs = (origin + starts_offset + stays).astype(str)
+        member_ids = rng.integers(1, n_members + 1, size=len(order))
+        statuses = np.where(rng.random(len(order)) < 0.9, "Confirmada", "Cancelada")
+        bookings = list(zip(member_ids.tolist(), types.tolist(), check_ins.tolist(), check_outs.tolist(), statuses.tolist()))
+        _insert(conn, "INSERT INTO bookings (member_id, accommodation_type, start_date, end_date, status) VALUES (?, ?, ?, ?, ?)", bookings)
+
+        # Feriados de cada ano do histórico
+        holidays = []
+        for year in range(history_start.year, today.year + 2):
+            for name, start, end, holiday_type in HOLIDAYS:
+                start_year = year - 1 if start > end else year
+                holidays.append((f"{name} {year}", f"{start_year}-{start}", f"{year}-{end}", holiday_type))
+        conn.executemany("INSERT OR IGNORE INTO holidays (name, start_date, end_date, type) VALUES (?, ?, ?, ?)", holidays)
+
+        # Transações: pagamentos de cota e taxas
+        transactions = []
+        for member_id in range(1, n_members + 1):
+            for _ in range(int(rng.integers(1, 4))):
+                paid_on = history_start + timedelta(days=int(rng.integers(0, horizon - 365)))
+                transactions.append((member_id, float(rng.choice([1400.0, 2000.0, 200.0, 100.0])), "Pagamento gerado", paid_on.isoformat()))
+        _insert(conn, "INSERT INTO transactions (member_id, amount, description, transaction_date) VALUES (?, ?, ?, ?)", transactions)
+
+        cursor = conn.cursor()
+        db.rebuild_occupancy(cursor)
+        db.rebuild_booking_units(cursor)
+        db.rebuild_dashboard_summary(cursor)
+        conn.execute("ANALYZE")
+        conn.commit()
+    db.bump_all_data_versions()
+    return {"members": n_members, "bookings": len(bookings), "units_per_type": units_per_type,
+            "dependents": len(dependents), "transactions": len(transactions), "holidays": len(holidays)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um banco de dados sintético do Sócio 40 Graus.")
+    parser.add_argument("--scale", choices=SCALES.keys(), default="1k")
+    parser.add_argument("--output", help="Arquivo do banco a criar (padrão: bench_<escala>.db)")
+    parser.add_argument("--seed", type=int, default=40)
+    args = parser.parse_args()
+    output = args.output or f"bench_{args.scale}.db"
+    summary = generate(output, args.scale, args.seed)
+    print(f"Banco {output} gerado: " + ", ".join(f"{value} {key}" for key, value in summary.items()))
+
+if __name__ == "__main__":
+    main()
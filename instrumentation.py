@@ -0,0 +1,205 @@
+# instrumentation.py
+# Instrumentação opcional de database.py: tempo de cada chamada, SQL executado, linhas retornadas e espera por
+# conexão do pool, guardados num buffer circular em memória. Desligada por padrão (ligue com enable() ou com a
+# variável de ambiente SOCIO40_INSTRUMENTATION=1); enquanto desligada, database.py roda sem nenhum invólucro.
+import functools
+import inspect
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+import pandas as pd
+import database as db
+
+BUFFER_SIZE = 5000
+SLOW_STATEMENT_MS = 50.0
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+# Infraestrutura da própria camada de dados, que não interessa medir como "consulta"
+EXCLUDED_FUNCTIONS = {"get_connection", "get_report_connection", "close_all_connections", "cached_read", "bump_data_version", "get_data_version",
+                      "bump_all_data_versions", "get_schema_version", "explain_query_plan", "submit_write", "run_write"}
+
+_records = deque(maxlen=BUFFER_SIZE)
+_local = threading.local()
+_rerun_ids = itertools.count(1)
+_originals = {}
+_lock = threading.Lock()
+slow_statement_ms = SLOW_STATEMENT_MS
+
+# --- Contexto da Thread ---
+def _frames():
+    if not hasattr(_local, "frames"): _local.frames = []
+    return _local.frames
+
+def _context():
+    return getattr(_local, "rerun", (None, None))
+
+def begin_rerun(page):
+    """Marca o início de um rerun do Streamlit nesta thread; os registros seguintes ficam associados a ele."""
+    _local.rerun = (next(_rerun_ids), page)
+    return _local.rerun[0]
+
+def thread_db_ms():
+    """Tempo acumulado (ms) dentro de funções de database.py nesta thread, usado pelos medidores de profiling.py."""
+    return getattr(_local, "db_ms", 0.0)
+
+# --- Conexão e Cursor Instrumentados ---
+def _explain(conn, sql, params):
+    if not sql.lstrip().upper().startswith(EXPLAINABLE): return None
+    try:
+        cursor = sqlite3.Connection.cursor(conn, sqlite3.Cursor)
+        return "\n".join(row[3] for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall())
+    except (sqlite3.Error, ValueError):
+        return None
+
+class InstrumentedCursor(sqlite3.Cursor):
+    _record = None
+
+    def _track(self, started, rows):
+        record = self._record
+        if record is None: return
+        elapsed = (time.perf_counter() - started) * 1000
+        record["wall_ms"] += elapsed
+        record["rows"] += rows
+        for frame in _frames():
+            frame["db_ms"] += elapsed
+            frame["rows"] += rows
+        if record["plan"] is None and record["wall_ms"] >= slow_statement_ms:
+            record["plan"] = _explain(self.connection, record["sql"], record["params"])
+
+    def _run(self, method, sql, params):
+        rerun, page = _context()
+        frames = _frames()
+        self._record = {"kind": "statement", "rerun": rerun, "page": page, "function": frames[-1]["function"] if frames else None,
+                        "sql": " ".join(sql.split()), "params": params if method is sqlite3.Cursor.execute else None,
+                        "wall_ms": 0.0, "rows": 0, "plan": None, "at": time.time()}
+        for frame in frames: frame["statements"] += 1
+        _records.append(self._record)
+        started = time.perf_counter()
+        result = method(self, sql, params) if params is not None else method(self, sql)
+        self._track(started, max(self.rowcount, 0) if self.description is None else 0)
+        return result
+
+    def execute(self, sql, params=None):
+        return self._run(sqlite3.Cursor.execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self._run(sqlite3.Cursor.executemany, sql, seq_of_params)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._track(started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._track(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._track(started, len(rows))
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        row = super().__next__()
+        self._track(started, 1)
+        return row
+
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+# --- Invólucro das Funções de database.py ---
+def _on_connection_wait(seconds):
+    for frame in _frames(): frame["wait_ms"] += seconds * 1000
+
+def _instrument(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        rerun, page = _context()
+        frames = _frames()
+        frame = {"kind": "call", "rerun": rerun, "page": page, "function": name, "depth": len(frames), "wall_ms": 0.0, "db_ms": 0.0,
+                 "wait_ms": 0.0, "statements": 0, "rows": 0, "at": time.time()}
+        frames.append(frame)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            frame["wall_ms"] = (time.perf_counter() - started) * 1000
+            frames.pop()
+            _records.append(frame)
+            if not frames: _local.db_ms = thread_db_ms() + frame["wall_ms"]
+    return wrapper
+
+def _public_functions():
+    return {name: obj for name, obj in vars(db).items()
+            if inspect.isfunction(obj) and obj.__module__ == db.__name__ and not name.startswith("_") and name not in EXCLUDED_FUNCTIONS}
+
+def is_enabled():
+    return bool(_originals)
+
+def enable():
+    with _lock:
+        if _originals: return
+        for name, func in _public_functions().items():
+            _originals[name] = func
+            setattr(db, name, _instrument(name, func))
+        db.CONNECTION_FACTORY = InstrumentedConnection
+        db.connection_wait_hook = _on_connection_wait
+        db.close_all_connections()  # as próximas conexões já saem instrumentadas
+
+def disable():
+    with _lock:
+        if not _originals: return
+        for name, func in _originals.items(): setattr(db, name, func)
+        _originals.clear()
+        db.CONNECTION_FACTORY = sqlite3.Connection
+        db.connection_wait_hook = None
+        db.close_all_connections()
+
+def clear():
+    _records.clear()
+
+# --- Relatórios ---
+def _frame(kind):
+    return pd.DataFrame([record for record in list(_records) if record["kind"] == kind])
+
+def slowest_statements(limit=20):
+    statements = _frame("statement")
+    if statements.empty: return statements
+    columns = ["wall_ms", "rows", "function", "page", "sql", "plan"]
+    return statements.nlargest(limit, "wall_ms")[columns].reset_index(drop=True)
+
+def calls_by_function():
+    calls = _frame("call")
+    if calls.empty: return calls
+    grouped = calls.groupby("function").agg(chamadas=("wall_ms", "size"), total_ms=("wall_ms", "sum"), p95_ms=("wall_ms", lambda s: s.quantile(0.95)),
+                                            sql=("statements", "sum"), linhas=("rows", "sum"), espera_ms=("wait_ms", "sum"))
+    return grouped.sort_values("total_ms", ascending=False).reset_index()
+
+def rerun_summary(limit=20):
+    """Uma linha por rerun: página, chamadas a database.py, comandos SQL, tempo no banco e espera por conexão."""
+    calls = _frame("call")
+    if calls.empty or calls["rerun"].isna().all(): return pd.DataFrame()
+    # Só chamadas de nível mais alto, para não contar duas vezes as funções chamadas por outras
+    calls = calls[(calls["depth"] == 0) & calls["rerun"].notna()]
+    statements = _frame("statement")
+    summary = calls.groupby(["rerun", "page"]).agg(chamadas=("function", "size"), espera_ms=("wait_ms", "sum"))
+    if not statements.empty:
+        per_rerun = statements.dropna(subset=["rerun"]).groupby(["rerun", "page"]).agg(sql=("sql", "size"), banco_ms=("wall_ms", "sum"), linhas=("rows", "sum"))
+        summary = summary.join(per_rerun, how="left")
+    return summary.sort_index(ascending=False).head(limit).reset_index()
+
+if os.environ.get("SOCIO40_INSTRUMENTATION") == "1": enable()
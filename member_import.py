@@ -0,0 +1,172 @@
+# member_import.py
+# Importação em lote de sócios (CSV/XLSX): leitura em blocos, validação vetorizada e inserção em transações grandes.
+import io
+import re
+import numpy as np
+import pandas as pd
+import database as db
+
+CHUNK_SIZE = 5000
+PAYMENT_STATUSES = ["Pendente", "Pago", "Atrasado"]
+QUOTA_VALIDITY = pd.Timedelta(days=365)
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+
+# Cabeçalhos aceitos no arquivo -> campo interno (comparação sem diferenciar maiúsculas)
+COLUMN_ALIASES = {
+    "full_name": "full_name", "nome completo": "full_name", "nome": "full_name",
+    "cpf": "cpf",
+    "email": "email", "e-mail": "email",
+    "phone": "phone", "telefone": "phone",
+    "birth_date": "birth_date", "data de nascimento": "birth_date",
+    "address": "address", "endereço": "address", "endereco": "address",
+    "quota_type": "quota_type", "tipo de cota": "quota_type", "cota": "quota_type",
+    "usage_plan": "usage_plan", "plano de uso": "usage_plan", "plano": "usage_plan",
+    "start_date": "start_date", "início da validade": "start_date", "inicio da validade": "start_date",
+    "payment_status": "payment_status", "status do pagamento": "payment_status",
+}
+FIELDS = ["full_name", "cpf", "email", "phone", "birth_date", "address", "quota_type", "usage_plan", "start_date", "payment_status"]
+TEMPLATE_COLUMNS = ["Nome Completo", "CPF", "Email", "Telefone", "Data de Nascimento", "Endereço",
+                    "Tipo de Cota", "Plano de Uso", "Início da Validade", "Status do Pagamento"]
+
+def read_chunks(source, file_name, chunk_size=CHUNK_SIZE):
+    """Lê o arquivo em blocos de até chunk_size linhas, sem carregá-lo inteiro na memória."""
+    if file_name.lower().endswith((".xlsx", ".xlsm")):
+        yield from _read_xlsx_chunks(source, chunk_size)
+    else:
+        yield from pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=chunk_size, sep=None, engine="python")
+
+def _read_xlsx_chunks(source, chunk_size):
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise RuntimeError("Importação de XLSX requer o pacote 'openpyxl'.") from e
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(value or "").strip() for value in next(rows, [])]
+        buffer = []
+        for row in rows:
+            buffer.append(["" if value is None else str(value.date() if hasattr(value, "date") else value) for value in row])
+            if len(buffer) == chunk_size:
+                yield pd.DataFrame(buffer, columns=header)
+                buffer = []
+        if buffer: yield pd.DataFrame(buffer, columns=header)
+    finally:
+        workbook.close()
+
+def _normalize_columns(chunk):
+    renamed = chunk.rename(columns=lambda column: COLUMN_ALIASES.get(str(column).strip().lower(), column))
+    for field in FIELDS:
+        if field not in renamed.columns: renamed[field] = ""
+    return renamed[FIELDS].fillna("").astype(str).apply(lambda column: column.str.strip())
+
+def _parse_dates(values):
+    """Aceita AAAA-MM-DD ou DD/MM/AAAA; o restante vira NaT."""
+    iso = pd.to_datetime(values, errors="coerce", format="%Y-%m-%d")
+    return iso.fillna(pd.to_datetime(values, errors="coerce", format="%d/%m/%Y"))
+
+def valid_cpf_mask(cpfs):
+    """Máscara vetorizada de CPFs válidos (11 dígitos, dígitos verificadores corretos, não repetidos)."""
+    mask = cpfs.str.fullmatch(r'\d{11}').fillna(False).to_numpy()
+    valid = np.zeros(len(cpfs), dtype=bool)
+    if not mask.any(): return pd.Series(valid, index=cpfs.index)
+    digits = np.frombuffer("".join(cpfs[mask]).encode("ascii"), dtype=np.uint8).reshape(-1, 11).astype(np.int64) - ord("0")
+    first = (digits[:, :9] @ np.arange(10, 1, -1)) * 10 % 11 % 10
+    second = (digits[:, :10] @ np.arange(11, 1, -1)) * 10 % 11 % 10
+    repeated = (digits == digits[:, :1]).all(axis=1)
+    valid[mask] = (digits[:, 9] == first) & (digits[:, 10] == second) & ~repeated
+    return pd.Series(valid, index=cpfs.index)
+
+def clean_and_validate_cpf(cpf_str):
+    """Valida um CPF digitado nos formulários com as mesmas regras da importação. Retorna (só os dígitos, None) ou (None, erro)."""
+    if not cpf_str: return None, "CPF não pode estar em branco."
+    cleaned = re.sub(r'\D', '', cpf_str)
+    if len(cleaned) != 11: return None, "CPF inválido. Deve conter 11 dígitos."
+    if not valid_cpf_mask(pd.Series([cleaned])).iloc[0]: return None, "CPF inválido (dígitos verificadores)."
+    return cleaned, None
+
+def validate_chunk(chunk, seen_cpfs, seen_emails):
+    """Normaliza e valida um bloco. Retorna (linhas válidas prontas para inserir, linhas recusadas com os erros)."""
+    df = _normalize_columns(chunk)
+    df["cpf"] = df["cpf"].str.replace(r'\D', '', regex=True)
+    df["phone"] = df["phone"].str.replace(r'\D', '', regex=True)
+    df["email"] = df["email"].str.lower()
+    df["payment_status"] = df["payment_status"].replace("", "Pendente")
+    start_dates, birth_dates = _parse_dates(df["start_date"]), _parse_dates(df["birth_date"])
+    valid_pairs = {f"{quota}|{plan}" for quota, plans in db.QUOTA_PLANS.items() for plan in plans}
+
+    errors = pd.Series("", index=df.index)
+    def reject(mask, message):
+        errors.loc[mask] = errors.loc[mask] + message + " "
+    reject(df["full_name"] == "", "Nome Completo em branco.")
+    reject(df["cpf"] == "", "CPF não pode estar em branco.")
+    reject((df["cpf"] != "") & (df["cpf"].str.len() != 11), "CPF inválido. Deve conter 11 dígitos.")
+    reject((df["cpf"].str.len() == 11) & ~valid_cpf_mask(df["cpf"]), "CPF inválido (dígitos verificadores).")
+    reject(df["email"] == "", "Email não pode estar em branco.")
+    reject((df["email"] != "") & ~df["email"].str.match(EMAIL_PATTERN), "Email inválido.")
+    reject(~df["quota_type"].isin(db.QUOTA_PLANS.keys()), "Tipo de Cota deve ser Simples ou Premium.")
+    reject(df["quota_type"].isin(db.QUOTA_PLANS.keys()) & ~(df["quota_type"] + "|" + df["usage_plan"]).isin(valid_pairs), "Plano de Uso incompatível com o Tipo de Cota.")
+    reject(start_dates.isna(), "Início da Validade inválido.")
+    reject((df["birth_date"] != "") & birth_dates.isna(), "Data de Nascimento inválida.")
+    reject(~df["payment_status"].isin(PAYMENT_STATUSES), "Status do Pagamento inválido.")
+    # Repetição só conta contra linhas aceitas: a cópia corrigida de uma linha recusada mais acima ainda entra.
+    # Recusar uma linha por repetição pode liberar outra mais abaixo, então as passadas continuam até estabilizar
+    # (cada passada acerta pelo menos mais uma linha, na ordem do arquivo).
+    clean = errors == ""
+    lines = df.index.to_series()
+    duplicates = {"cpf": (seen_cpfs, "CPF repetido no arquivo."), "email": (seen_emails, "Email repetido no arquivo.")}
+    accepted = clean
+    while True:
+        repeated = {}
+        for column, (seen, message) in duplicates.items():
+            first_accepted = lines[accepted].groupby(df.loc[accepted, column]).min()
+            repeated[column] = (df[column] != "") & ((df[column].map(first_accepted) < lines) | df[column].isin(seen))
+        still_accepted = clean & ~repeated["cpf"] & ~repeated["email"]
+        if still_accepted.equals(accepted): break
+        accepted = still_accepted
+    for column, (seen, message) in duplicates.items():
+        reject(repeated[column], message)
+
+    candidates = errors == ""
+    existing_cpfs, existing_emails = db.find_existing_members(df.loc[candidates, "cpf"].tolist(), df.loc[candidates, "email"].tolist())
+    reject(df["cpf"].isin(existing_cpfs), "CPF já cadastrado.")
+    reject(df["email"].isin(existing_emails), "Email já cadastrado.")
+
+    ok = errors == ""
+    seen_cpfs.update(df.loc[ok, "cpf"])
+    seen_emails.update(df.loc[ok, "email"])
+    valid = df[ok].assign(
+        start_date=start_dates[ok].dt.date.astype(str),
+        end_date=(start_dates[ok] + QUOTA_VALIDITY).dt.date.astype(str),
+        birth_date=birth_dates[ok].dt.date.astype(str).where(birth_dates[ok].notna(), None),
+        address=df.loc[ok, "address"].replace("", None),
+    )
+    rejected = chunk[~ok.to_numpy()].assign(Erros=errors[~ok].str.strip().to_numpy())
+    return valid, rejected
+
+def import_members(source, file_name, chunk_size=CHUNK_SIZE, progress=None):
+    """Importa sócios do arquivo. Retorna (quantidade importada, DataFrame das linhas recusadas com a coluna 'Erros')."""
+    imported, rejected_chunks, seen_cpfs, seen_emails, first_line = 0, [], set(), set(), 2
+    for chunk in read_chunks(source, file_name, chunk_size):
+        chunk.index = range(first_line, first_line + len(chunk))
+        first_line += len(chunk)
+        valid, rejected = validate_chunk(chunk, seen_cpfs, seen_emails)
+        columns = ["full_name", "cpf", "email", "phone", "birth_date", "address", "quota_type", "usage_plan", "start_date", "end_date", "payment_status"]
+        records = list(valid[columns].itertuples(index=False, name=None))
+        failed = db.add_members_bulk(records) if records else []
+        if failed:
+            refused = chunk.loc[valid.index[failed]].assign(Erros="CPF ou Email já cadastrado.")
+            rejected = pd.concat([rejected, refused])
+        imported += len(records) - len(failed)
+        if not rejected.empty: rejected_chunks.append(rejected.rename_axis("Linha").reset_index())
+        if progress: progress(imported, first_line - 2)
+    report = pd.concat(rejected_chunks, ignore_index=True) if rejected_chunks else pd.DataFrame(columns=["Linha", "Erros"])
+    return imported, report
+
+def template_csv():
+    return pd.DataFrame(columns=TEMPLATE_COLUMNS).to_csv(index=False).encode("utf-8")
+
+def report_csv(report):
+    buffer = io.StringIO()
+    report.to_csv(buffer, index=False)
+    return buffer.getvalue().encode("utf-8-sig")
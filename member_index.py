@@ -0,0 +1,143 @@
+# member_index.py
+# Índice compacto de sócios para os seletores das páginas: arrays paralelos de IDs e rótulos, compartilhado entre
+# todas as sessões do servidor e atualizado de forma incremental (apenas os sócios alterados, via member_changes).
+# A busca por prefixo usa uma lista ordenada de palavras dos nomes (sem acentos), então "sil" encontra "Ana Silva".
+import threading
+import unicodedata
+import numpy as np
+import database as db
+
+PICKER_LIMIT = 20
+
+def normalize(text):
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+def _label(member_id, full_name):
+    return f"{full_name} (ID: {member_id})"
+
+class MemberIndex:
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.labels = np.empty(0, dtype=object)
+        self.keys = np.empty(0, dtype=object)      # nome normalizado, usado na ordenação
+        self.alive = np.empty(0, dtype=bool)       # sócios removidos ficam marcados, sem deslocar as posições
+        self.token_keys = np.empty(0, dtype=object)  # palavras dos nomes, ordenadas
+        self.token_rows = np.empty(0, dtype=np.int64)  # posição do sócio de cada palavra
+        self._positions = {}
+        self._sorted_rows = None
+        self._version = None
+        self._last_change = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    # --- Atualização ---
+    def refresh(self):
+        """Aplica as alterações de sócios desde a última leitura; sem escrita em members, custa uma comparação."""
+        version = db.get_data_version('members')
+        if version == self._version: return
+        with self._lock:
+            if version == self._version: return
+            changes = db.get_member_changes(self._last_change) if self._last_change is not None else None
+            if changes is None:
+                rows, self._last_change = db.get_member_names()
+                self._reset()
+                self._apply(rows)
+            else:
+                rows, self._last_change = changes
+                self._apply(rows)
+            # A cada atualização, não só na releitura completa: sem isso o registro só cresce
+            if rows: db.prune_member_changes(through=self._last_change)
+            self._version = version
+
+    def _reset(self):
+        self.ids, self.labels, self.keys = np.empty(0, dtype=np.int64), np.empty(0, dtype=object), np.empty(0, dtype=object)
+        self.alive, self.token_keys, self.token_rows = np.empty(0, dtype=bool), np.empty(0, dtype=object), np.empty(0, dtype=np.int64)
+        self._positions = {}
+
+    def _apply(self, rows):
+        if not rows: return
+        changed = [self._positions[member_id] for member_id, _ in rows if member_id in self._positions]
+        if changed:
+            keep = ~np.isin(self.token_rows, changed)
+            self.token_keys, self.token_rows = self.token_keys[keep], self.token_rows[keep]
+        new_ids, new_labels, new_keys = [], [], []
+        token_keys, token_rows = [], []
+        for member_id, full_name in rows:
+            row = self._positions.get(member_id)
+            if full_name is None:
+                if row is not None: self.alive[row] = False
+                continue
+            if row is None:
+                row = len(self.ids) + len(new_ids)
+                self._positions[member_id] = row
+                new_ids.append(member_id); new_labels.append(_label(member_id, full_name)); new_keys.append(normalize(full_name))
+            else:
+                self.labels[row], self.keys[row], self.alive[row] = _label(member_id, full_name), normalize(full_name), True
+            for word in set(normalize(full_name).split()):
+                token_keys.append(word); token_rows.append(row)
+        if new_ids:
+            self.ids = np.concatenate([self.ids, np.array(new_ids, dtype=np.int64)])
+            self.labels = np.concatenate([self.labels, np.array(new_labels, dtype=object)])
+            self.keys = np.concatenate([self.keys, np.array(new_keys, dtype=object)])
+            self.alive = np.concatenate([self.alive, np.ones(len(new_ids), dtype=bool)])
+        if token_keys:
+            # Intercala as palavras novas (já ordenadas) na lista ordenada existente
+            token_keys, token_rows = np.array(token_keys, dtype=object), np.array(token_rows, dtype=np.int64)
+            order = np.argsort(token_keys, kind="stable")
+            token_keys, token_rows = token_keys[order], token_rows[order]
+            at = np.searchsorted(self.token_keys, token_keys)
+            self.token_keys = np.insert(self.token_keys, at, token_keys)
+            self.token_rows = np.insert(self.token_rows, at, token_rows)
+        self._sorted_rows = None
+
+    # --- Consulta ---
+    def label(self, member_id):
+        row = self._positions.get(member_id)
+        return self.labels[row] if row is not None else f"Sócio removido (ID: {member_id})"
+
+    def search(self, query, limit=PICKER_LIMIT):
+        """IDs dos até `limit` sócios cujo nome tem palavras começando pelos termos digitados (ou o próprio ID)."""
+        query = (query or "").strip()
+        terms = normalize(query).split()
+        with self._lock:
+            return self._search(query, terms, limit)
+
+    def _search(self, query, terms, limit):
+        if not terms:
+            if self._sorted_rows is None:
+                alive_rows = np.flatnonzero(self.alive)
+                self._sorted_rows = alive_rows[np.argsort(self.keys[alive_rows], kind="stable")]
+            return self.ids[self._sorted_rows[:limit]].tolist()
+        if query.isdigit():
+            row = self._positions.get(int(query))
+            return [int(query)] if row is not None and self.alive[row] else []
+        start = np.searchsorted(self.token_keys, terms[0], side="left")
+        end = np.searchsorted(self.token_keys, terms[0] + "\uffff", side="left")
+        candidates = np.unique(self.token_rows[start:end])
+        candidates = candidates[self.alive[candidates]]
+        # Nomes que começam pelo termo vêm primeiro; depois, ordem alfabética
+        keys = self.keys[candidates]
+        starts_with = np.array([not key.startswith(terms[0]) for key in keys], dtype=bool)
+        candidates = candidates[np.lexsort((keys, starts_with))]
+        results = []
+        for row in candidates:
+            words = self.keys[row].split()
+            if all(any(word.startswith(term) for word in words) for term in terms[1:]):
+                results.append(int(self.ids[row]))
+                if len(results) == limit: break
+        return results
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_index():
+    """Índice do banco atual, atualizado com as últimas alterações de sócios."""
+    index = _indexes.get(db.DB_FILE)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.setdefault(db.DB_FILE, MemberIndex())
+    index.refresh()
+    return index
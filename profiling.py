@@ -0,0 +1,168 @@
+# profiling.py
+# Modo de profiling dos reruns do Streamlit: mede cada rerun completo e cada seção (aba) das páginas, separando o
+# tempo gasto em database.py (medido por instrumentation.py) do tempo de montagem dos widgets. Cada rerun vira uma
+# linha em profiling_history.jsonl, marcada com a versão implantada, e opcionalmente os reruns mais lentos de cada
+# página são gravados em pstats (python -m pstats profiles/<arquivo>). Desligado por padrão; ligue pelo painel
+# Desempenho ou com SOCIO40_PROFILING=1.
+import cProfile
+import functools
+import heapq
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+import instrumentation
+
+HISTORY_FILE = "profiling_history.jsonl"
+HISTORY_ROWS = 20000
+HISTORY_MAX_BYTES = 10 * 1024 * 1024  # acima disso o histórico vira profiling_history.jsonl.1 (o anterior é descartado)
+PROFILE_DIR = "profiles"
+PROFILES_KEPT_PER_PAGE = 5
+
+enabled = False
+cprofile_enabled = False
+_local = threading.local()
+_lock = threading.Lock()
+_slowest_profiles = {}  # página -> heap de (total_ms, arquivo .pstats)
+
+@functools.lru_cache(maxsize=1)
+def deploy_version():
+    """Versão implantada: SOCIO40_VERSION ou o commit atual do git."""
+    if os.environ.get("SOCIO40_VERSION"): return os.environ["SOCIO40_VERSION"]
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return commit or "desconhecida"
+
+def enable(cprofile=False):
+    """Liga o profiling; também liga a instrumentação de database.py, que fornece o tempo de banco."""
+    global enabled, cprofile_enabled
+    instrumentation.enable()
+    enabled, cprofile_enabled = True, cprofile
+
+def disable():
+    global enabled, cprofile_enabled
+    enabled = cprofile_enabled = False
+
+# --- Medidores ---
+def _start_profiler():
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # outro profiler já ativo no processo (Python 3.12+ com reruns concorrentes)
+        return None
+    return profiler
+
+@contextmanager
+def rerun(page):
+    """Envolve um rerun inteiro do roteador em app.py."""
+    instrumentation.begin_rerun(page)
+    if not enabled:
+        yield
+        return
+    run = {"sections": {}}
+    _local.run = run
+    profiler = _start_profiler() if cprofile_enabled else None
+    db_started, started = instrumentation.thread_db_ms(), time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException as e:  # st.rerun()/st.stop() também encerram o rerun por exceção
+        outcome = type(e).__name__
+        raise
+    finally:
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = instrumentation.thread_db_ms() - db_started
+        if profiler: profiler.disable()
+        _local.run = None
+        _record(page, total_ms, db_ms, outcome, run["sections"], profiler)
+
+@contextmanager
+def section(name):
+    """Mede um trecho de uma página (normalmente uma aba); sem custo quando o profiling está desligado."""
+    run = getattr(_local, "run", None)
+    if run is None:
+        yield
+        return
+    db_started, started = instrumentation.thread_db_ms(), time.perf_counter()
+    try:
+        yield
+    finally:
+        entry = run["sections"].setdefault(name, {"total_ms": 0.0, "db_ms": 0.0})
+        entry["total_ms"] += (time.perf_counter() - started) * 1000
+        entry["db_ms"] += instrumentation.thread_db_ms() - db_started
+
+def _keep_profile(page, total_ms, profiler):
+    """Grava o pstats se o rerun estiver entre os mais lentos da página; descarta o mais rápido dos guardados."""
+    with _lock:
+        kept = _slowest_profiles.setdefault(page, [])
+        if len(kept) >= PROFILES_KEPT_PER_PAGE and total_ms <= kept[0][0]: return None
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{page}_{datetime.now():%Y%m%d-%H%M%S-%f}_{total_ms:.0f}ms.pstats")
+        profiler.dump_stats(path)
+        heapq.heappush(kept, (total_ms, path))
+        if len(kept) > PROFILES_KEPT_PER_PAGE:
+            _, evicted = heapq.heappop(kept)
+            try: os.remove(evicted)
+            except OSError: pass
+    return path
+
+def _record(page, total_ms, db_ms, outcome, sections, profiler):
+    entry = {"at": datetime.now().isoformat(timespec="seconds"), "version": deploy_version(), "page": page, "outcome": outcome,
+             "total_ms": round(total_ms, 3), "db_ms": round(db_ms, 3), "widgets_ms": round(total_ms - db_ms, 3),
+             "sections": {name: {"total_ms": round(s["total_ms"], 3), "db_ms": round(s["db_ms"], 3),
+                                 "widgets_ms": round(s["total_ms"] - s["db_ms"], 3)} for name, s in sections.items()},
+             "profile": _keep_profile(page, total_ms, profiler) if profiler else None}
+    line = json.dumps(entry, ensure_ascii=False)
+    with _lock:
+        with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            full = f.tell() > HISTORY_MAX_BYTES
+        if full: os.replace(HISTORY_FILE, HISTORY_FILE + ".1")
+
+def _history_files():
+    """Arquivo rotacionado (mais antigo) e o atual, os que existirem."""
+    return [path for path in (HISTORY_FILE + ".1", HISTORY_FILE) if os.path.exists(path)]
+
+# --- Histórico ---
+def load_history(limit=HISTORY_ROWS):
+    """Últimos reruns registrados (apenas os que chegaram ao fim, sem st.rerun/st.stop no meio)."""
+    files = _history_files()
+    if not files: return pd.DataFrame()
+    lines = deque(maxlen=limit)
+    for path in files:
+        with open(path, encoding="utf-8") as f: lines.extend(f)
+    history = pd.DataFrame([json.loads(line) for line in lines if line.strip()])
+    if history.empty: return history
+    history["at"] = pd.to_datetime(history["at"])
+    return history[history["outcome"] == "ok"].reset_index(drop=True)
+
+def summary_by_version(history):
+    """Latência por página e versão implantada, na ordem em que as versões apareceram."""
+    if history.empty: return history
+    grouped = history.groupby(["page", "version"], sort=False).agg(
+        desde=("at", "min"), reruns=("total_ms", "size"), p50_ms=("total_ms", "median"), p95_ms=("total_ms", lambda s: s.quantile(0.95)),
+        banco_p50_ms=("db_ms", "median"), widgets_p50_ms=("widgets_ms", "median"))
+    return grouped.reset_index().sort_values(["page", "desde"])
+
+def sections_by_version(history, page):
+    """Mediana de cada seção da página por versão implantada."""
+    rows = [{"version": run.version, "section": name, **timings}
+            for run in history[history["page"] == page].itertuples() for name, timings in run.sections.items()]
+    if not rows: return pd.DataFrame()
+    return pd.DataFrame(rows).groupby(["section", "version"], sort=False).median().reset_index()
+
+def kept_profiles(history, page):
+    """Reruns da página cujo pstats ainda está em disco, do mais lento ao mais rápido."""
+    if history.empty: return history
+    profiles = history[(history["page"] == page) & history["profile"].map(lambda path: bool(path) and os.path.exists(path))]
+    return profiles[["at", "total_ms", "profile"]].sort_values("total_ms", ascending=False)
+
+if os.environ.get("SOCIO40_PROFILING") == "1": enable(cprofile=os.environ.get("SOCIO40_CPROFILE") == "1")
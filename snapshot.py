@@ -0,0 +1,132 @@
+# snapshot.py
+# Cópia somente leitura do banco para relatórios, análises e exportações, refeita com a API de backup online do
+# SQLite. A cópia é gravada num arquivo temporário e trocada de uma vez (quem está lendo continua na anterior), então
+# as leituras pesadas não ocupam o pool de conexões nem seguram o checkpoint do banco ativo. A defasagem é limitada:
+# passado REFRESH_AFTER a próxima leitura dispara uma atualização em segundo plano, e passado MAX_AGE ela espera a cópia nova.
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import database as db
+
+REFRESH_AFTER = 60  # segundos
+MAX_AGE = 300       # segundos; defasagem máxima de qualquer leitura feita pela cópia
+
+class Snapshot:
+    """Cópia de um arquivo de banco, atualizada sob demanda."""
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.path = f"{db_file}.snapshot"
+        self.taken_at = None  # time.time() do início do último backup concluído
+        self.duration = None  # segundos do último backup
+        self._refresh_lock = threading.Lock()
+
+    def age(self):
+        return None if self.taken_at is None else time.time() - self.taken_at
+
+    def _source_changed_since(self, moment):
+        """O banco (ou seu WAL) foi gravado depois de `moment`? Leituras não alteram nenhum dos dois arquivos."""
+        modified = [os.stat(path).st_mtime for path in (self.db_file, f"{self.db_file}-wal") if os.path.exists(path)]
+        return not modified or max(modified) >= moment
+
+    def refresh(self, max_age=None):
+        """Copia o banco inteiro numa única etapa do backup (uma transação de leitura, que no WAL não bloqueia escritas).
+        Com max_age, não faz nada se outra thread já deixou a cópia mais nova que isso enquanto esta esperava, e só
+        renova a data da cópia se o banco não foi gravado desde o último backup (após um período ocioso, por exemplo)."""
+        with self._refresh_lock:
+            if max_age is not None and self.taken_at is not None and os.path.exists(self.path):
+                if self.age() <= max_age: return
+                if not self._source_changed_since(self.taken_at):
+                    self.taken_at = time.time()
+                    return
+            started = time.time()
+            temporary = f"{self.path}.{threading.get_ident()}.tmp"
+            try:
+                source, target = sqlite3.connect(self.db_file, timeout=5), sqlite3.connect(temporary)
+                try:
+                    source.backup(target)
+                    target.execute("PRAGMA journal_mode = DELETE")  # a cópia é aberta como imutável, sem WAL
+                finally:
+                    target.close()
+                    source.close()
+                os.replace(temporary, self.path)
+            except BaseException:
+                if os.path.exists(temporary): os.remove(temporary)
+                raise
+            self.taken_at, self.duration = started, time.time() - started
+        db.bump_data_version('snapshot')
+
+    def _refresh_in_background(self):
+        if self._refresh_lock.locked(): return
+        threading.Thread(target=self.refresh, args=(REFRESH_AFTER,), name="snapshot-refresh", daemon=True).start()
+
+    @contextmanager
+    def connection(self):
+        age = self.age()
+        if age is None or age > MAX_AGE or not os.path.exists(self.path): self.refresh(MAX_AGE)
+        elif age > REFRESH_AFTER: self._refresh_in_background()
+        # immutable: o arquivo nunca muda depois de publicado, então o SQLite dispensa locks e verificações
+        uri = pathlib.Path(self.path).absolute().as_uri() + "?immutable=1"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=db.CONNECTION_FACTORY)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+def get_snapshot():
+    """Cópia do banco atual (db.DB_FILE)."""
+    snapshot = _snapshots.get(db.DB_FILE)
+    if snapshot is None:
+        with _snapshots_lock:
+            snapshot = _snapshots.setdefault(db.DB_FILE, Snapshot(db.DB_FILE))
+    return snapshot
+
+def get_connection():
+    return get_snapshot().connection()
+
+def _set_provider(provider):
+    # A versão 'snapshot' só sobe quando a origem dos relatórios muda de fato: cada alta invalida os caches deles
+    if db.report_connection_provider is provider: return
+    db.report_connection_provider = provider
+    db.bump_data_version('snapshot')
+
+def enable():
+    """Passa a servir db.get_report_connection() pela cópia."""
+    _set_provider(get_connection)
+
+def disable():
+    _set_provider(None)
+
+_enabled_by_default = False
+
+def enable_by_default():
+    """Liga a cópia na primeira chamada do processo e prepara o primeiro backup em segundo plano. Chamadas seguintes
+    (a cada rerun do Streamlit) não fazem nada, então não desfazem um disable() feito pela página de Desempenho."""
+    global _enabled_by_default
+    with _snapshots_lock:
+        if _enabled_by_default: return
+        _enabled_by_default = True
+    enable()
+    get_snapshot()._refresh_in_background()
+
+def is_enabled():
+    return db.report_connection_provider is get_connection
+
+def staleness():
+    """Idade (segundos) dos dados servidos aos relatórios: 0 lendo o banco ativo, None se a cópia ainda não existe."""
+    if not is_enabled(): return 0.0
+    return get_snapshot().age()
+
+def describe():
+    """Texto curto sobre a defasagem dos relatórios, para exibir junto a eles."""
+    if not is_enabled(): return "Dados em tempo real."
+    snapshot = get_snapshot()
+    if snapshot.taken_at is None: return f"Dados de uma cópia atualizada a cada {REFRESH_AFTER} s (no máximo {MAX_AGE // 60} min de defasagem)."
+    return (f"Dados da cópia de {datetime.fromtimestamp(snapshot.taken_at):%H:%M:%S} "
+            f"(há {snapshot.age():.0f} s; no máximo {MAX_AGE // 60} min de defasagem).")
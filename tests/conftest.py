@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """Banco novo, já migrado, num diretório temporário."""
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "socio40graus.db"))
+    db.init_db()
+    db.get_holiday_index.cache_clear()
+    yield db.DB_FILE
+    db.close_all_connections()
+    db.get_holiday_index.cache_clear()
+
+
+@pytest.fixture
+def member_id(fresh_db):
+    assert db.add_member("Sócio de Teste", "52998224725", "teste@example.com", "", "1980-01-01", "", "Premium", "Misto Premium",
+                         "2026-01-01", "2026-12-31", "Pago")
+    with db.get_connection() as conn:
+        return conn.execute("SELECT id FROM members WHERE cpf = ?", ("52998224725",)).fetchone()[0]
@@ -0,0 +1,29 @@
+from concurrent.futures import Future
+
+import auth
+import database as db
+
+
+def _user(password):
+    db.add_system_user("recepcao", auth.hash_password(password, rounds=4), "Recep", "Ção", "recepcao@40graus.com", "recepcionista")
+
+
+def test_check_password_does_not_count_towards_lockout(fresh_db, monkeypatch):
+    monkeypatch.setattr(auth, "_failures", type(auth._failures)())
+    monkeypatch.setattr(auth, "_locked_until", type(auth._locked_until)())
+    _user("certa")
+    for _ in range(auth.MAX_FAILURES):
+        assert auth.check_password("recepcao", "errada") == (None, auth.INVALID_CREDENTIALS)
+    assert auth.seconds_locked("recepcao") == 0
+    assert auth.check_password("recepcao", "certa")[0]["username"] == "recepcao"
+
+
+def test_hash_timeout_becomes_a_message(fresh_db, monkeypatch):
+    monkeypatch.setattr(auth, "_failures", type(auth._failures)())
+    monkeypatch.setattr(auth, "_locked_until", type(auth._locked_until)())
+    _user("certa")
+    monkeypatch.setattr(auth, "HASH_TIMEOUT", 0.01)
+    monkeypatch.setattr(auth._executor, "submit", lambda *args: Future())  # nunca termina
+    assert auth.authenticate("recepcao", "certa") == (None, auth.BUSY)
+    assert auth.check_password("recepcao", "certa") == (None, auth.BUSY)
+    assert "recepcao" not in auth._failures
@@ -0,0 +1,35 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import database as db
+
+
+def test_concurrent_evaluations_do_not_exhaust_the_pool(member_id, monkeypatch):
+    """Cada avaliação segura uma conexão do pool; as regras não podem pedir uma segunda."""
+    monkeypatch.setattr(db, "POOL_TIMEOUT", 2)
+    barrier = threading.Barrier(db.POOL_SIZE, timeout=10)
+    available_units = db._available_units
+
+    def all_connections_taken(*args):
+        barrier.wait()  # só segue quando todas as avaliações estão com a sua conexão aberta
+        return available_units(*args)
+
+    monkeypatch.setattr(db, "_available_units", all_connections_taken)
+    with ThreadPoolExecutor(max_workers=db.POOL_SIZE) as executor:
+        verdicts = list(executor.map(lambda _: db.evaluate_booking(member_id, "Suíte Média", "2026-02-13", "2026-02-17"),
+                                     range(db.POOL_SIZE)))
+    for verdict in verdicts:
+        assert verdict["ok"], verdict["reasons"]
+        assert "Carnaval 2026" in verdict["fees"]["special_holiday"]["holidays"]
+
+
+def test_status_round_trips_restore_used_days(member_id):
+    assert db.add_booking(member_id, "Suíte Média", "2026-11-10", "2026-11-13")
+    with db.get_connection() as conn:
+        booking_id = conn.execute("SELECT MAX(id) FROM bookings WHERE member_id = ?", (member_id,)).fetchone()[0]
+    used = lambda: db.get_member_by_id(member_id)["used_days"]
+    assert used() == 3
+    for status, expected in (("Pendente", 0), ("Confirmada", 3), ("Cancelada", 0), ("Pendente", 0), ("Confirmada", 3),
+                             ("Cancelada", 0), ("Confirmada", 3), ("Confirmada", 3)):
+        assert db.update_booking_status(booking_id, status)
+        assert used() == expected, status
@@ -0,0 +1,29 @@
+from datetime import date, timedelta
+
+import database as db
+
+
+def _day(offset):
+    return (date.today() + timedelta(days=10 + offset)).isoformat()
+
+
+def _units(ids):
+    with db.get_connection() as conn:
+        return {booking_id: conn.execute("SELECT unit FROM booking_units WHERE booking_id = ?", (booking_id,)).fetchone() for booking_id in ids}
+
+
+def test_repack_that_does_not_fit_keeps_current_units(member_id):
+    """Com estadias fixadas, o best-fit guloso pode não achar lugar para todas; as unidades atuais continuam valendo."""
+    stays = [(0, 2), (6, 12), (2, 5), (4, 10)]
+    for start, end in stays:
+        assert db.add_booking(member_id, "Suíte Pequena", _day(start), _day(end))
+    with db.get_connection() as conn:
+        ids = [row[0] for row in conn.execute("SELECT id FROM bookings WHERE accommodation_type = 'Suíte Pequena' ORDER BY id DESC LIMIT 4")][::-1]
+    placement = [(2, 1), (1, 1), (1, 0), (2, 0)]  # (unidade, fixada)
+    db.run_write(lambda cursor: cursor.executemany("UPDATE booking_units SET unit = ?, locked = ? WHERE booking_id = ?",
+                                                   [(unit, locked, booking_id) for (unit, locked), booking_id in zip(placement, ids)]), 'bookings')
+    before = _units(ids)
+
+    assert db.reoptimize_units("Suíte Pequena") == {"Suíte Pequena": {"moved": 0, "unplaced": 1}}
+    assert _units(ids) == before
+    assert all(unit is not None for unit in before.values())
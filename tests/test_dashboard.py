@@ -0,0 +1,8 @@
+import database as db
+
+
+def test_missing_summary_is_rebuilt_through_the_writer(member_id):
+    db.run_write(lambda cursor: cursor.execute("DELETE FROM dashboard_summary"), 'members')
+    assert db.get_dashboard_kpis()["total_members"] == 1
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT total_members FROM dashboard_summary WHERE id = 1").fetchone() == (1,)
@@ -0,0 +1,23 @@
+import pandas as pd
+
+import member_import
+
+
+def test_form_and_import_agree_on_cpf():
+    cpfs = ["529.982.247-25", "52998224726", "11111111111", "123", ""]
+    digits = pd.Series(cpfs).str.replace(r'\D', '', regex=True)
+    import_ok = (digits.str.len() == 11) & member_import.valid_cpf_mask(digits)
+    form_ok = [member_import.clean_and_validate_cpf(cpf)[1] is None for cpf in cpfs]
+    assert form_ok == import_ok.tolist() == [True, False, False, False, False]
+
+
+def test_duplicates_count_only_against_accepted_rows(fresh_db):
+    chunk = pd.DataFrame({
+        "Nome Completo": ["A", "B", "C"],
+        "CPF": ["52998224725", "11144477735", "11144477735"],
+        "Email": ["e1@example.com", "e1@example.com", "e2@example.com"],
+        "Tipo de Cota": "Simples", "Plano de Uso": "Misto", "Início da Validade": "2026-01-01",
+    }, index=[2, 3, 4])
+    valid, rejected = member_import.validate_chunk(chunk, set(), set())
+    assert valid["full_name"].tolist() == ["A", "C"]
+    assert rejected["Erros"].tolist() == ["Email repetido no arquivo."]
@@ -0,0 +1,15 @@
+import database as db
+import member_index
+
+
+def test_incremental_refresh_prunes_the_change_log(member_id, monkeypatch):
+    prune = db.prune_member_changes
+    monkeypatch.setattr(db, "prune_member_changes", lambda through=None: prune(keep=0, through=through))
+    index = member_index.get_index()
+    for name in ("Ana", "Beatriz", "Carla"):
+        db.run_write(lambda cursor: cursor.execute("UPDATE members SET full_name = ? WHERE id = ?", (f"Sócia {name}", member_id)), 'members')
+        index.refresh()
+        with db.get_connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM member_changes").fetchone()[0] == 0
+    assert index.search("carla") == [member_id]
+    assert index.search("ana") == []
@@ -0,0 +1,14 @@
+import os
+
+import profiling
+
+
+def test_history_is_rotated_and_still_loaded(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "HISTORY_FILE", str(tmp_path / "profiling_history.jsonl"))
+    monkeypatch.setattr(profiling, "HISTORY_MAX_BYTES", 2000)
+    for total_ms in range(40):
+        profiling._record("dashboard", float(total_ms), 0.0, "ok", {}, None)
+    assert os.path.getsize(profiling.HISTORY_FILE) <= 2000
+    assert os.path.getsize(profiling.HISTORY_FILE + ".1") <= 2000 + 500
+    history = profiling.load_history(limit=5)
+    assert history["total_ms"].tolist() == [35.0, 36.0, 37.0, 38.0, 39.0]
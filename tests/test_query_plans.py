@@ -0,0 +1,6 @@
+import database as db
+
+
+def test_hot_queries_use_indexes(fresh_db):
+    """Mesma verificação de `python database.py`: nenhuma consulta de HOT_QUERIES pode cair em SCAN de tabela."""
+    assert db.find_full_scans() == {}
@@ -0,0 +1,14 @@
+import database as db
+
+
+def test_renewal_counts_only_bookings_inside_the_new_period(fresh_db):
+    assert db.add_member("Sócia Renovada", "52998224725", "renovada@example.com", "", "1980-01-01", "", "Simples", "Misto",
+                         "2025-01-01", "2026-01-01", "Pago")
+    with db.get_connection() as conn:
+        member_id = conn.execute("SELECT id FROM members WHERE cpf = ?", ("52998224725",)).fetchone()[0]
+    assert db.add_booking(member_id, "Suíte Média", "2026-11-10", "2026-11-13")  # no período renovado
+    assert db.add_booking(member_id, "Suíte Média", "2027-02-10", "2027-02-12")  # no período seguinte
+
+    db.renew_quotas(until="2026-01-01")
+    member = db.get_member_by_id(member_id)
+    assert (member["start_date"], member["end_date"], member["used_days"]) == ("2026-01-01", "2027-01-01", 3)
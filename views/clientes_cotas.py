@@ -1,14 +1,14 @@
 # views/clientes_cotas.py
 import streamlit as st
 import database as db
+import profiling
+import member_import
+import member_index
+from views.componentes import member_picker
 from datetime import date, timedelta
 import re
 
-def clean_and_validate_cpf(cpf_str):
-    if not cpf_str: return None, "CPF não pode estar em branco."
-    cleaned = re.sub(r'\D', '', cpf_str)
-    if len(cleaned) != 11: return None, "CPF inválido. Deve conter 11 dígitos."
-    return cleaned, None
+MEMBER_SEARCH_LIMIT = 100
 
 def show_page():
     st.title("Gestão de Clientes e Cotas")
@@ -17,22 +17,20 @@ def show_page():
         st.success(st.session_state.action_success_message)
         del st.session_state.action_success_message
 
-    tab1, tab2, tab3 = st.tabs(["Visualizar Clientes", "Cadastrar Novo Cliente", "Editar Cliente / Finanças"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Visualizar Clientes", "Cadastrar Novo Cliente", "Editar Cliente / Finanças", "Importar em Lote"])
 
-    with tab1:
+    with tab1, profiling.section("Visualizar Clientes"):
         # (código da aba 1, sem alterações)
         st.subheader("Lista de Sócios Ativos")
-        search_term = st.text_input("Buscar por nome ou CPF")
-        all_members = db.get_all_members()
+        search_term = st.text_input("Buscar por nome, CPF, email ou telefone")
         if search_term:
-            search_digits = re.sub(r'\D', '', search_term)
-            all_members = all_members[
-                all_members['Nome Completo'].str.contains(search_term, case=False) |
-                all_members['CPF'].str.contains(search_digits, case=False)
-            ]
+            all_members = db.search_members(search_term, limit=MEMBER_SEARCH_LIMIT)
+            if len(all_members) == MEMBER_SEARCH_LIMIT: st.caption(f"Exibindo os {MEMBER_SEARCH_LIMIT} resultados mais relevantes. Refine a busca para ver outros.")
+        else:
+            all_members = db.get_all_members()
         st.dataframe(all_members, use_container_width=True, hide_index=True)
 
-    with tab2:
+    with tab2, profiling.section("Cadastrar Novo Cliente"):
         # (código da aba 2, sem alterações)
         st.subheader("Cadastrar Novo Sócio")
         with st.form("new_member_form", clear_on_submit=False):
@@ -57,12 +55,12 @@ def show_page():
                 end_date = start_date + timedelta(days=365)
                 st.date_input("Fim da Validade", value=end_date, disabled=True)
             with c4:
-                plans = {"Simples": ["Finais de Semana", "Misto", "Feriado Regular"], "Premium": ["Finais de Semana Premium", "Misto Premium", "Feriado Premium"]}
+                plans = db.QUOTA_PLANS
                 usage_plan = st.selectbox("Plano de Uso*", plans[quota_type])
                 payment_status = st.selectbox("Status do Pagamento*", ["Pendente", "Pago", "Atrasado"])
             submitted = st.form_submit_button("Cadastrar Sócio")
             if submitted:
-                cpf_cleaned, cpf_error = clean_and_validate_cpf(cpf)
+                cpf_cleaned, cpf_error = member_import.clean_and_validate_cpf(cpf)
                 phone_cleaned = re.sub(r'\D', '', phone)
                 if cpf_error: st.error(cpf_error)
                 elif not all([full_name, email]): st.warning("Por favor, preencha Nome Completo e Email.")
@@ -72,16 +70,13 @@ def show_page():
                         st.rerun()
                     else: st.error("Erro ao cadastrar. CPF ou Email já podem existir no sistema.")
 
-    with tab3:
+    with tab3, profiling.section("Editar Cliente / Finanças"):
         # --- LÓGICA DA ABA 3 ATUALIZADA ---
         st.subheader("Editar ou Gerenciar um Sócio")
-        member_list_df = db.get_all_members()
-        if not member_list_df.empty:
-            member_options = {f"{row['Nome Completo']} (ID: {row['ID']})": row['ID'] for index, row in member_list_df.iterrows()}
-            selected_member_display = st.selectbox("Selecione um Sócio", options=member_options.keys(), index=None, placeholder="Escolha um sócio para gerenciar...")
+        if len(member_index.get_index()) > 0:
+            member_id = member_picker("Selecione um Sócio", key="manage_member", placeholder="Escolha um sócio para gerenciar...")
 
-            if selected_member_display:
-                member_id = member_options[selected_member_display]
+            if member_id:
                 member_data = db.get_member_by_id(member_id)
 
                 with st.expander("Editar Informações do Sócio", expanded=True):
@@ -104,11 +99,11 @@ def show_page():
                             e_quota_type = st.selectbox("Tipo de Cota*", ["Simples", "Premium"], index=["Simples", "Premium"].index(member_data['quota_type']))
                             e_payment_status = st.selectbox("Status Pagamento*", ["Pendente", "Pago", "Atrasado"], index=["Pendente", "Pago", "Atrasado"].index(member_data['payment_status']))
                         with e_c4:
-                            e_plans = {"Simples": ["Finais de Semana", "Misto", "Feriado Regular"],"Premium": ["Finais de Semana Premium", "Misto Premium", "Feriado Premium"]}
+                            e_plans = db.QUOTA_PLANS
                             e_usage_plan = st.selectbox("Plano de Uso*", e_plans[e_quota_type], index=e_plans[e_quota_type].index(member_data['usage_plan']))
                         update_submitted = st.form_submit_button("Salvar Alterações do Sócio")
                         if update_submitted:
-                            e_cpf_cleaned, e_cpf_error = clean_and_validate_cpf(e_cpf)
+                            e_cpf_cleaned, e_cpf_error = member_import.clean_and_validate_cpf(e_cpf)
                             e_phone_cleaned = re.sub(r'\D', '', e_phone)
                             if e_cpf_error: st.error(e_cpf_error)
                             else:
@@ -137,12 +132,13 @@ def show_page():
                 
                 # --- NOVA SEÇÃO FINANCEIRA ADICIONADA AQUI ---
                 with st.expander("Histórico Financeiro e Lançamentos"):
+                    balance = db.get_member_balance(member_id)
+                    st.metric("Total Pago pelo Sócio", f"R$ {balance['balance']:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
+                              help=f"{balance['transactions']} lançamento(s); último em {balance['last_transaction_date'] or '—'}.")
+
                     st.subheader("Histórico de Transações")
                     transactions_df = db.get_transactions_for_member(member_id)
-                    st.dataframe(transactions_df, use_container_width=True)
-                    
-                    total_paid = transactions_df['Valor'].sum()
-                    st.metric("Total Pago pelo Sócio", f"R$ {total_paid:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
+                    st.dataframe(transactions_df, use_container_width=True, hide_index=True)
 
                     st.subheader("Lançar Novo Pagamento")
                     with st.form(f"new_transaction_{member_id}", clear_on_submit=True):
@@ -164,4 +160,27 @@ def show_page():
                                 st.session_state.action_success_message = "Lançamento financeiro registrado com sucesso!"
                                 st.rerun()
                             else:
-                                st.error("Erro ao registrar o lançamento.")
\ No newline at end of file
+                                st.error("Erro ao registrar o lançamento.")
+
+    with tab4, profiling.section("Importar em Lote"):
+        st.subheader("Importar Sócios de uma Planilha")
+        st.write("Envie um arquivo CSV ou XLSX com uma linha por sócio. A validade da cota é de 365 dias a partir do início informado.")
+        st.download_button("Baixar modelo de planilha (CSV)", data=member_import.template_csv(), file_name="modelo_importacao_socios.csv", mime="text/csv")
+        uploaded_file = st.file_uploader("Arquivo de sócios", type=["csv", "xlsx"])
+        if uploaded_file and st.button("Importar Sócios", type="primary"):
+            progress_text = st.empty()
+            with st.spinner("Importando sócios..."):
+                imported, rejected = member_import.import_members(
+                    uploaded_file, uploaded_file.name,
+                    progress=lambda done, read: progress_text.write(f"{read} linhas lidas, {done} sócios importados..."))
+            progress_text.empty()
+            st.session_state.import_result = (uploaded_file.name, imported, rejected)
+
+        if 'import_result' in st.session_state:
+            file_name, imported, rejected = st.session_state.import_result
+            st.success(f"{imported} sócio(s) importado(s) de '{file_name}'.")
+            if not rejected.empty:
+                st.warning(f"{len(rejected)} linha(s) recusada(s). Corrija-as e envie novamente apenas essas linhas.")
+                st.dataframe(rejected.head(200), use_container_width=True, hide_index=True)
+                st.download_button("Baixar relatório de erros (CSV)", data=member_import.report_csv(rejected),
+                                   file_name="erros_importacao_socios.csv", mime="text/csv")
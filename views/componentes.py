@@ -0,0 +1,13 @@
+# views/componentes.py
+# Componentes reutilizados por mais de uma página.
+import streamlit as st
+import member_index
+
+def member_picker(label, key, placeholder="Escolha um sócio...", limit=member_index.PICKER_LIMIT):
+    """Busca de sócio por nome ou ID: só as `limit` melhores opções vão para o navegador. Retorna o ID ou None."""
+    index = member_index.get_index()
+    query = st.text_input(f"Buscar {label.rstrip('*').lower()}", key=f"{key}_query", placeholder="Digite parte do nome ou o ID...")
+    options = index.search(query, limit)
+    if query and not options: st.caption("Nenhum sócio encontrado.")
+    return st.selectbox(label, options=options, format_func=index.label, index=0 if query and len(options) == 1 else None,
+                        placeholder=placeholder, key=f"{key}_select")
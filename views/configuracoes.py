@@ -1,6 +1,10 @@
 # views/configuracoes.py
 import streamlit as st
 import database as db
+import profiling
+import data_export
+import snapshot
+import tempfile
 from datetime import date, timedelta
 
 def show_page():
@@ -25,36 +29,65 @@ def show_page():
         fee_simple = st.number_input("Taxa para Cota Simples (R$ por pessoa)", value=float(settings.get('special_holiday_fee_simple', 200)), min_value=0.0, format="%.2f")
         fee_premium = st.number_input("Taxa para Cota Premium (R$ por pessoa)", value=float(settings.get('special_holiday_fee_premium', 100)), min_value=0.0, format="%.2f")
 
+        st.subheader("Regras de Reserva")
+        quitinete_cooldown = st.number_input("Intervalo mínimo entre estadias na Quitinete (dias)", value=int(float(settings.get('quitinete_cooldown_days', 30))), min_value=0, step=1)
+
         submitted_prices = st.form_submit_button("Salvar Configurações Financeiras", use_container_width=True)
         if submitted_prices:
-            db.update_setting('simple_quota_price', str(price_simple))
-            db.update_setting('premium_quota_price', str(price_premium))
-            db.update_setting('special_holiday_fee_simple', str(fee_simple))
-            db.update_setting('special_holiday_fee_premium', str(fee_premium))
-            st.session_state.action_success_message = "Preços e taxas atualizados com sucesso!"
-            st.rerun()
+            saved = db.update_settings({'simple_quota_price': str(price_simple), 'premium_quota_price': str(price_premium),
+                                        'special_holiday_fee_simple': str(fee_simple), 'special_holiday_fee_premium': str(fee_premium),
+                                        'quitinete_cooldown_days': str(quitinete_cooldown)})
+            if saved:
+                st.session_state.action_success_message = "Preços e taxas atualizados com sucesso!"
+                st.rerun()
+            else: st.error("Não foi possível salvar as configurações. Tente novamente.")
+
+    st.subheader("Renovação de Cotas")
+    due = db.get_due_renewals()
+    st.caption(f"{len(due)} cota(s) vencida(s) até hoje. A renovação estende a validade por mais um período, restaura as diárias "
+               "do plano, marca o pagamento como pendente e registra a cobrança pelo valor atual da cota. "
+               "Pode ser agendada para toda noite com `python database.py --renew-quotas`.")
+    if st.button("Renovar Cotas Vencidas", disabled=not due):
+        renewal = db.renew_quotas()
+        charged = f"{renewal['charged']:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+        st.session_state.action_success_message = f"{renewal['members']} cota(s) renovada(s) (R$ {charged} em cobranças)."
+        st.rerun()
 
     st.divider()
 
     st.header("Inventário de Acomodações")
     accommodations = db.get_all_accommodations()
+    committed = db.get_committed_units()
     with st.form("accommodations_form"):
         for index, row in accommodations.iterrows():
-            st.number_input(label=f"Quantidade de **{row['type']}**", value=row['total_quantity'], min_value=0, step=1, key=f"qty_{row['type']}")
+            in_use = committed.get(row['type'], 0)
+            st.number_input(label=f"Quantidade de **{row['type']}**", value=row['total_quantity'], min_value=min(in_use, int(row['total_quantity'])), step=1, key=f"qty_{row['type']}",
+                            help=f"Reservas futuras ocupam até {in_use} unidade(s) ao mesmo tempo." if in_use else None)
         submitted_accommodations = st.form_submit_button("Salvar Quantidades", use_container_width=True)
         if submitted_accommodations:
-            for index, row in accommodations.iterrows():
-                new_quantity = st.session_state[f"qty_{row['type']}"]
-                db.update_accommodation_quantity(row['type'], new_quantity)
-            st.session_state.action_success_message = "Inventário de acomodações atualizado!"
-            st.rerun()
+            quantities = {accommodation_type: st.session_state[f"qty_{accommodation_type}"] for accommodation_type in accommodations['type']}
+            if db.update_accommodation_quantities(quantities):
+                st.session_state.action_success_message = "Inventário de acomodações atualizado!"
+                st.rerun()
+            else: st.error("Não foi possível salvar o inventário: as reservas futuras não cabem nas unidades informadas.")
+
+    st.caption("As reservas recebem uma unidade concreta ao serem confirmadas. Redistribuir as reservas futuras não fixadas "
+               "junta as estadias nas mesmas unidades e abre períodos livres mais longos.")
+    if st.button("Redistribuir Unidades das Reservas Futuras"):
+        results = db.reoptimize_units()
+        moved = sum(result['moved'] for result in results.values())
+        kept = [accommodation_type for accommodation_type, result in results.items() if result['unplaced']]
+        st.session_state.action_success_message = f"{moved} reserva(s) mudaram de unidade." + (
+            f" {', '.join(kept)}: a redistribuição deixaria {sum(results[t]['unplaced'] for t in kept)} reserva(s) sem unidade, "
+            "então as unidades atuais foram mantidas." if kept else "")
+        st.rerun()
 
     st.divider()
 
     st.header("Calendário de Feriados")
     tab1, tab2 = st.tabs(["Visualizar e Remover Feriados", "Adicionar Novo Feriado"])
 
-    with tab1:
+    with tab1, profiling.section("Visualizar e Remover Feriados"):
         all_holidays = db.get_all_holidays()
         st.dataframe(all_holidays, use_container_width=True, hide_index=True)
         if not all_holidays.empty:
@@ -66,7 +99,7 @@ def show_page():
                     st.session_state.action_success_message = "Feriado removido com sucesso!"
                     st.rerun()
     
-    with tab2:
+    with tab2, profiling.section("Adicionar Novo Feriado"):
         with st.form("new_holiday_form", clear_on_submit=True):
             name = st.text_input("Nome do Feriado (ex: Páscoa 2026)")
             h_c1, h_c2 = st.columns(2)
@@ -80,4 +113,32 @@ def show_page():
                     else:
                         db.add_holiday(name, start_date.isoformat(), end_date.isoformat(), holiday_type)
                         st.session_state.action_success_message = "Feriado adicionado com sucesso!"
-                        st.rerun()
\ No newline at end of file
+                        st.rerun()
+
+    st.divider()
+
+    st.header("Exportação de Dados")
+    st.caption("Gera o arquivo completo em lotes, a partir da cópia de leitura do banco. Também disponível via linha de comando: python data_export.py --help")
+    with st.form("export_form"):
+        e_c1, e_c2 = st.columns(2)
+        with e_c1:
+            export_kind = st.selectbox("Dados", options=list(data_export.EXPORTS.keys()), format_func=data_export.EXPORT_LABELS.get)
+            export_format = st.selectbox("Formato", options=list(data_export.FORMATS.keys()), format_func=str.upper)
+        with e_c2:
+            export_period = st.date_input("Período (opcional)", value=(), format="DD/MM/YYYY")
+        submitted_export = st.form_submit_button("Gerar Arquivo", use_container_width=True)
+    if submitted_export:
+        extension = data_export.FORMATS[export_format]
+        try:
+            with tempfile.NamedTemporaryFile(suffix=extension) as export_file:
+                with st.spinner("Gerando exportação..."):
+                    total = data_export.export(export_kind, export_file.name, export_format,
+                                               export_period[0] if len(export_period) > 0 else None,
+                                               export_period[1] if len(export_period) > 1 else None)
+                st.success(f"{total} linha(s) exportada(s). {snapshot.describe()}")
+                # Arquivo aberto para leitura (BufferedReader), entregue direto ao botão em vez de um read() aqui
+                with open(export_file.name, "rb") as download:
+                    st.download_button(f"Baixar {data_export.EXPORT_LABELS[export_kind]} ({export_format.upper()})", data=download,
+                                       file_name=f"{export_kind}_{date.today().isoformat()}{extension}", use_container_width=True)
+        except RuntimeError as e:
+            st.error(str(e))
@@ -0,0 +1,99 @@
+# views/desempenho.py
+import streamlit as st
+import instrumentation
+import profiling
+import snapshot
+
+def show_page():
+    if st.session_state.get('user_role') != 'admin':
+        st.error("Você não tem permissão para acessar esta página.")
+        st.stop()
+
+    st.title("⏱️ Desempenho")
+    st.markdown("Tempo gasto em cada chamada ao banco de dados, registrado em memória enquanto a instrumentação estiver ligada.")
+
+    c1, c2, c3 = st.columns([0.4, 0.4, 0.2])
+    with c1:
+        enabled = st.toggle("Instrumentação ligada", value=instrumentation.is_enabled(),
+                            help="Vale para todas as sessões deste servidor. Deixe desligada quando não estiver investigando lentidão.")
+        if enabled != instrumentation.is_enabled():
+            instrumentation.enable() if enabled else instrumentation.disable()
+            st.rerun()
+    with c2:
+        instrumentation.slow_statement_ms = st.number_input("Capturar plano de execução acima de (ms)", min_value=0.0, step=10.0,
+                                                            value=float(instrumentation.slow_statement_ms))
+    with c3:
+        if st.button("Limpar registros", use_container_width=True):
+            instrumentation.clear()
+            st.rerun()
+
+    st.header("Cópia para Relatórios")
+    st.caption(f"Relatórios, análises e exportações leem de uma cópia do banco refeita pela API de backup do SQLite: "
+               f"atualizada em segundo plano após {snapshot.REFRESH_AFTER} s e nunca mais velha que {snapshot.MAX_AGE} s.")
+    s1, s2, s3 = st.columns([0.4, 0.4, 0.2])
+    with s1:
+        snapshot_on = st.toggle("Relatórios pela cópia", value=snapshot.is_enabled(), help="Desligado, os relatórios leem o banco ativo.")
+        if snapshot_on != snapshot.is_enabled():
+            snapshot.enable() if snapshot_on else snapshot.disable()
+            st.rerun()
+    current = snapshot.get_snapshot()
+    with s2:
+        st.metric("Idade da cópia", "—" if current.age() is None else f"{current.age():.0f} s",
+                  help=None if current.duration is None else f"Último backup levou {current.duration * 1000:.0f} ms.")
+    with s3:
+        if st.button("Atualizar agora", use_container_width=True, disabled=not snapshot_on):
+            current.refresh()
+            st.rerun()
+
+    st.header("Reruns Recentes")
+    st.caption("Chamadas a database.py, comandos SQL, tempo no banco e espera por conexão do pool em cada rerun de página.")
+    reruns = instrumentation.rerun_summary()
+    if reruns.empty: st.info("Nenhum rerun registrado. Ligue a instrumentação e navegue pelas páginas do sistema.")
+    else: st.dataframe(reruns, use_container_width=True, hide_index=True)
+
+    st.header("Consultas Mais Lentas")
+    statements = instrumentation.slowest_statements()
+    if statements.empty: st.info("Nenhuma consulta registrada.")
+    else:
+        st.dataframe(statements.drop(columns=["plan"]), use_container_width=True, hide_index=True)
+        for index, row in statements.dropna(subset=["plan"]).iterrows():
+            with st.expander(f"{row['wall_ms']:.1f} ms — {row['function'] or 'fora de database.py'}"):
+                st.code(row['sql'], language="sql")
+                st.code(row['plan'], language="text")
+
+    st.header("Chamadas por Função")
+    calls = instrumentation.calls_by_function()
+    if calls.empty: st.info("Nenhuma chamada registrada.")
+    else: st.dataframe(calls, use_container_width=True, hide_index=True)
+
+    st.divider()
+    st.header("Profiling de Reruns")
+    st.caption(f"Tempo de cada rerun por página, separado em banco e montagem de widgets, gravado em {profiling.HISTORY_FILE} "
+               f"com a versão implantada ({profiling.deploy_version()}).")
+    p1, p2 = st.columns(2)
+    with p1:
+        profiling_on = st.toggle("Profiling ligado", value=profiling.enabled, help="Liga também a instrumentação do banco.")
+    with p2:
+        cprofile_on = st.toggle("Gravar cProfile dos reruns mais lentos", value=profiling.cprofile_enabled, disabled=not profiling_on,
+                                help=f"Mantém os {profiling.PROFILES_KEPT_PER_PAGE} mais lentos de cada página em {profiling.PROFILE_DIR}/.")
+    if (profiling_on, cprofile_on and profiling_on) != (profiling.enabled, profiling.cprofile_enabled):
+        profiling.enable(cprofile=cprofile_on) if profiling_on else profiling.disable()
+        st.rerun()
+
+    history = profiling.load_history()
+    if history.empty:
+        st.info("Nenhum rerun registrado no histórico.")
+        return
+    st.subheader("Latência por Página e Versão")
+    st.dataframe(profiling.summary_by_version(history), use_container_width=True, hide_index=True)
+    st.line_chart(history.pivot_table(index="at", columns="page", values="total_ms"))
+
+    st.subheader("Seções da Página")
+    page = st.selectbox("Página", options=sorted(history["page"].unique()))
+    sections = profiling.sections_by_version(history, page)
+    if sections.empty: st.info("Esta página não tem seções medidas.")
+    else: st.dataframe(sections, use_container_width=True, hide_index=True)
+    profiles = profiling.kept_profiles(history, page)
+    if not profiles.empty:
+        st.caption("Perfis gravados (abra com python -m pstats <arquivo>):")
+        st.dataframe(profiles, use_container_width=True, hide_index=True)
@@ -3,6 +3,7 @@ import streamlit as st
 import pandas as pd
 import auth
 import database as db
+import profiling
 
 def show_page():
     if st.session_state.get('user_role') != 'admin':
@@ -19,11 +20,11 @@ def show_page():
 
     tab1, tab2, tab3 = st.tabs(["Visualizar Usuários", "Criar Novo Usuário", "Editar / Remover Usuário"])
 
-    with tab1:
+    with tab1, profiling.section("Visualizar Usuários"):
         st.subheader("Usuários Cadastrados no Sistema")
         st.dataframe(db.get_system_users(), use_container_width=True, hide_index=True)
 
-    with tab2:
+    with tab2, profiling.section("Criar Novo Usuário"):
         st.subheader("Criar Novo Usuário do Sistema")
         with st.form("create_user_form", clear_on_submit=True):
             st.write("Preencha os dados para criar um novo acesso.")
@@ -42,13 +43,15 @@ def show_page():
                 if not all([first_name, username, role, last_name, email, password]):
                     st.warning("Por favor, preencha todos os campos.")
                 else:
-                    hashed_password = auth.hash_password(password)
-                    if db.add_system_user(username, hashed_password, first_name, last_name, email, role):
+                    try: hashed_password = auth.hash_password(password)
+                    except auth.HashTimeout: hashed_password = None
+                    if hashed_password is None: st.error(auth.BUSY)
+                    elif db.add_system_user(username, hashed_password, first_name, last_name, email, role):
                         st.session_state.action_success_message = f"Usuário '{username}' criado com sucesso!"
                         st.rerun()
                     else: st.error("Erro ao criar usuário. O nome de usuário ou email já pode existir.")
 
-    with tab3:
+    with tab3, profiling.section("Editar / Remover Usuário"):
         st.subheader("Editar ou Remover um Usuário Existente")
         users_df_edit = db.get_system_users()
         user_list = users_df_edit['username'].tolist()
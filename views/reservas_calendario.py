@@ -1,10 +1,21 @@
 # views/reservas_calendario.py
 import streamlit as st
 import database as db
+import profiling
+import member_index
+from views.componentes import member_picker
 import pandas as pd
 from datetime import date, timedelta
 from streamlit_calendar import calendar
 
+# Margem carregada além do intervalo visível, para navegações curtas não exigirem nova consulta
+CALENDAR_BUFFER = timedelta(days=7)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _load_calendar_events(range_start, range_end, data_version):
+    """Eventos do intervalo, em cache por (intervalo, versão dos dados)."""
+    return db.get_bookings_for_calendar(range_start, range_end)
+
 def show_page():
     st.title("Reservas e Calendário de Ocupação")
 
@@ -13,105 +24,163 @@ def show_page():
         del st.session_state.action_success_message
 
     # Adicionamos a nova aba 'Gerenciar Reservas'
-    tab1, tab2, tab3 = st.tabs(["🗓️ Calendário", "➕ Nova Reserva", "📋 Gerenciar Reservas"])
+    tab1, tab_availability, tab2, tab3 = st.tabs(["🗓️ Calendário", "🔎 Disponibilidade", "➕ Nova Reserva", "📋 Gerenciar Reservas"])
 
-    with tab1:
+    with tab1, profiling.section("Calendário"):
         st.header("Ocupação das Acomodações")
-        booking_events = db.get_all_bookings_for_calendar()
-        calendar(events=booking_events, options={
+        if 'calendar_range' not in st.session_state:
+            first_of_month = date.today().replace(day=1)
+            st.session_state.calendar_range = (first_of_month - timedelta(days=7), first_of_month + timedelta(days=42))
+            st.session_state.calendar_view = "dayGridMonth"
+        visible_start, visible_end = st.session_state.calendar_range
+        fetch_start, fetch_end = visible_start - CALENDAR_BUFFER, visible_end + CALENDAR_BUFFER
+        booking_events = _load_calendar_events(fetch_start.isoformat(), fetch_end.isoformat(), db.get_data_version('bookings', 'members'))
+        holiday_events = db.get_holidays_for_calendar(fetch_start.isoformat(), fetch_end.isoformat())
+        calendar_state = calendar(events=booking_events + holiday_events, options={
             "headerToolbar": {"left": "prev,next today", "center": "title", "right": "dayGridMonth,timeGridWeek"},
-            "initialView": "dayGridMonth", "locale": "pt-br"
-        })
+            "initialView": st.session_state.calendar_view, "locale": "pt-br",
+            "initialDate": (visible_start + (visible_end - visible_start) / 2).isoformat()
+        }, callbacks=["datesSet"], key="occupancy_calendar")
+
+        # Ao navegar no calendário, busca apenas o novo intervalo visível
+        dates_set = (calendar_state or {}).get("datesSet")
+        if dates_set:
+            new_range = (date.fromisoformat(dates_set["start"][:10]), date.fromisoformat(dates_set["end"][:10]))
+            st.session_state.calendar_view = dates_set.get("view", {}).get("type", st.session_state.calendar_view)
+            if new_range != st.session_state.calendar_range:
+                st.session_state.calendar_range = new_range
+                if not (fetch_start <= new_range[0] and new_range[1] <= fetch_end): st.rerun()
+
+    with tab_availability, profiling.section("Disponibilidade"):
+        st.header("Disponibilidade por Período")
+        c1, c2, c3 = st.columns(3)
+        with c1: window_start = st.date_input("De", value=date.today(), key="availability_start")
+        with c2: window_end = st.date_input("Até (check-out)", value=date.today() + timedelta(days=14), key="availability_end")
+        with c3: min_nights = st.number_input("Mínimo de diárias", min_value=1, value=2, step=1, key="availability_min_nights")
+
+        if window_end <= window_start:
+            st.error("A data final deve ser posterior à data inicial.")
+        elif (window_end - window_start).days > 366:
+            st.warning("Escolha um período de até um ano.")
+        else:
+            availability = db.get_availability_matrix(window_start.isoformat(), window_end.isoformat())
+            st.caption("Unidades livres por noite. Zero indica acomodação lotada. ★ feriado especial, • feriado comum.")
+            grid = availability.copy()
+            _, holiday_types = db.get_holiday_index().tag_dates(grid.index.to_numpy(dtype='datetime64[D]'))
+            marks = {'Especial': " ★", 'Comum': " •"}
+            grid.index = [night.strftime("%a %d/%m") + marks.get(holiday_type, "") for night, holiday_type in zip(grid.index, holiday_types)]
+            st.dataframe(grid.T, use_container_width=True)
+
+            st.subheader(f"Períodos livres de {min_nights}+ diárias")
+            stretches = db.find_free_stretches(availability, min_nights)
+            if stretches.empty: st.info("Nenhum período livre com essa duração na janela escolhida.")
+            else: st.dataframe(stretches, use_container_width=True, hide_index=True)
 
-    with tab2:
+    with tab2, profiling.section("Nova Reserva"):
         st.header("Agendar Nova Reserva")
-        member_list_df = db.get_all_members()
 
-        if member_list_df.empty:
+        if len(member_index.get_index()) == 0:
             st.warning("Nenhum sócio cadastrado. Por favor, cadastre um sócio na página 'Clientes e Cotas' antes de fazer uma reserva.")
         else:
-            with st.form("new_booking_form"):
-                member_options = {f"{row['Nome Completo']} (ID: {row['ID']})": row['ID'] for index, row in member_list_df.iterrows()}
-                selected_member_display = st.selectbox("Selecione um Sócio*", options=member_options.keys(), index=None, placeholder="Escolha um sócio...")
-                
-                member_id = member_options.get(selected_member_display) if selected_member_display else None
-                allowance = db.get_member_allowance(member_id) if member_id else None
-
-                if allowance:
-                    st.info(f"Saldo do Sócio: **{allowance['available']}** diárias disponíveis (de um total de {allowance['total']}).", icon="🗓️")
-
-                c1, c2 = st.columns(2)
-                with c1: start_date = st.date_input("Data de Check-in*", value=date.today())
-                with c2: end_date = st.date_input("Data de Check-out*", value=date.today() + timedelta(days=2))
-                
-                accommodation_types = db.get_accommodation_types()
-                accommodation_type = st.selectbox("Tipo de Acomodação*", options=accommodation_types)
-                
-                booking_duration = (end_date - start_date).days
-                all_validations_passed = False
-                
-                if selected_member_display:
-                    if booking_duration <= 0:
-                        st.error("A data de Check-out deve ser posterior à de Check-in.")
-                    else:
-                        if allowance and allowance['available'] < booking_duration:
-                            st.error(f"Saldo insuficiente! O sócio tem {allowance['available']} diárias, mas a reserva requer {booking_duration}.")
-                        else:
-                            available_units = db.check_availability(accommodation_type, start_date.isoformat(), end_date.isoformat())
-                            if available_units <= 0:
-                                st.error(f"Indisponível! Todas as unidades de {accommodation_type} já estão reservadas neste período.")
-                            else:
-                                st.success(f"Pré-reserva válida! A reserva consumirá {booking_duration} diárias e há {available_units} unidade(s) livre(s).")
-                                all_validations_passed = True
-                
-                submitted = st.form_submit_button("Confirmar Reserva", disabled=not all_validations_passed, use_container_width=True)
-                if submitted:
-                    if not member_id:
-                        st.error("Por favor, selecione um sócio.")
-                    else:
-                        if db.add_booking(member_id, accommodation_type, start_date.isoformat(), end_date.isoformat()):
-                            st.session_state.action_success_message = "Reserva confirmada com sucesso!"
-                            st.rerun()
-                        else:
-                            st.error("Ocorreu um erro ao salvar a reserva.")
+            # Sem st.form: cada alteração reavalia a reserva na hora, com todas as regras (db.evaluate_booking)
+            member_id = member_picker("Selecione um Sócio*", key="booking_member")
+            allowance = db.get_member_allowance(member_id) if member_id else None
+
+            if allowance:
+                st.info(f"Saldo do Sócio: **{allowance['available']}** diárias disponíveis (de um total de {allowance['total']}).", icon="🗓️")
+
+            c1, c2 = st.columns(2)
+            with c1: start_date = st.date_input("Data de Check-in*", value=date.today())
+            with c2: end_date = st.date_input("Data de Check-out*", value=date.today() + timedelta(days=2))
+
+            accommodation_types = db.get_accommodation_types()
+            accommodation_type = st.selectbox("Tipo de Acomodação*", options=accommodation_types)
+
+            verdict = db.evaluate_booking(member_id, accommodation_type, start_date.isoformat(), end_date.isoformat()) if member_id else None
+            if verdict:
+                for reason in verdict['reasons']: st.error(reason)
+                holiday_fee = verdict['fees'].get('special_holiday')
+                if holiday_fee:
+                    st.warning(f"Feriado especial ({', '.join(holiday_fee['holidays'])}): taxa de R$ {holiday_fee['per_person']:.2f} por pessoa "
+                               f"x {holiday_fee['people']} pessoa(s) = **R$ {holiday_fee['amount']:.2f}**.", icon="🎉")
+                if verdict['ok']:
+                    st.success(f"Pré-reserva válida! A reserva consumirá {verdict['nights']} diárias e há {verdict['available_units']} unidade(s) livre(s).")
+
+            if st.button("Confirmar Reserva", disabled=not (verdict and verdict['ok']), use_container_width=True):
+                if db.add_booking(member_id, accommodation_type, start_date.isoformat(), end_date.isoformat()):
+                    st.session_state.action_success_message = "Reserva confirmada com sucesso!"
+                    st.rerun()
+                else:
+                    st.error("Ocorreu um erro ao salvar a reserva.")
 
     # --- NOVA ABA DE GERENCIAMENTO DE RESERVAS ---
-    with tab3:
+    with tab3, profiling.section("Gerenciar Reservas"):
         st.header("Todas as Reservas")
-        all_bookings = db.get_all_bookings_with_details()
 
-        if all_bookings.empty:
-            st.info("Nenhuma reserva encontrada.")
+        # Filtros (aplicados no banco; apenas uma página é carregada por vez)
+        st.subheader("Filtrar Reservas")
+        col1, col2 = st.columns(2)
+        with col1:
+            filter_name = st.text_input("Filtrar por nome do sócio (início do nome)")
+            filter_period = st.date_input("Check-in entre", value=(), format="DD/MM/YYYY")
+        with col2:
+            filter_status = st.selectbox("Filtrar por status", options=["Todos", "Confirmada", "Cancelada", "Pendente"], index=0)
+            filter_accommodation = st.selectbox("Filtrar por acomodação", options=["Todas"] + db.get_accommodation_types(), index=0)
+
+        filters = {
+            "status": None if filter_status == "Todos" else filter_status,
+            "name_prefix": filter_name.strip() or None,
+            "start_from": filter_period[0].isoformat() if len(filter_period) > 0 else None,
+            "start_to": filter_period[1].isoformat() if len(filter_period) > 1 else None,
+            "accommodation_type": None if filter_accommodation == "Todas" else filter_accommodation,
+        }
+        # Pilha de cursores das páginas já visitadas; reinicia quando os filtros mudam
+        if st.session_state.get('bookings_filters') != filters:
+            st.session_state.bookings_filters = filters
+            st.session_state.bookings_cursors = [None]
+        cursors = st.session_state.bookings_cursors
+        page_df, next_cursor = db.get_bookings_page(after=cursors[-1], **filters)
+
+        if page_df.empty:
+            st.info("Nenhuma reserva encontrada para os filtros aplicados.")
         else:
-            # Filtros
-            st.subheader("Filtrar Reservas")
-            col1, col2 = st.columns(2)
-            with col1:
-                filter_name = st.text_input("Filtrar por nome do sócio")
-            with col2:
-                filter_status = st.selectbox("Filtrar por status", options=["Todos", "Confirmada", "Cancelada", "Pendente"], index=0)
-
-            filtered_df = all_bookings.copy()
-            if filter_name:
-                filtered_df = filtered_df[filtered_df['Sócio'].str.contains(filter_name, case=False)]
-            if filter_status != "Todos":
-                filtered_df = filtered_df[filtered_df['Status'] == filter_status]
-
-            st.dataframe(filtered_df, use_container_width=True, hide_index=True)
-
-            st.subheader("Alterar Status de uma Reserva")
-            if not filtered_df.empty:
-                booking_options = {f"ID {row['ID Reserva']} - {row['Sócio']} ({row['Check-in']})": row['ID Reserva'] for index, row in filtered_df.iterrows()}
-                selected_booking_display = st.selectbox("Selecione uma reserva para alterar", options=booking_options.keys())
-                
-                new_status = st.selectbox("Selecione o novo status", options=["Confirmada", "Cancelada"], key="new_status_select")
-
-                if st.button("Salvar Alteração de Status", type="primary"):
-                    booking_id = booking_options[selected_booking_display]
-                    if db.update_booking_status(booking_id, new_status):
-                        st.session_state.action_success_message = f"Status da reserva ID {booking_id} alterado para '{new_status}' com sucesso!"
+            st.dataframe(page_df, use_container_width=True, hide_index=True,
+                         column_config={"Unidade": st.column_config.NumberColumn(format="#%d"), "Fixada": st.column_config.CheckboxColumn()})
+
+        nav1, nav2, nav3 = st.columns([0.2, 0.6, 0.2])
+        with nav1:
+            if st.button("◀ Anterior", disabled=len(cursors) == 1, use_container_width=True):
+                cursors.pop(); st.rerun()
+        with nav2:
+            st.caption(f"Página {len(cursors)} · até {db.BOOKINGS_PAGE_SIZE} reservas por página")
+        with nav3:
+            if st.button("Próxima ▶", disabled=next_cursor is None, use_container_width=True):
+                cursors.append(next_cursor); st.rerun()
+
+        st.subheader("Alterar Status de uma Reserva")
+        if not page_df.empty:
+            booking_options = {f"ID {booking_id} - {member} ({check_in})": booking_id
+                               for booking_id, member, check_in in zip(page_df['ID Reserva'], page_df['Sócio'], page_df['Check-in'])}
+            selected_booking_display = st.selectbox("Selecione uma reserva para alterar", options=booking_options.keys())
+
+            new_status = st.selectbox("Selecione o novo status", options=["Confirmada", "Cancelada"], key="new_status_select")
+
+            if st.button("Salvar Alteração de Status", type="primary"):
+                booking_id = int(booking_options[selected_booking_display])
+                if db.update_booking_status(booking_id, new_status):
+                    st.session_state.action_success_message = f"Status da reserva ID {booking_id} alterado para '{new_status}' com sucesso!"
+                    st.rerun()
+                else:
+                    st.error("Falha ao atualizar o status da reserva. Para reconfirmar, é preciso haver uma unidade livre em todo o período.")
+
+            # Reservas fixadas não mudam de unidade quando as reservas futuras são redistribuídas
+            selected_row = page_df[page_df['ID Reserva'] == booking_options[selected_booking_display]].iloc[0]
+            if pd.notna(selected_row['Unidade']):
+                locked = bool(selected_row['Fixada'])
+                if st.button("Liberar unidade" if locked else f"Fixar na unidade #{int(selected_row['Unidade'])}",
+                             help="A governança já preparou esta unidade: ela não será trocada na redistribuição de reservas."):
+                    if db.lock_booking_unit(int(selected_row['ID Reserva']), not locked):
+                        st.session_state.action_success_message = "Unidade liberada." if locked else "Unidade fixada."
                         st.rerun()
-                    else:
-                        st.error("Falha ao atualizar o status da reserva.")
-            else:
-                st.info("Nenhum resultado encontrado para os filtros aplicados.")
\ No newline at end of file
+        else:
+            st.info("Nenhum resultado encontrado para os filtros aplicados.")